@@ -0,0 +1,67 @@
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import DailyActivity, Submission
+
+
+def record_activity(submission):
+    """Count a judged practice submission towards its user's day."""
+    day = timezone.localdate(submission.created_at)
+    accepted = 1 if submission.status == "AC" else 0
+    counts = {"attempt_count": F("attempt_count") + 1, "ac_count": F("ac_count") + accepted}
+
+    if DailyActivity.objects.filter(user_id=submission.user_id, date=day).update(**counts):
+        return
+    try:
+        with transaction.atomic():
+            DailyActivity.objects.create(user_id=submission.user_id, date=day, attempt_count=1, ac_count=accepted)
+    except IntegrityError:
+        # Someone else created today's row first
+        DailyActivity.objects.filter(user_id=submission.user_id, date=day).update(**counts)
+
+
+def rebuild_activity(users=None):
+    """Recompute the rollup from Submission, for all users or the given ones. Returns the row count."""
+    submissions = Submission.objects.exclude(status="P")
+    rows = DailyActivity.objects.all()
+    if users is not None:
+        submissions = submissions.filter(user__in=users)
+        rows = rows.filter(user__in=users)
+
+    days = (
+        submissions
+        .annotate(day=TruncDate("created_at", tzinfo=timezone.get_current_timezone()))
+        .values("user_id", "day")
+        .annotate(attempts=Count("id"), accepted=Count("id", filter=Q(status="AC")))
+        .order_by()
+    )
+    activity = [
+        DailyActivity(user_id=d["user_id"], date=d["day"], attempt_count=d["attempts"], ac_count=d["accepted"])
+        for d in days.iterator(chunk_size=2000)
+    ]
+    with transaction.atomic():
+        rows.delete()
+        DailyActivity.objects.bulk_create(activity, batch_size=1000)
+    return len(activity)
+
+
+def activity_summary(user, days=365):
+    """
+    Heatmap data for the past year and the last active day ever. The heatmap holds only
+    the days with accepted submissions; the profile page fills in the empty days.
+    Streaks live in UserStats (asloj.stats).
+    """
+    start_date = timezone.localdate() - timedelta(days=days)
+    counts = {
+        day.isoformat(): ac
+        for day, ac in DailyActivity.objects
+        .filter(user=user, date__gte=start_date, ac_count__gt=0)
+        .values_list("date", "ac_count")
+    }
+    last_active = DailyActivity.objects.filter(user=user, attempt_count__gt=0).aggregate(last=Max("date"))["last"]
+    return {
+        "heatmap_data": {"start": start_date.isoformat(), "days": days + 1, "counts": counts},
+        "last_active": last_active,
+    }
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Problem, TestInput, TestOutput, Example, Submission, Contest, Discussion, Comment, Group, GroupInvitation, ContestRegistration, ContestSubmission
+from .models import User, Problem, TestInput, TestOutput, Example, Submission, Contest, Discussion, Comment, Group, GroupInvitation, ContestRegistration, ContestSubmission, ContestStanding, PointsLedger, DailyActivity, UserStats, ProblemStats, ContestSnapshot, ContestResult, ArchiveSegment, ArchivedFile
 
 
 class UserAdmin(BaseUserAdmin):
@@ -43,4 +43,13 @@ admin.site.register(GroupInvitation)
 admin.site.register(Contest)
 admin.site.register(ContestRegistration)
 admin.site.register(ContestSubmission)
+admin.site.register(ContestStanding)
+admin.site.register(PointsLedger)
+admin.site.register(DailyActivity)
+admin.site.register(UserStats)
+admin.site.register(ProblemStats)
+admin.site.register(ContestSnapshot)
+admin.site.register(ContestResult)
+admin.site.register(ArchiveSegment)
+admin.site.register(ArchivedFile)
 
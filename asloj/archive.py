@@ -0,0 +1,114 @@
+"""
+Cold storage for old submission sources.
+
+archive_submissions packs the source files of old judged submissions into segments under
+SUBMISSION_ARCHIVE_DIR. A segment is the files' zlib-compressed bytes back to back. The
+ArchivedFile table holds each file's offset and length, so one file is a seek and a single
+read, with nothing unpacked. Every segment also gets a `.idx.json` sidecar with the same
+index, so the archive can be re-indexed without the database.
+
+A segment is moved into place in the same transaction that indexes it, and the originals are
+deleted only after that commits; ArchiveSegment.originals_deleted records that they are gone.
+ArchiveAwareStorage (asloj.storage) then serves FileField reads of those names from here.
+"""
+import hashlib
+import json
+import os
+import zlib
+from contextlib import suppress
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import ArchivedFile, ArchiveSegment
+
+
+def archived_entry(name):
+    return ArchivedFile.objects.select_related("segment").filter(name=name).first()
+
+
+def read_entry(entry):
+    """The original bytes of an archived file."""
+    path = os.path.join(settings.SUBMISSION_ARCHIVE_DIR, entry.segment.path)
+    with open(path, "rb") as f:
+        f.seek(entry.offset)
+        data = zlib.decompress(f.read(entry.length))
+    if len(data) != entry.size or hashlib.sha256(data).hexdigest() != entry.sha256:
+        raise ValueError(f"Corrupted archive entry: {entry.name} in {entry.segment.path}")
+    return data
+
+
+class SegmentWriter:
+    """Appends files to a new segment; close() makes it visible and returns the archived names."""
+
+    def __init__(self, media_root):
+        self.media_root = media_root
+        os.makedirs(settings.SUBMISSION_ARCHIVE_DIR, exist_ok=True)
+        stamp = timezone.now().strftime("%Y%m%d-%H%M%S-%f")
+        self.relative_path = f"submissions-{stamp}.seg"
+        self.path = os.path.join(settings.SUBMISSION_ARCHIVE_DIR, self.relative_path)
+        self.tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        self.file = open(self.tmp_path, "wb")
+        self.entries = []
+        self.offset = 0
+        self.segment = None
+
+    def add(self, name):
+        """Append one media file. Returns False when the original is missing."""
+        try:
+            with open(os.path.join(self.media_root, name), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        compressed = zlib.compress(data, 9)
+        self.file.write(compressed)
+        self.entries.append({
+            "name": name, "offset": self.offset, "length": len(compressed), "size": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+        })
+        self.offset += len(compressed)
+        return True
+
+    def close(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        if not self.entries:
+            os.remove(self.tmp_path)
+            return []
+
+        index_path = f"{self.path}.idx.json"
+        try:
+            with transaction.atomic():
+                segment = ArchiveSegment.objects.create(path=self.relative_path, file_count=len(self.entries),
+                                                        size=self.offset)
+                ArchivedFile.objects.bulk_create(
+                    [ArchivedFile(segment=segment, **entry) for entry in self.entries], batch_size=1000
+                )
+                # Inside the transaction, so a failed insert or commit leaves no unindexed segment behind
+                os.replace(self.tmp_path, self.path)
+                with open(index_path, "w") as f:
+                    json.dump(self.entries, f)
+        except BaseException:
+            for path in (self.tmp_path, self.path, index_path):
+                with suppress(FileNotFoundError):
+                    os.remove(path)
+            raise
+        self.segment = segment
+        return [entry["name"] for entry in self.entries]
+
+    def abort(self):
+        self.file.close()
+        with suppress(FileNotFoundError):
+            os.remove(self.tmp_path)
+
+
+def delete_originals(names, media_root):
+    """Remove the media copies of archived files. Returns how many were removed."""
+    removed = 0
+    for name in names:
+        try:
+            os.remove(os.path.join(media_root, name))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
@@ -0,0 +1,38 @@
+"""
+Cached page fragments.
+
+Templates wrap read-mostly parts in {% cache %} blocks, e.g.
+    {% cache cache_seconds home_recent_submissions request.user.id %} ... {% endcache %}
+and the signals in asloj.signals drop a fragment with invalidate_fragment() when a row
+behind it changes. Fragments that follow the leaderboard vary on leaderboard_version()
+instead, so a points change retires them without a delete.
+
+Fragment names (and what they vary on):
+    home_recent_submissions  user id
+    home_top_users           leaderboard version
+    upcoming_contests        -
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+# Backends whose entries every worker sees; with any other, invalidations only reach one process
+SHARED_BACKENDS = (
+    "django.core.cache.backends.redis.RedisCache",
+    "django.core.cache.backends.memcached.PyMemcacheCache",
+    "django.core.cache.backends.memcached.PyLibMCCache",
+    "django.core.cache.backends.filebased.FileBasedCache",
+    "django.core.cache.backends.db.DatabaseCache",
+)
+
+
+def cache_is_shared():
+    return settings.CACHES["default"]["BACKEND"] in SHARED_BACKENDS
+
+
+def fragment_key(name, *vary_on):
+    return make_template_fragment_key(name, vary_on)
+
+
+def invalidate_fragment(name, *vary_on):
+    cache.delete(fragment_key(name, *vary_on))
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from .cache import cache_is_shared
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Signals invalidate cached verdicts, scoreboards and fragments with cache deletes, and the
+    scoreboard rebuild lock is a cache.add(); both need a cache every worker shares.
+    """
+    if settings.DEBUG or cache_is_shared():
+        return []
+    return [Error(
+        "The default cache is local to each process, so invalidations and the scoreboard lock only "
+        "reach the worker that made them.",
+        hint="Set REDIS_URL (or CACHE_BACKEND=file for a single host).",
+        id="asloj.E001",
+    )]
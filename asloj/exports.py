@@ -0,0 +1,165 @@
+"""
+Streaming exports of contest data as CSV or JSON, optionally gzipped on the fly.
+
+Every export is (columns, rows) where rows is a lazy iterator over the database, and the
+writers below turn it into an iterator of byte chunks. Nothing holds more than one chunk
+of rows at a time, so memory stays flat however large the contest is. The same chunks
+feed a StreamingHttpResponse or a file (see the export_contest command).
+"""
+import csv
+import json
+import zlib
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F, Q, Sum
+from .models import ContestRegistration, ContestResult, ContestSnapshot, ContestStanding, ContestSubmission
+
+CHUNK_SIZE = 2000  # rows fetched per database round trip
+FLUSH_BYTES = 64 * 1024  # bytes gathered before a chunk is handed on
+FORMATS = ("csv", "json")
+# Spreadsheets run a cell starting with one of these as a formula (names and emails are user input)
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _final_standings(contest):
+    columns = ["rank", "user_id", "name", "email", "solved", "total_points", "penalty"]
+    rows = (
+        ContestResult.objects.filter(contest=contest).order_by("rank", "user__full_name")
+        .annotate(name=F("user__full_name"), email=F("user__email"))
+        .values(*columns).iterator(chunk_size=CHUNK_SIZE)
+    )
+    return columns, rows
+
+
+def _standings(contest):
+    """Final results once the contest is finalized, otherwise the live standings totals."""
+    if ContestSnapshot.objects.filter(contest=contest).exists():
+        return _final_standings(contest)
+    columns = ["rank", "user_id", "name", "email", "solved", "total_points", "penalty"]
+    if contest.scoring == "ICPC":
+        order = ["-solved", "penalty", "user__full_name"]
+        rank_key = lambda row: (row["solved"], row["penalty"])
+    else:
+        order = ["-total_points", "user__full_name"]
+        rank_key = lambda row: row["total_points"]
+
+    # Rows are pre-created for every registrant; only those who submitted are standing
+    totals = (
+        ContestStanding.objects.filter(contest=contest, attempts__gt=0)
+        .values("user_id")
+        .annotate(
+            name=F("user__full_name"),
+            email=F("user__email"),
+            total_points=Sum("best_points"),
+            penalty=Sum("penalty"),
+            solved=Count("id", filter=Q(first_ac_at__isnull=False)),
+        )
+        .order_by(*order)
+    )
+
+    def rows():
+        previous_key, rank = None, 0
+        for position, row in enumerate(totals.iterator(chunk_size=CHUNK_SIZE), start=1):
+            # Tied rows share a rank (1, 2, 2, 4), as on the scoreboard
+            if rank_key(row) != previous_key:
+                rank, previous_key = position, rank_key(row)
+            row["rank"] = rank
+            yield row
+
+    return columns, rows()
+
+
+def _registrations(contest):
+    columns = ["id", "user_id", "name", "email", "student_id", "registered_at"]
+    rows = (
+        ContestRegistration.objects.filter(contest=contest).order_by("id")
+        .values(*columns).iterator(chunk_size=CHUNK_SIZE)
+    )
+    return columns, rows
+
+
+def _submissions(contest):
+    columns = ["id", "user_id", "email", "problem_id", "language", "status", "points", "reused", "created_at"]
+    rows = (
+        ContestSubmission.objects.filter(contest=contest).order_by("id")
+        .annotate(email=F("user__email"))
+        .values(*columns).iterator(chunk_size=CHUNK_SIZE)
+    )
+    return columns, rows
+
+
+EXPORTS = {
+    "standings": _standings,
+    "registrations": _registrations,
+    "submissions": _submissions,
+}
+
+
+# -------------------------
+# Writers
+# -------------------------
+class _Buffer:
+    """Collects what csv.writer writes so it can be handed on in chunks."""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, value):
+        self.parts.append(value)
+        self.size += len(value)
+
+    def take(self):
+        data = "".join(self.parts).encode("utf-8")
+        self.parts, self.size = [], 0
+        return data
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_chunks(columns, rows):
+    buffer = _Buffer()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({column: _csv_cell(row[column]) for column in columns})
+        if buffer.size >= FLUSH_BYTES:
+            yield buffer.take()
+    yield buffer.take()
+
+
+def json_chunks(columns, rows):
+    """A JSON array of objects, written one row at a time."""
+    buffer = _Buffer()
+    buffer.write("[")
+    for index, row in enumerate(rows):
+        buffer.write(("," if index else "") + "\n" + json.dumps({c: row[c] for c in columns}, cls=DjangoJSONEncoder))
+        if buffer.size >= FLUSH_BYTES:
+            yield buffer.take()
+    buffer.write("\n]\n")
+    yield buffer.take()
+
+
+def gzip_chunks(chunks):
+    """Gzip a stream of byte chunks as it goes."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip header and trailer
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_chunks(contest, kind, fmt="csv", compress=False):
+    """Byte chunks of one export of a contest. Raises KeyError for an unknown kind or format."""
+    writer = {"csv": csv_chunks, "json": json_chunks}[fmt]
+    columns, rows = EXPORTS[kind](contest)
+    chunks = writer(columns, rows)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def export_filename(contest, kind, fmt, compress=False):
+    return f"contest-{contest.id}-{kind}.{fmt}" + (".gz" if compress else "")
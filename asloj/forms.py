@@ -59,7 +59,22 @@ class CustomPasswordResetForm(PasswordResetForm):
 class ProblemForm(forms.ModelForm):
     class Meta:
         model = Problem
-        fields = ['title', 'difficulty', 'time_limit', 'statement', 'input_specification', 'output_specification']
+        fields = ['title', 'difficulty', 'time_limit', 'statement', 'input_specification', 'output_specification',
+                  'checker', 'checker_language', 'generator', 'generator_language']
+
+    def clean(self):
+        cleaned_data = super().clean()
+
+        # Guess the checker/generator language from the file extension when not given
+        for field in ('checker', 'generator'):
+            program = cleaned_data.get(field)
+            if program and not cleaned_data.get(f'{field}_language'):
+                if program.name.lower().endswith('.py'):
+                    cleaned_data[f'{field}_language'] = 'py'
+                else:
+                    cleaned_data[f'{field}_language'] = 'cpp'
+
+        return cleaned_data
 
 ExampleFormSet = inlineformset_factory(
     Problem, Example,
@@ -86,13 +101,15 @@ class SubmissionForm(forms.ModelForm):
 class ContestForm(forms.ModelForm):
     class Meta:
         model = Contest
-        fields = ['name', 'description', 'start_time', 'end_time', 'problems']
+        fields = ['name', 'description', 'start_time', 'end_time', 'problems', 'scoring', 'freeze_minutes']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 4}),
             'problems': forms.SelectMultiple(attrs={'class': 'form-select'}),
             'start_time': forms.DateTimeInput(attrs={'type': 'datetime-local', 'class': 'form-control'}),
             'end_time': forms.DateTimeInput(attrs={'type': 'datetime-local', 'class': 'form-control'}),
+            'scoring': forms.Select(attrs={'class': 'form-select'}),
+            'freeze_minutes': forms.NumberInput(attrs={'class': 'form-control'}),
         }
 
     def clean(self):
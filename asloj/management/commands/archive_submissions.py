@@ -0,0 +1,81 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from asloj.archive import SegmentWriter, delete_originals
+from asloj.models import ArchivedFile, ArchiveSegment, ContestSubmission, Submission
+
+
+class Command(BaseCommand):
+    help = (
+        "Pack the source files of judged submissions older than a threshold into compressed, indexed "
+        "archive segments and delete the originals. Reads keep working through ArchiveAwareStorage."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, default=settings.SUBMISSION_ARCHIVE_AFTER_DAYS, metavar="DAYS")
+        parser.add_argument("--segment-mb", type=int, default=settings.SUBMISSION_ARCHIVE_SEGMENT_MB)
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would be archived")
+
+    def handle(self, *args, **options):
+        media_root = settings.MEDIA_ROOT
+        cutoff = timezone.now() - timedelta(days=options["older_than"])
+        archived_names = ArchivedFile.objects.values("name")
+
+        names = []
+        for model in (Submission, ContestSubmission):
+            names.append(
+                model.objects.filter(created_at__lt=cutoff).exclude(status="P").exclude(code_file="")
+                .exclude(code_file__in=archived_names)
+                .order_by("created_at").values_list("code_file", flat=True).iterator(chunk_size=2000)
+            )
+
+        if options["dry_run"]:
+            count = sum(1 for source in names for _ in source)
+            self.stdout.write(f"{count} submission sources older than {options['older_than']} days to archive.")
+            return
+
+        # Originals left behind by an interrupted run are already safe in the archive
+        leftovers = 0
+        for segment in ArchiveSegment.objects.filter(originals_deleted=False).order_by("pk"):
+            leftovers += self.delete_segment_originals(segment)
+        if leftovers:
+            self.stdout.write(f"Removed {leftovers} originals archived by an earlier run.")
+
+        limit = options["segment_mb"] * 1024 * 1024
+        totals = {"segments": 0, "files": 0, "missing": 0, "bytes": 0}
+        writer = SegmentWriter(media_root)
+        try:
+            for source in names:
+                for name in source:
+                    if not writer.add(name):
+                        totals["missing"] += 1
+                    elif writer.offset >= limit:
+                        self.finish(writer, totals)
+                        writer = SegmentWriter(media_root)
+        except BaseException:
+            writer.abort()
+            raise
+        self.finish(writer, totals)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {totals['files']} files into {totals['segments']} segments ({totals['bytes']} bytes); "
+            f"{totals['missing']} originals were missing."
+        ))
+
+    def finish(self, writer, totals):
+        archived = writer.close()
+        if not archived:
+            return
+        self.delete_segment_originals(writer.segment, archived)
+        totals["segments"] += 1
+        totals["files"] += len(archived)
+        totals["bytes"] += writer.offset
+        self.stdout.write(f"{writer.relative_path}: {len(archived)} files, {writer.offset} bytes")
+
+    def delete_segment_originals(self, segment, names=None):
+        if names is None:
+            names = segment.files.values_list("name", flat=True).iterator(chunk_size=2000)
+        removed = delete_originals(names, settings.MEDIA_ROOT)
+        ArchiveSegment.objects.filter(pk=segment.pk).update(originals_deleted=True)
+        return removed
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from asloj.activity import rebuild_activity
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user daily activity rollup from Submission."
+
+    def handle(self, *args, **options):
+        count = rebuild_activity()
+        self.stdout.write(self.style.SUCCESS(f"{count} daily activity rows written."))
@@ -0,0 +1,121 @@
+import random
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from asloj.models import Contest, ContestSubmission, Problem, Submission, User
+from asloj.ranking import ranked_users
+from asloj.standings import status_rows_query
+
+STATUSES = ["AC", "WA", "WA", "TLE", "RE"]
+
+
+def explain(queryset):
+    """
+    The plan of a queryset. QuerySet.explain() puts EXPLAIN inside the subquery Django wraps
+    around filters on window functions, so the prefix goes in front of the compiled SQL here.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+        return "\n".join(" ".join(map(str, row)) for row in cursor.fetchall())
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway dataset and check with EXPLAIN that the hot view queries use their indexes. "
+        "Everything runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--problems", type=int, default=50)
+        parser.add_argument("--submissions", type=int, default=50000, help="Practice and contest submissions each")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--verbose-plans", action="store_true", help="Print every plan")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user, problem, contest = self.seed(options)
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            failures = self.check_plans(user, problem, contest, options["verbose_plans"])
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"{len(failures)} queries do not use their index: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS(f"All hot queries use their indexes on {connection.vendor}."))
+
+    def seed(self, options):
+        rng = random.Random(options["seed"])
+        tag = f"plancheck{rng.randrange(10 ** 9)}"
+
+        users = User.objects.bulk_create(
+            [
+                User(full_name=f"Plan User {i}", university_id=f"{tag}-{i}", email=f"{tag}-{i}@example.com",
+                     points=rng.randrange(0, 5000), is_staff=(i % 50 == 0), password="!")
+                for i in range(options["users"])
+            ],
+            batch_size=1000,
+        )
+        problems = Problem.objects.bulk_create(
+            [
+                Problem(created_by=users[0], title=f"Plan Problem {i}", statement="-", input_specification="-",
+                        output_specification="-", difficulty=rng.choice(["Easy", "Medium", "Hard"]))
+                for i in range(options["problems"])
+            ],
+        )
+        now = timezone.now()
+        contest = Contest.objects.create(name=tag, description="-", start_time=now - timedelta(hours=2),
+                                         end_time=now + timedelta(hours=3), creator=users[0])
+        contest.problems.set(problems)
+
+        def pick():
+            return rng.choice(users), rng.choice(problems), rng.choice(STATUSES)
+
+        Submission.objects.bulk_create(
+            [
+                Submission(user=u, problem=p, status=s, language="py", code_file="submissions/plan.py")
+                for u, p, s in (pick() for _ in range(options["submissions"]))
+            ],
+            batch_size=2000,
+        )
+        ContestSubmission.objects.bulk_create(
+            [
+                ContestSubmission(user=u, contest=contest, problem=p, status=s, language="py",
+                                  points=100 if s == "AC" else 0, code_file="contest_submissions/plan.py")
+                for u, p, s in (pick() for _ in range(options["submissions"]))
+            ],
+            batch_size=2000,
+        )
+        return users[1], problems[0], contest
+
+    def hot_queries(self, user, problem, contest):
+        """(label, queryset, index it must use) for the queries behind the busiest pages."""
+        return [
+            ("recent submissions", Submission.objects.filter(user=user).order_by("-created_at")[:10],
+             "submission_user_recent_idx"),
+            ("solved check", Submission.objects.filter(user=user, problem=problem, status="AC").values("id")[:1],
+             "submission_user_ac_idx"),
+            ("contest submission list", ContestSubmission.objects.filter(contest=contest, user=user)
+             .order_by("-created_at"), "contest_sub_user_recent_idx"),
+            ("contest problem statuses", status_rows_query(contest, user), "contest_sub_standing_idx"),
+            ("leaderboard page", ranked_users()[:20], "user_rank_idx"),
+            ("rank lookup", ranked_users().filter(points__gt=user.points).values("id"), "user_rank_idx"),
+            ("pending submissions", Submission.objects.filter(status="P").values("id"), "submission_pending_idx"),
+            ("pending contest submissions", ContestSubmission.objects.filter(status="P").values("id"),
+             "contest_sub_pending_idx"),
+        ]
+
+    def check_plans(self, user, problem, contest, verbose):
+        failures = []
+        for label, queryset, index in self.hot_queries(user, problem, contest):
+            plan = explain(queryset)
+            ok = index in plan
+            if not ok:
+                failures.append(label)
+            style = self.style.SUCCESS if ok else self.style.ERROR
+            self.stdout.write(style(f"{'ok  ' if ok else 'FAIL'} {label} ({index})"))
+            if verbose or not ok:
+                self.stdout.write(f"     {plan}".replace("\n", "\n     "))
+        return failures
@@ -0,0 +1,37 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from asloj.exports import EXPORTS, FORMATS, export_chunks, export_filename
+from asloj.models import Contest
+
+
+class Command(BaseCommand):
+    help = "Stream a contest's standings, registrations or submissions to a CSV or JSON file, in constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("contest_id", type=int)
+        parser.add_argument("kind", choices=sorted(EXPORTS))
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--gzip", action="store_true", help="Compress the output with gzip")
+        parser.add_argument("--output", "-o", help="File to write (default: contest-<id>-<kind>.<format>, '-' for stdout)")
+
+    def handle(self, *args, **options):
+        contest = Contest.objects.filter(id=options["contest_id"]).first()
+        if contest is None:
+            raise CommandError(f"Contest {options['contest_id']} does not exist.")
+
+        kind, fmt, compress = options["kind"], options["format"], options["gzip"]
+        output = options["output"] or export_filename(contest, kind, fmt, compress)
+        chunks = export_chunks(contest, kind, fmt, compress)
+
+        size = 0
+        if output == "-":
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+                size += len(chunk)
+            sys.stdout.buffer.flush()
+            return
+        with open(output, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output} ({size} bytes)."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from asloj.models import Contest
+from asloj.snapshots import finalize_contest
+
+
+class Command(BaseCommand):
+    help = "Write the final standings snapshot of every ended contest that does not have one yet (run from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("contest_ids", nargs="*", type=int, help="Contests to finalize (default: all ended)")
+        parser.add_argument("--force", action="store_true", help="Rewrite existing snapshots, e.g. after a rejudge")
+
+    def handle(self, *args, **options):
+        contests = Contest.objects.filter(end_time__lte=timezone.now())
+        if options["contest_ids"]:
+            contests = contests.filter(id__in=options["contest_ids"])
+        elif not options["force"]:
+            contests = contests.filter(snapshot__isnull=True)
+
+        for contest in contests.order_by("end_time"):
+            snapshot = finalize_contest(contest, force=options["force"])
+            if snapshot is None:
+                self.stdout.write(f"{contest.name}: waiting for pending submissions")
+            else:
+                self.stdout.write(f"{contest.name}: {snapshot.participants} participants, {len(snapshot.data)} bytes")
@@ -0,0 +1,34 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from asloj.models import Problem, TestUpload
+from asloj.testdata import process_test_upload, rebuild_test_data
+
+
+class Command(BaseCommand):
+    help = (
+        "Finish test data work a restart interrupted: unpack pending test archives, resume stale ones "
+        "and build the tests of problems still marked as building (run from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("problem_ids", nargs="*", type=int, help="Problems to rebuild (default: all building)")
+        parser.add_argument("--stale-minutes", type=int, default=30,
+                            help="Resume archives that have been processing for longer than this")
+
+    def handle(self, *args, **options):
+        stale = timezone.now() - timedelta(minutes=options["stale_minutes"])
+        uploads = TestUpload.objects.filter(Q(status="PENDING") | Q(status="PROCESSING", created_at__lt=stale))
+        for upload_id, status in uploads.order_by("pk").values_list("pk", "status"):
+            process_test_upload(upload_id, claim_status=status)
+            upload = TestUpload.objects.get(pk=upload_id)
+            self.stdout.write(f"Upload {upload_id}: {upload.status} {upload.message}")
+
+        problems = Problem.objects.filter(test_data_status="BUILDING")
+        if options["problem_ids"]:
+            problems = problems.filter(pk__in=options["problem_ids"])
+
+        for problem_id, title in problems.order_by("pk").values_list("pk", "title"):
+            error = rebuild_test_data(problem_id)
+            self.stdout.write(f"{title}: {error or 'ready'}")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from asloj.stats import rebuild_problem_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute every problem's attempt, acceptance and solver counters from Submission."
+
+    def handle(self, *args, **options):
+        count = rebuild_problem_stats()
+        self.stdout.write(self.style.SUCCESS(f"{count} problem stats rows written."))
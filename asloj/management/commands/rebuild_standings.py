@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from asloj.models import Contest
+from asloj.standings import rebuild_standings
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized contest standings from ContestSubmission."
+
+    def add_arguments(self, parser):
+        parser.add_argument("contest_ids", nargs="*", type=int, help="Contests to rebuild (default: all)")
+
+    def handle(self, *args, **options):
+        contests = Contest.objects.all()
+        if options["contest_ids"]:
+            contests = contests.filter(id__in=options["contest_ids"])
+
+        for contest in contests:
+            count = rebuild_standings(contest)
+            self.stdout.write(f"{contest.name}: {count} standing rows")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from asloj.stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's profile stats row from submissions and registrations."
+
+    def handle(self, *args, **options):
+        count = rebuild_user_stats()
+        self.stdout.write(self.style.SUCCESS(f"{count} user stats rows written."))
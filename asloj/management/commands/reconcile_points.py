@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from asloj.points import reconcile_points
+
+
+class Command(BaseCommand):
+    help = "Check the points ledger and User.points against ContestSubmission, optionally fixing them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Rewrite the ledger and user points when they differ")
+
+    def handle(self, *args, **options):
+        ledger_mismatches, user_mismatches = reconcile_points(fix=options["fix"])
+
+        for (user_id, contest_id, problem_id), (actual, expected) in sorted(ledger_mismatches.items()):
+            self.stdout.write(f"ledger user={user_id} contest={contest_id} problem={problem_id}: {actual} != {expected}")
+        for user_id, (actual, expected) in sorted(user_mismatches.items()):
+            self.stdout.write(f"user={user_id} points: {actual} != {expected}")
+
+        if not ledger_mismatches and not user_mismatches:
+            self.stdout.write(self.style.SUCCESS("Points ledger is consistent."))
+        elif options["fix"]:
+            self.stdout.write(self.style.SUCCESS("Points ledger and user points fixed."))
+        else:
+            self.stdout.write(self.style.WARNING("Run with --fix to correct these."))
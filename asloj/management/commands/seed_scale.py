@@ -0,0 +1,253 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from faker import Faker
+from asloj.activity import rebuild_activity
+from asloj.models import Contest, ContestRegistration, ContestSubmission, Problem, Submission, User
+from asloj.points import reconcile_points
+from asloj.standings import rebuild_standings
+from asloj.statements import render_statement
+from asloj.stats import rebuild_problem_stats, rebuild_user_stats
+
+PASSWORD = "scale-password"
+LANGUAGES = ["cpp", "cpp", "cpp", "py", "py", "c", "java", "js"]
+DIFFICULTIES = ["Easy", "Easy", "Medium", "Medium", "Hard"]
+ACCEPT_RATE = {"Easy": 0.5, "Medium": 0.3, "Hard": 0.15}
+REJECTED = ["WA", "WA", "WA", "TLE", "RE"]
+# Every seeded submission of a language shares one source file, so its pages open and its code shows
+SOURCES = {
+    "cpp": "#include <iostream>\n\nint main() {\n    long long a, b;\n    std::cin >> a >> b;\n"
+           "    std::cout << a + b << std::endl;\n}\n",
+    "c": "#include <stdio.h>\n\nint main(void) {\n    long long a, b;\n    scanf(\"%lld %lld\", &a, &b);\n"
+         "    printf(\"%lld\\n\", a + b);\n    return 0;\n}\n",
+    "py": "a, b = map(int, input().split())\nprint(a + b)\n",
+    "java": "import java.util.Scanner;\n\npublic class Main {\n    public static void main(String[] args) {\n"
+            "        Scanner in = new Scanner(System.in);\n        System.out.println(in.nextLong() + in.nextLong());\n"
+            "    }\n}\n",
+    "js": "const [a, b] = require(\"fs\").readFileSync(0, \"utf8\").trim().split(/\\s+/).map(Number);\n"
+          "console.log(a + b);\n",
+}
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the created_at values we set instead of stamping them with now()."""
+    fields = [model._meta.get_field("created_at") for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generate a large, realistic dataset (users, problems, practice submissions over time, "
+        "contests with registrations and submissions) for scale testing. Deterministic for a given --seed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50000)
+        parser.add_argument("--problems", type=int, default=1000)
+        parser.add_argument("--submissions", type=int, default=5000000)
+        parser.add_argument("--contests", type=int, default=200)
+        parser.add_argument("--days", type=int, default=730, help="Spread practice submissions over this many days")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--prefix", default="scale", help="Prefix of generated university ids and emails")
+        parser.add_argument("--skip-derived", action="store_true",
+                            help="Do not rebuild standings, points, stats, activity and statements afterwards")
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        if User.objects.filter(university_id__startswith=f"{prefix}-").exists():
+            raise CommandError(f"Users with prefix '{prefix}' already exist; pick another --prefix.")
+
+        self.rng = random.Random(options["seed"])
+        self.fake = Faker()
+        self.fake.seed_instance(options["seed"])
+        self.now = timezone.now().replace(microsecond=0)
+        self.batch_size = options["batch_size"]
+
+        self.step("sources", self.write_sources)
+        user_ids = self.step("users", self.seed_users, options)
+        problems = self.step("problems", self.seed_problems, options, user_ids)
+        self.step("submissions", self.seed_submissions, options, user_ids, problems)
+        contests = self.step("contests", self.seed_contests, options, user_ids, problems)
+
+        if not options["skip_derived"]:
+            self.step("statements", self.render_statements, [pk for pk, _ in problems])
+            self.step("standings", lambda: sum(rebuild_standings(contest) for contest in contests))
+            self.step("points", lambda: reconcile_points(fix=True))
+            self.step("user stats", rebuild_user_stats)
+            self.step("problem stats", rebuild_problem_stats)
+            self.step("activity", rebuild_activity)
+
+        self.stdout.write(self.style.SUCCESS(f"Done. Seeded users log in with password '{PASSWORD}'."))
+
+    def step(self, label, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        count = result if isinstance(result, int) else len(result) if isinstance(result, list) else None
+        rows = f" {count} rows" if count is not None else ""
+        self.stdout.write(f"{label}:{rows} in {time.perf_counter() - started:.1f}s")
+        return result
+
+    def bulk(self, model, objects):
+        created = 0
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch)
+            created += len(batch)
+        return created
+
+    def weights(self, count, alpha):
+        """Cumulative Pareto weights, so a few users and problems get most of the traffic."""
+        return list(accumulate(self.rng.paretovariate(alpha) for _ in range(count)))
+
+    # -------------------------
+    # Generators
+    # -------------------------
+    def source_name(self, folder, language):
+        return f"{folder}/seed.{language}"
+
+    def write_sources(self):
+        written = 0
+        for folder in ("submissions", "contest_submissions"):
+            for language in sorted(set(LANGUAGES)):
+                name = self.source_name(folder, language)
+                if not default_storage.exists(name):
+                    default_storage.save(name, ContentFile(SOURCES[language].encode()))
+                    written += 1
+        return written
+
+    def seed_users(self, options):
+        prefix = options["prefix"]
+        password = make_password(PASSWORD)
+        self.bulk(User, (
+            User(full_name=self.fake.name(), university_id=f"{prefix}-{i:07d}",
+                 email=f"{prefix}.{i}@uap-bd.edu", password=password, pfp="pfp/default.jpeg")
+            for i in range(options["users"])
+        ))
+        return list(
+            User.objects.filter(university_id__startswith=f"{prefix}-").order_by("university_id")
+            .values_list("id", flat=True)
+        )
+
+    def seed_problems(self, options, user_ids):
+        authors = user_ids[:max(1, len(user_ids) // 500)]
+        self.bulk(Problem, (
+            Problem(
+                created_by_id=self.rng.choice(authors),
+                title=f"{self.fake.catch_phrase()} [{options['prefix']} {i}]",
+                statement="".join(f"<p>{p}</p>" for p in self.fake.paragraphs(nb=3)),
+                input_specification=f"<p>{self.fake.sentence()}</p>",
+                output_specification=f"<p>{self.fake.sentence()}</p>",
+                difficulty=self.rng.choice(DIFFICULTIES),
+                time_limit=self.rng.choice([1, 1, 2, 3]),
+            )
+            for i in range(options["problems"])
+        ))
+        return list(
+            Problem.objects.filter(created_by_id__in=authors, title__contains=f"[{options['prefix']} ")
+            .order_by("pk").values_list("pk", "difficulty")
+        )
+
+    def verdict(self, difficulty):
+        return "AC" if self.rng.random() < ACCEPT_RATE[difficulty] else self.rng.choice(REJECTED)
+
+    def seed_submissions(self, options, user_ids, problems):
+        user_weights = self.weights(len(user_ids), 1.2)
+        problem_weights = self.weights(len(problems), 1.5)
+        span = options["days"] * 86400
+
+        def submissions():
+            for _ in range(options["submissions"]):
+                problem_id, difficulty = self.rng.choices(problems, cum_weights=problem_weights)[0]
+                language = self.rng.choice(LANGUAGES)
+                yield Submission(
+                    user_id=self.rng.choices(user_ids, cum_weights=user_weights)[0],
+                    problem_id=problem_id,
+                    language=language,
+                    status=self.verdict(difficulty),
+                    code_file=self.source_name("submissions", language),
+                    test_data_version=1,
+                    created_at=self.now - timedelta(seconds=self.rng.randrange(span)),
+                )
+
+        with explicit_timestamps(Submission):
+            return self.bulk(Submission, submissions())
+
+    def seed_contests(self, options, user_ids, problems):
+        contests = []
+        for i in range(options["contests"]):
+            # Mostly past contests, a few running or upcoming
+            start = self.now - timedelta(days=self.rng.uniform(-14, options["days"]))
+            contest = Contest.objects.create(
+                name=f"{self.fake.bs().title()} Cup [{options['prefix']} {i}]",
+                description=self.fake.paragraph(),
+                start_time=start,
+                end_time=start + timedelta(hours=self.rng.choice([2, 3, 5])),
+                creator_id=self.rng.choice(user_ids[:10]),
+                scoring=self.rng.choice(["IOI", "ICPC"]),
+                freeze_minutes=self.rng.choice([0, 0, 60]),
+            )
+            contest_problems = self.rng.sample(problems, min(len(problems), self.rng.randint(5, 10)))
+            contest.problems.set([pk for pk, _ in contest_problems])
+            contestants = self.rng.sample(user_ids, min(len(user_ids), self.rng.randint(50, 400)))
+
+            self.bulk(ContestRegistration, (
+                ContestRegistration(contest=contest, user_id=user_id, name=name, email=email, student_id=university_id)
+                for user_id, name, email, university_id in User.objects.filter(id__in=contestants)
+                .order_by("id").values_list("id", "full_name", "email", "university_id")
+            ))
+            contests.append(contest)
+
+            if contest.start_time > self.now:
+                continue
+            duration = int((min(contest.end_time, self.now) - contest.start_time).total_seconds())
+
+            def contest_submissions():
+                for user_id in contestants:
+                    for _ in range(self.rng.randint(0, 12)):
+                        problem_id, difficulty = self.rng.choice(contest_problems)
+                        status = self.verdict(difficulty)
+                        language = self.rng.choice(LANGUAGES)
+                        yield ContestSubmission(
+                            user_id=user_id, contest=contest, problem_id=problem_id, language=language,
+                            status=status, points=100 if status == "AC" else 0,
+                            code_file=self.source_name("contest_submissions", language), test_data_version=1,
+                            created_at=contest.start_time + timedelta(seconds=self.rng.randrange(max(1, duration))),
+                        )
+
+            with explicit_timestamps(ContestSubmission):
+                self.bulk(ContestSubmission, contest_submissions())
+        return contests
+
+    def render_statements(self, problem_ids):
+        rendered = []
+        for problem in Problem.objects.filter(pk__in=problem_ids).iterator(chunk_size=500):
+            render_statement(problem)
+            rendered.append(problem)
+        Problem.objects.bulk_update(rendered, ["statement_html", "statement_hash", "statement_updated_at"],
+                                    batch_size=500)
+        return len(rendered)
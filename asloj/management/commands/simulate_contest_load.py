@@ -0,0 +1,234 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from asloj.models import Contest, ContestRegistration, Problem, User
+
+PASSWORD = "load-test-password"
+SQLITE_BUSY_TIMEOUT = 30  # seconds a writer waits for the database lock
+SOLUTION = "print(sum(map(int, input().split())))\n# contestant {user} attempt {attempt}\n"
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class StubJudge:
+    """Stands in for judge_contest_submission: waits like a judge would, then returns a verdict."""
+
+    def __init__(self, latency_ms, accept_rate, seed):
+        self.latency = latency_ms / 1000
+        self.accept_rate = accept_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def __call__(self, submission):
+        with self.lock:
+            delay = self.latency * self.rng.uniform(0.5, 1.5)
+            accepted = self.rng.random() < self.accept_rate
+        time.sleep(delay)
+        return ("AC", 100, []) if accepted else ("WA", 0, [])
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate contestants hitting a running contest (log in, open the problems, submit, poll the "
+        "scoreboard) with the test client against a throwaway test database and a stub judge, and "
+        "report throughput and latency percentiles per URL name."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--contestants", type=int, default=300)
+        parser.add_argument("--workers", type=int, default=40,
+                            help="Contestants active at once; each holds a database connection, so keep this "
+                                 "below the server's max_connections")
+        parser.add_argument("--problems", type=int, default=8)
+        parser.add_argument("--rounds", type=int, default=5, help="Problem-solving rounds per contestant")
+        parser.add_argument("--submit-rate", type=float, default=0.5, help="Chance of submitting in a round")
+        parser.add_argument("--judge-latency", type=int, default=200, help="Mean stub judge time in ms")
+        parser.add_argument("--accept-rate", type=float, default=0.4)
+        parser.add_argument("--think-time", type=int, default=0, help="Mean pause between requests in ms")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--json", metavar="PATH", help="Also write the report as JSON, to compare releases")
+
+    def handle(self, *args, **options):
+        work_dir = tempfile.mkdtemp(prefix="loadtest-")
+        for connection in connections.all():
+            if connection.vendor == "sqlite":
+                # A shared in-memory database fails concurrent writers instead of making them wait
+                connection.settings_dict["TEST"]["NAME"] = os.path.join(work_dir, f"{connection.alias}.sqlite3")
+                # WAL lets readers run alongside the writer; writers queue for the lock up front
+                connection.settings_dict["OPTIONS"].update({
+                    "timeout": SQLITE_BUSY_TIMEOUT,
+                    "init_command": "PRAGMA journal_mode=WAL;",
+                    "transaction_mode": "IMMEDIATE",
+                })
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        # Keep uploads and cache entries of the throwaway contest away from the real ones
+        caches = {alias: {**config, "KEY_PREFIX": "loadtest"} for alias, config in settings.CACHES.items()}
+        try:
+            with override_settings(MEDIA_ROOT=os.path.join(work_dir, "media"), CACHES=caches), \
+                    mock.patch("asloj.views.judge_contest_submission",
+                               StubJudge(options["judge_latency"], options["accept_rate"], options["seed"])):
+                contest, emails = self.seed(options)
+                samples, elapsed = self.run(contest, emails, options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        report = self.report(samples, elapsed, options)
+        if options["json"]:
+            with open(options["json"], "w") as f:
+                json.dump(report, f, indent=2)
+
+    def seed(self, options):
+        password = make_password(PASSWORD)  # hashed once, logging in still pays the full check
+        users = User.objects.bulk_create(
+            [
+                User(full_name=f"Contestant {i}", university_id=f"load-{i}", email=f"load{i}@uap-bd.edu",
+                     password=password)
+                for i in range(options["contestants"])
+            ],
+            batch_size=1000,
+        )
+        problems = [
+            Problem.objects.create(created_by=users[0], title=f"Load Problem {i}", statement="<p>Add two numbers.</p>",
+                                   input_specification="a b", output_specification="a + b")
+            for i in range(options["problems"])
+        ]
+        now = timezone.now()
+        contest = Contest.objects.create(name="Load test", description="-", start_time=now - timedelta(minutes=1),
+                                         end_time=now + timedelta(hours=2), creator=users[0])
+        contest.problems.set(problems)
+        ContestRegistration.objects.bulk_create(
+            [
+                ContestRegistration(contest=contest, user=user, name=user.full_name, email=user.email,
+                                    student_id=user.university_id)
+                for user in users
+            ],
+            batch_size=1000,
+        )
+        return contest, [user.email for user in users]
+
+    def run(self, contest, emails, options):
+        samples = []  # (url name, seconds, status)
+        samples_lock = threading.Lock()
+        problem_ids = list(contest.problems.values_list("pk", flat=True))
+
+        def request(client, method, path, **kwargs):
+            started = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            seconds = time.perf_counter() - started
+            match = response.resolver_match
+            with samples_lock:
+                samples.append((match.url_name if match else path, seconds, response.status_code))
+            return response
+
+        def log_in(email):
+            # Failing views count as 500s instead of killing the contestant
+            client = Client(raise_request_exception=False)
+            try:
+                request(client, "post", reverse("login"), data={"username": email, "password": PASSWORD})
+            finally:
+                connections.close_all()
+            return client
+
+        def contestant(index, client):
+            rng = random.Random(f"{options['seed']}-{index}")
+
+            def think():
+                if options["think_time"]:
+                    time.sleep(rng.expovariate(1000 / options["think_time"]))
+
+            try:
+                request(client, "get", reverse("contest_detail", args=[contest.id]))
+                for attempt in range(options["rounds"]):
+                    request(client, "get", reverse("contest_problems", args=[contest.id]))
+                    think()
+                    problem_url = reverse("contest_problem_detail", args=[contest.id, rng.choice(problem_ids)])
+                    request(client, "get", problem_url)
+                    think()
+                    if rng.random() < options["submit_rate"]:
+                        code = SOLUTION.format(user=index, attempt=attempt).encode()
+                        response = request(client, "post", problem_url, data={
+                            "language": "py",
+                            "code_file": SimpleUploadedFile("solution.py", code),
+                        })
+                        if response.status_code == 302:
+                            request(client, "get", response["Location"])
+                        think()
+                    request(client, "get", reverse("contest_scoreboard_json", args=[contest.id]))
+                    think()
+            finally:
+                connections.close_all()
+
+        # At most --workers contestants are active at once, as with a fixed pool of server workers;
+        # everyone logs in first so the contest opens for all of them at the same moment
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            clients = list(pool.map(log_in, emails))
+            for future in [pool.submit(contestant, i, client) for i, client in enumerate(clients)]:
+                future.result()
+        return samples, time.perf_counter() - started
+
+    def report(self, samples, elapsed, options):
+        by_name = {}
+        for name, seconds, status in samples:
+            by_name.setdefault(name, []).append((seconds, status))
+
+        rows = {}
+        for name, entries in sorted(by_name.items()):
+            latencies = sorted(seconds * 1000 for seconds, _ in entries)
+            rows[name] = {
+                "requests": len(entries),
+                "errors": sum(1 for _, status in entries if status >= 400),
+                "p50_ms": round(percentile(latencies, 50), 1),
+                "p90_ms": round(percentile(latencies, 90), 1),
+                "p99_ms": round(percentile(latencies, 99), 1),
+                "max_ms": round(latencies[-1], 1),
+            }
+
+        self.stdout.write(f"{'view':<28}{'requests':>9}{'errors':>8}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        for name, row in rows.items():
+            self.stdout.write(
+                f"{name:<28}{row['requests']:>9}{row['errors']:>8}{row['p50_ms']:>9}{row['p90_ms']:>9}"
+                f"{row['p99_ms']:>9}{row['max_ms']:>9}"
+            )
+        throughput = len(samples) / elapsed if elapsed else 0.0
+        errors = sum(row["errors"] for row in rows.values())
+        style = self.style.ERROR if errors else self.style.SUCCESS
+        self.stdout.write(style(
+            f"{options['contestants']} contestants ({options['workers']} at once), {len(samples)} requests "
+            f"in {elapsed:.1f}s "
+            f"({throughput:.1f} req/s), {errors} errors"
+        ))
+        return {
+            "contestants": options["contestants"],
+            "workers": options["workers"],
+            "requests": len(samples),
+            "seconds": round(elapsed, 2),
+            "throughput": round(throughput, 1),
+            "views": rows,
+        }
@@ -0,0 +1,92 @@
+import os
+import socket
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from asloj.cache import cache_is_shared
+from asloj.models import Contest, ContestRegistration, User
+from asloj.standings import precreate_standings, problem_statuses
+from asloj.statements import ensure_rendered_statement
+from asloj.testdata import open_bundle
+from asloj.utils import get_checker_command, get_generator_command
+
+
+def marker_path(contest):
+    """Per-host file recording that this host warmed this contest (for this start time)."""
+    stamp = int(contest.start_time.timestamp())
+    return os.path.join(settings.JUDGE_CACHE_DIR, "warmed", f"{contest.id}-{stamp}-{socket.gethostname()}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Warm a contest before it starts: build test data bundles and generated inputs, compile "
+        "checkers and generators, render statements, pre-create standing rows and, with a shared "
+        "cache, prime the contestants' problem statuses. Run it on every judge host, e.g. from cron "
+        "with --upcoming-within."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("contest_ids", nargs="*", type=int, help="Contests to warm")
+        parser.add_argument("--upcoming-within", type=int, metavar="MINUTES",
+                            help="Warm every contest starting within this many minutes")
+        parser.add_argument("--force", action="store_true", help="Warm again even if this host already did")
+
+    def handle(self, *args, **options):
+        contests = Contest.objects.all()
+        if options["contest_ids"]:
+            contests = contests.filter(id__in=options["contest_ids"])
+        elif options["upcoming_within"] is not None:
+            now = timezone.now()
+            contests = contests.filter(start_time__gt=now,
+                                       start_time__lte=now + timedelta(minutes=options["upcoming_within"]))
+        else:
+            raise CommandError("Give contest ids or --upcoming-within MINUTES.")
+
+        for contest in contests.order_by("start_time"):
+            marker = marker_path(contest)
+            if os.path.exists(marker) and not options["force"]:
+                self.stdout.write(f"{contest.name}: already warmed on this host")
+                continue
+
+            failures = self.warm_problems(contest)
+            created = precreate_standings(contest)
+            self.warm_statuses(contest)
+
+            if failures:
+                # No marker, so the next cron run tries again
+                self.stdout.write(self.style.ERROR(f"{contest.name}: {failures} problems failed to warm"))
+                continue
+            os.makedirs(os.path.dirname(marker), exist_ok=True)
+            with open(marker, "w") as f:
+                f.write(timezone.now().isoformat())
+            self.stdout.write(self.style.SUCCESS(f"{contest.name}: warmed ({created} standing rows created)"))
+
+    def warm_problems(self, contest):
+        failures = 0
+        for problem in contest.problems.order_by("problem_id"):
+            try:
+                get_checker_command(problem)
+                get_generator_command(problem)
+                # Reading every test builds the bundle and digests and fills the generated-input cache
+                with open_bundle(problem) as bundle:
+                    tests = sum(1 for _ in bundle)
+                ensure_rendered_statement(problem)
+            except Exception as exc:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f"  {problem.problem_id}. {problem.title}: {exc}"))
+                continue
+            self.stdout.write(f"  {problem.problem_id}. {problem.title}: {tests} tests")
+        return failures
+
+    def warm_statuses(self, contest):
+        # The scoreboard is not primed: it is only fresh for SCOREBOARD_CACHE_SECONDS anyway
+        if not cache_is_shared():
+            self.stdout.write("  statuses: not primed, the cache is local to this process")
+            return
+        user_ids = ContestRegistration.objects.filter(contest=contest, user__isnull=False).values_list("user_id")
+        primed = 0
+        for user in User.objects.filter(id__in=user_ids).only("id"):
+            problem_statuses(contest, user)
+            primed += 1
+        self.stdout.write(f"  statuses: primed for {primed} contestants")
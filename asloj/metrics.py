@@ -0,0 +1,223 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Each process aggregates into a dict in memory. With METRICS_DIR set (one directory shared by
+all gunicorn workers), every process also writes its totals to `<pid>.json` there, at most
+once every METRICS_FLUSH_SECONDS, and /metrics sums the files of all workers. Empty the
+directory when the server starts, as old workers' files are kept so counters never go back;
+the gauges of workers that are no longer running are left out.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+JUDGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# name: (type, help, buckets)
+METRICS = {
+    "asloj_http_request_seconds": ("histogram", "View latency by URL name.", LATENCY_BUCKETS),
+    "asloj_http_requests_total": ("counter", "Requests by URL name and status code.", None),
+    "asloj_db_queries": ("histogram", "SQL queries per request by URL name.", QUERY_BUCKETS),
+    "asloj_db_seconds": ("histogram", "Database time per request by URL name.", LATENCY_BUCKETS),
+    "asloj_judge_in_progress": ("gauge", "Submissions being judged right now.", None),
+    "asloj_judge_compile_seconds": ("histogram", "Compile time of submissions by language.", JUDGE_BUCKETS),
+    "asloj_judge_run_seconds": ("histogram", "Run time of one test case by language.", JUDGE_BUCKETS),
+    "asloj_judge_verdicts_total": ("counter", "Final verdicts by language.", None),
+    "asloj_cache_requests_total": ("counter", "Judge and page cache lookups by cache and result.", None),
+}
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()  # one writer of this process's file at a time
+_values = {}  # (name, labels) -> number, or [per-bucket counts..., sum, count] for histograms
+_last_flush = 0.0
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+def inc(name, labels=None, value=1):
+    """Add to a counter or gauge."""
+    key = (name, _labels(labels))
+    with _lock:
+        _values[key] = _values.get(key, 0) + value
+    _maybe_flush()
+
+
+def observe(name, value, labels=None):
+    """Record one observation in a histogram."""
+    buckets = METRICS[name][2]
+    key = (name, _labels(labels))
+    with _lock:
+        histogram = _values.get(key)
+        if histogram is None:
+            histogram = _values[key] = [0] * (len(buckets) + 2)
+        index = bisect_left(buckets, value)
+        if index < len(buckets):
+            histogram[index] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+    _maybe_flush()
+
+
+@contextmanager
+def timed(name, labels=None):
+    """Observe how long the block takes."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, labels)
+
+
+@contextmanager
+def in_progress(name, labels=None):
+    """Keep a gauge raised while the block runs."""
+    inc(name, labels)
+    try:
+        yield
+    finally:
+        inc(name, labels, -1)
+
+
+def cache_lookup(cache_name, hit):
+    inc("asloj_cache_requests_total", {"cache": cache_name, "result": "hit" if hit else "miss"})
+
+
+# -------------------------
+# Sharing between workers
+# -------------------------
+def _snapshot():
+    with _lock:
+        return [[name, list(labels), value] for (name, labels), value in _values.items()]
+
+
+def flush():
+    """Write this process's totals to the shared directory (no-op without METRICS_DIR)."""
+    global _last_flush
+    directory = settings.METRICS_DIR
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    with _flush_lock:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(_snapshot(), f)
+        os.replace(tmp_path, path)
+        _last_flush = time.monotonic()
+
+
+def _maybe_flush():
+    if settings.METRICS_DIR and time.monotonic() - _last_flush >= settings.METRICS_FLUSH_SECONDS:
+        if _flush_lock.locked():
+            return  # another thread is writing the file right now
+        flush()
+
+
+@atexit.register
+def _flush_on_exit():
+    # Gauges describe live work, which ends with the process
+    with _lock:
+        for key in [key for key in _values if METRICS.get(key[0], ("",))[0] == "gauge"]:
+            _values[key] = 0
+    try:
+        flush()
+    except Exception:
+        pass
+
+
+def _is_running(pid):
+    if os.name == "nt":
+        return True  # os.kill would terminate it
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Totals summed over every worker (or just this process without METRICS_DIR)."""
+    if not settings.METRICS_DIR:
+        snapshots = [_snapshot()]
+    else:
+        flush()
+        snapshots = []
+        for entry in os.scandir(settings.METRICS_DIR):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue  # being replaced, or a worker died mid-write
+            pid = entry.name[:-len(".json")]
+            if pid.isdigit() and not _is_running(int(pid)):
+                # A killed worker never lowered its gauges; its counters still count
+                snapshot = [item for item in snapshot if METRICS.get(item[0], ("",))[0] != "gauge"]
+            snapshots.append(snapshot)
+
+    totals = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            if isinstance(value, list):
+                current = totals.get(key)
+                totals[key] = value if current is None else [a + b for a, b in zip(current, value)]
+            else:
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+# -------------------------
+# Text format
+# -------------------------
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _series(name, labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return name
+    return name + "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render(extra_gauges=None):
+    """
+    All metrics in the Prometheus text exposition format. `extra_gauges` maps a name to
+    (help, value) for values computed at scrape time.
+    """
+    totals = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = sorted((labels, value) for (n, labels), value in totals.items() if n == name)
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in series:
+            if kind != "histogram":
+                lines.append(f"{_series(name, labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                lines.append(f"{_series(name + '_bucket', labels, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{_series(name + '_bucket', labels, [('le', '+Inf')])} {value[-1]}")
+            lines.append(f"{_series(name + '_sum', labels)} {value[-2]}")
+            lines.append(f"{_series(name + '_count', labels)} {value[-1]}")
+
+    for name, (help_text, value) in (extra_gauges or {}).items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,136 @@
+import logging
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connections
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryRecorder:
+    """execute_wrapper that counts the queries run through it and their total time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+    @property
+    def milliseconds(self):
+        return round(self.seconds * 1000, 1)
+
+
+@contextmanager
+def record_queries():
+    """Record the queries run on every database connection inside the block."""
+    recorder = QueryRecorder()
+    wrappers = [connection.execute_wrapper(recorder) for connection in connections.all()]
+    for wrapper in wrappers:
+        wrapper.__enter__()
+    try:
+        yield recorder
+    finally:
+        for wrapper in reversed(wrappers):
+            wrapper.__exit__(None, None, None)
+
+
+def budget_for(url_name):
+    """(max queries, max DB milliseconds) for a URL name; either may be None for no limit."""
+    queries = settings.QUERY_BUDGETS.get(url_name, settings.QUERY_BUDGET_DEFAULT)
+    return queries, settings.QUERY_TIME_BUDGET_MS
+
+
+def budget_violation(url_name, recorder):
+    """A description of how a request went over its budget, or None when it did not."""
+    max_queries, max_ms = budget_for(url_name)
+    if max_queries is not None and recorder.count > max_queries:
+        return f"{url_name}: {recorder.count} queries (budget {max_queries})"
+    if max_ms is not None and recorder.milliseconds > max_ms:
+        return f"{url_name}: {recorder.milliseconds} ms in the database (budget {max_ms} ms)"
+    return None
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts the queries and DB time of every request and checks them against the budget
+    of its URL name (settings.QUERY_BUDGETS). Violations are logged, or raised when
+    QUERY_BUDGET_STRICT is on (as in tests and CI).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with record_queries() as recorder:
+            request.query_recorder = recorder
+            response = self.get_response(request)
+
+        match = getattr(request, "resolver_match", None)
+        url_name = match.url_name if match else None
+        if url_name is None:
+            return response
+
+        if settings.DEBUG:
+            response["Server-Timing"] = f'db;dur={recorder.milliseconds};desc="{recorder.count} queries"'
+
+        violation = budget_violation(url_name, recorder)
+        if violation:
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(violation)
+            logger.warning("Query budget exceeded: %s (%s)", violation, request.path)
+        return response
+
+
+class MetricsMiddleware:
+    """Records latency, status and DB usage of every routed request by URL name (see asloj.metrics)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return response
+        labels = {"view": match.url_name or match.view_name}
+        metrics.observe("asloj_http_request_seconds", elapsed, labels)
+        metrics.inc("asloj_http_requests_total", {**labels, "status": response.status_code})
+
+        recorder = getattr(request, "query_recorder", None)
+        if recorder is not None:
+            metrics.observe("asloj_db_queries", recorder.count, labels)
+            metrics.observe("asloj_db_seconds", recorder.seconds, labels)
+        return response
+
+
+def assert_query_budget(client, path, method="get", **kwargs):
+    """
+    Test helper: request `path` with a test client and fail if the view goes over its
+    budget. Returns the response.
+
+        response = assert_query_budget(self.client, reverse("leaderboard"))
+    """
+    with record_queries() as recorder:
+        response = getattr(client, method)(path, **kwargs)
+
+    match = getattr(response, "resolver_match", None)
+    url_name = match.url_name if match else path
+    violation = budget_violation(url_name, recorder)
+    if violation:
+        raise AssertionError(f"Query budget exceeded: {violation}")
+    return response
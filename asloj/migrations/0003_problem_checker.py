@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:54
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asloj', '0002_user_pfp_user_phone_user_points_contest_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='checker',
+            field=models.FileField(blank=True, null=True, upload_to='checkers/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['cpp', 'cc', 'cxx', 'py'])]),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='checker_language',
+            field=models.CharField(blank=True, choices=[('cpp', 'C++ (testlib)'), ('py', 'Python')], max_length=10),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asloj', '0003_problem_checker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contestsubmission',
+            name='reused',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='contestsubmission',
+            name='source_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='contestsubmission',
+            name='test_data_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contestsubmission',
+            name='test_results',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='test_data_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='reused',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='source_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='test_data_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='test_results',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddIndex(
+            model_name='contestsubmission',
+            index=models.Index(fields=['problem', 'language', 'source_hash', 'test_data_version'], name='asloj_conte_problem_0135d3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['problem', 'language', 'source_hash', 'test_data_version'], name='asloj_submi_problem_6cc0d2_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:56
+
+from django.db import migrations, models
+
+
+def number_existing_tests(apps, schema_editor):
+    # Existing tests were paired by id order, so keep that pairing as their index
+    for model_name in ('TestInput', 'TestOutput'):
+        model = apps.get_model('asloj', model_name)
+        counters = {}
+        changed = []
+        for test in model.objects.order_by('problem_id', 'id'):
+            counters[test.problem_id] = counters.get(test.problem_id, 0) + 1
+            test.index = counters[test.problem_id]
+            changed.append(test)
+        model.objects.bulk_update(changed, ['index'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asloj', '0004_submission_dedup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testinput',
+            name='index',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='testinput',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='testinput',
+            name='size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='testoutput',
+            name='index',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='testoutput',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='testoutput',
+            name='size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(number_existing_tests, migrations.RunPython.noop),
+    ]
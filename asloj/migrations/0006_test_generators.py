@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-19 00:58
+
+import asloj.models
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asloj', '0005_test_data_bundles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='generator',
+            field=models.FileField(blank=True, null=True, upload_to='generators/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['cpp', 'cc', 'cxx', 'py'])]),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='generator_language',
+            field=models.CharField(blank=True, choices=[('cpp', 'C++ (testlib)'), ('py', 'Python')], max_length=10),
+        ),
+        migrations.AddField(
+            model_name='testinput',
+            name='generator_args',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='testinput',
+            name='file',
+            field=models.FileField(blank=True, upload_to=asloj.models.test_input_upload_to),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asloj', '0007_test_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContestStanding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('best_points', models.IntegerField(default=0)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('wrong_attempts', models.PositiveIntegerField(default=0)),
+                ('penalty', models.PositiveIntegerField(default=0)),
+                ('first_ac_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('contest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings', to='asloj.contest')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contest_standings', to='asloj.problem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contest_standings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('contest', 'user', 'problem'), name='unique_contest_standing')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asloj', '0008_contest_standings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contest',
+            name='freeze_minutes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contest',
+            name='scoring',
+            field=models.CharField(choices=[('IOI', 'IOI (points)'), ('ICPC', 'ICPC (solved + penalty)')], default='IOI', max_length=4),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asloj', '0010_points_ledger'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_staff', False)), fields=['-points', 'id'], name='user_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asloj', '0012_daily_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('solved_problems', models.JSONField(blank=True, default=list)),
+                ('easy_solved', models.PositiveIntegerField(default=0)),
+                ('medium_solved', models.PositiveIntegerField(default=0)),
+                ('hard_solved', models.PositiveIntegerField(default=0)),
+                ('current_streak', models.PositiveIntegerField(default=0)),
+                ('best_streak', models.PositiveIntegerField(default=0)),
+                ('last_solved_on', models.DateField(blank=True, null=True)),
+                ('contests_entered', models.PositiveIntegerField(default=0)),
+                ('best_contest_points', models.IntegerField(default=0)),
+                ('last_submission_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asloj', '0014_problem_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contestsubmission',
+            index=models.Index(fields=['contest', 'user', '-created_at'], name='contest_sub_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contestsubmission',
+            index=models.Index(fields=['contest', 'user', 'problem', 'created_at'], name='contest_sub_standing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['user', '-created_at'], name='submission_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('status', 'AC')), fields=['user', 'problem'], name='submission_user_ac_idx'),
+        ),
+    ]
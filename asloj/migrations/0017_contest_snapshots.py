@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asloj', '0016_rendered_statements'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContestSnapshot',
+            fields=[
+                ('contest', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='asloj.contest')),
+                ('data', models.BinaryField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('participants', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ContestResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField()),
+                ('total_points', models.IntegerField(default=0)),
+                ('solved', models.PositiveIntegerField(default=0)),
+                ('penalty', models.PositiveIntegerField(default=0)),
+                ('contest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='asloj.contest')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contest_results', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'contest'), name='unique_contest_result')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asloj', '0019_judge_error_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='test_data_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='test_data_status',
+            field=models.CharField(choices=[('READY', 'Ready'), ('BUILDING', 'Building'), ('FAILED', 'Failed')], default='READY', max_length=10),
+        ),
+    ]
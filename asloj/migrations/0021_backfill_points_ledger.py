@@ -0,0 +1,33 @@
+from django.db import migrations
+from django.db.models import Max
+
+
+def backfill_points_ledger(apps, schema_editor):
+    # Points credited before the ledger existed are already in User.points; without their
+    # ledger entries the next AC on the same problem would be credited a second time.
+    ContestSubmission = apps.get_model('asloj', 'ContestSubmission')
+    PointsLedger = apps.get_model('asloj', 'PointsLedger')
+    best = (
+        ContestSubmission.objects.filter(status='AC')
+        .values('user_id', 'contest_id', 'problem_id')
+        .annotate(best=Max('points'))
+        .order_by()
+    )
+    PointsLedger.objects.bulk_create(
+        (PointsLedger(user_id=row['user_id'], contest_id=row['contest_id'], problem_id=row['problem_id'],
+                      points=row['best'])
+         for row in best.iterator(chunk_size=2000)),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asloj', '0020_problem_test_data_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_points_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asloj', '0021_backfill_points_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contestsubmission',
+            index=models.Index(condition=models.Q(('status', 'P')), fields=['created_at'], name='contest_sub_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('status', 'P')), fields=['created_at'], name='submission_pending_idx'),
+        ),
+    ]
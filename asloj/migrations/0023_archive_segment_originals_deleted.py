@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asloj', '0022_pending_submission_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivesegment',
+            name='originals_deleted',
+            field=models.BooleanField(default=False),
+        ),
+    ]
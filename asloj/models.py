@@ -3,6 +3,7 @@ from django.core.validators import FileExtensionValidator
 from django.db import models
 from mysite import settings
 from django.utils import timezone
+from datetime import timedelta
 from ckeditor.fields import RichTextField
 
 class UserManager(BaseUserManager):
@@ -56,6 +57,16 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     objects = UserManager()
 
+    class Meta:
+        indexes = [
+            # Rank lookups count the ranked users above a score, so they only walk this index
+            models.Index(
+                fields=['-points', 'id'],
+                name='user_rank_idx',
+                condition=models.Q(is_active=True, is_staff=False),
+            ),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -72,9 +83,52 @@ class Problem(models.Model):
                                   default='Easy')
     time_limit = models.IntegerField(default=1)  # in seconds
 
+    # Optional special checker, used instead of plain output comparison
+    CHECKER_LANGUAGE_CHOICES = [
+        ("cpp", "C++ (testlib)"),
+        ("py", "Python"),
+    ]
+    checker = models.FileField(
+        upload_to="checkers/",
+        blank=True,
+        null=True,
+        validators=[FileExtensionValidator(allowed_extensions=['cpp', 'cc', 'cxx', 'py'])]
+    )
+    checker_language = models.CharField(max_length=10, choices=CHECKER_LANGUAGE_CHOICES, blank=True)
+
+    # Optional generator for large tests, run as `generator <args>` to produce an input on the judge
+    generator = models.FileField(
+        upload_to="generators/",
+        blank=True,
+        null=True,
+        validators=[FileExtensionValidator(allowed_extensions=['cpp', 'cc', 'cxx', 'py'])]
+    )
+    generator_language = models.CharField(max_length=10, choices=CHECKER_LANGUAGE_CHOICES, blank=True)
+
+    # Bumped whenever anything that affects verdicts changes (tests, checker, time limit)
+    test_data_version = models.PositiveIntegerField(default=1)
+
+    # Test data bundles are built in the background; submissions wait until the build succeeds
+    TEST_DATA_STATUS_CHOICES = [
+        ('READY', 'Ready'),
+        ('BUILDING', 'Building'),
+        ('FAILED', 'Failed'),
+    ]
+    test_data_status = models.CharField(max_length=10, choices=TEST_DATA_STATUS_CHOICES, default='READY')
+    test_data_error = models.TextField(blank=True)
+
+    # Sanitized statement, specifications and examples, rendered on save (see asloj.statements)
+    statement_html = models.TextField(blank=True, editable=False)
+    statement_hash = models.CharField(max_length=64, blank=True, editable=False)
+    statement_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+
     def __str__(self):
         return f"{self.title}"
 
+    @property
+    def accepts_submissions(self):
+        return self.test_data_status == 'READY'
+
 def test_input_upload_to(instance, filename):
     return f"problems/{instance.problem.problem_id}/test_inputs/{filename}"
 
@@ -83,7 +137,15 @@ def test_output_upload_to(instance, filename):
 
 class TestInput(models.Model):
     problem = models.ForeignKey('Problem', on_delete=models.CASCADE, related_name='test_inputs')
-    file = models.FileField(upload_to=test_input_upload_to)
+    file = models.FileField(upload_to=test_input_upload_to, blank=True)
+    index = models.PositiveIntegerField(default=0)  # inputs and outputs are paired by this
+
+    # Generated tests have no file; the input comes from the problem's generator instead
+    generator_args = models.CharField(max_length=255, blank=True)
+
+    # Filled in when the problem's test data bundle is built
+    sha256 = models.CharField(max_length=64, blank=True)
+    size = models.PositiveBigIntegerField(default=0)
 
     def __str__(self):
         return f"{self.problem.title} - {self.file.name}"
@@ -92,11 +154,37 @@ class TestInput(models.Model):
 class TestOutput(models.Model):
     problem = models.ForeignKey('Problem', on_delete=models.CASCADE, related_name='test_outputs')
     file = models.FileField(upload_to=test_output_upload_to)
+    index = models.PositiveIntegerField(default=0)  # inputs and outputs are paired by this
+
+    # Filled in when the problem's test data bundle is built
+    sha256 = models.CharField(max_length=64, blank=True)
+    size = models.PositiveBigIntegerField(default=0)
 
     def __str__(self):
         return f"{self.problem.title} - {self.file.name}"
 
 
+class TestUpload(models.Model):
+    """A zip/tar archive of tests being unpacked in the background."""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('PROCESSING', 'Processing'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+    problem = models.ForeignKey('Problem', on_delete=models.CASCADE, related_name='test_uploads')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='test_uploads')
+    archive = models.FileField(upload_to="test_uploads/")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.problem.title} - {self.archive.name} ({self.status})"
+
+
 class Example(models.Model):
     problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='examples')
     input = models.TextField()
@@ -128,13 +216,31 @@ class Submission(models.Model):
         ("WA", "Wrong Answer"),
         ("RE", "Runtime Error"),
         ("TLE", "Time Limit Exceeded"),
+        ("JE", "Judge Error"),
     ]
 
     language = models.CharField(max_length=10, choices=LANGUAGE_CHOICES, )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="P")
+    test_results = models.JSONField(default=list, blank=True)
+
+    # Identical resubmissions reuse the verdict of an earlier judged one
+    source_hash = models.CharField(max_length=64, blank=True)
+    test_data_version = models.PositiveIntegerField(default=0)
+    reused = models.BooleanField(default=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['problem', 'language', 'source_hash', 'test_data_version']),
+            # A user's submissions newest first (profile, home page, submission list)
+            models.Index(fields=['user', '-created_at'], name='submission_user_recent_idx'),
+            # "Has this user solved this problem" checks and solved-set rebuilds
+            models.Index(fields=['user', 'problem'], name='submission_user_ac_idx', condition=models.Q(status='AC')),
+            # Only the few submissions still waiting for a verdict, counted on every /metrics scrape
+            models.Index(fields=['created_at'], name='submission_pending_idx', condition=models.Q(status='P')),
+        ]
+
 
 class Discussion(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='discussions')
@@ -188,6 +294,13 @@ class Contest(models.Model):
     problems = models.ManyToManyField(Problem, blank=True, related_name='contests')
     creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_contests')
 
+    SCORING_CHOICES = [
+        ('IOI', 'IOI (points)'),
+        ('ICPC', 'ICPC (solved + penalty)'),
+    ]
+    scoring = models.CharField(max_length=4, choices=SCORING_CHOICES, default='IOI')
+    freeze_minutes = models.PositiveIntegerField(default=0)  # scoreboard freeze before the end, 0 = none
+
     def __str__(self):
         return self.name
 
@@ -195,22 +308,25 @@ class Contest(models.Model):
         now = timezone.now()
         return self.start_time <= now <= self.end_time
 
+    def freeze_time(self):
+        if not self.freeze_minutes:
+            return None
+        return self.end_time - timedelta(minutes=self.freeze_minutes)
+
+    def is_frozen(self):
+        """The scoreboard is frozen from freeze_time until the contest ends."""
+        freeze_time = self.freeze_time()
+        return freeze_time is not None and freeze_time <= timezone.now() < self.end_time
+
     def user_points(self, user):
         """
-        Calculate total points for a user in this contest.
-        Only the best submission per problem counts.
+        Calculate total points for a user in this contest, as the scoreboard does:
+        the best submission per problem counts, partial scores included.
         """
-        total_points = 0
-        problems = self.problems.all()
-        for problem in problems:
-            best_submission = self.submissions.filter(
-                user=user,
-                problem=problem,
-                status="AC"  # optional: only count accepted submissions
-            ).order_by('-points').first()
-            if best_submission:
-                total_points += best_submission.points
-        return total_points
+        total = self.standings.filter(user=user).aggregate(
+            total=models.Sum('best_points')
+        )['total']
+        return total or 0
 
 class ContestRegistration(models.Model):
     contest = models.ForeignKey(Contest, on_delete=models.CASCADE, related_name='registrations')
@@ -247,12 +363,205 @@ class ContestSubmission(models.Model):
         ("WA", "Wrong Answer"),
         ("RE", "Runtime Error"),
         ("TLE", "Time Limit Exceeded"),
+        ("JE", "Judge Error"),
     ]
 
     language = models.CharField(max_length=10, choices=LANGUAGE_CHOICES)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="P")
+    test_results = models.JSONField(default=list, blank=True)
+
+    # Identical resubmissions reuse the verdict of an earlier judged one
+    source_hash = models.CharField(max_length=64, blank=True)
+    test_data_version = models.PositiveIntegerField(default=0)
+    reused = models.BooleanField(default=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['problem', 'language', 'source_hash', 'test_data_version']),
+            # A contestant's submission list
+            models.Index(fields=['contest', 'user', '-created_at'], name='contest_sub_user_recent_idx'),
+            # Per-problem verdicts and standings rebuilds, read in (user, problem, time) order
+            models.Index(fields=['contest', 'user', 'problem', 'created_at'], name='contest_sub_standing_idx'),
+            models.Index(fields=['created_at'], name='contest_sub_pending_idx', condition=models.Q(status='P')),
+        ]
 
+    def __str__(self):
+        return f"{self.problem.title} ({self.status})"
+
+class ContestStanding(models.Model):
+    """
+    One row per (contest, user, problem), updated incrementally as submissions are judged.
+    A user's total is the sum of their rows, so the standings need no per-problem queries.
+    """
+    contest = models.ForeignKey(Contest, on_delete=models.CASCADE, related_name='standings')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='contest_standings')
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='contest_standings')
+
+    best_points = models.IntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    wrong_attempts = models.PositiveIntegerField(default=0)  # counted until the first AC
+    penalty = models.PositiveIntegerField(default=0)  # ICPC penalty in minutes, set on the first AC
+    first_ac_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['contest', 'user', 'problem'], name='unique_contest_standing'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.problem.title} ({self.best_points})"
+
+
+class PointsLedger(models.Model):
+    """
+    The points a user has been credited for each contest problem (their best AC score).
+    User.points is the sum of these rows and only ever changes by the delta of an improvement.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='points_ledger')
+    contest = models.ForeignKey(Contest, on_delete=models.CASCADE, related_name='points_ledger')
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='points_ledger')
+    points = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'contest', 'problem'], name='unique_points_ledger_entry'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.problem.title}: {self.points}"
+
+
+class DailyActivity(models.Model):
+    """Per-user, per-day submission counts (local dates), kept up to date as submissions are judged."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_activity')
+    date = models.DateField()
+    ac_count = models.PositiveIntegerField(default=0)
+    attempt_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_daily_activity'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.date}: {self.ac_count}/{self.attempt_count}"
+
+
+class UserStats(models.Model):
+    """
+    Per-user profile counters, updated as verdicts come in so a profile renders from this one row.
+    Solved counts cover practice submissions; contest counters cover contest submissions.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name='stats')
+    solved_problems = models.JSONField(default=list, blank=True)  # ids of problems with a practice AC
+    easy_solved = models.PositiveIntegerField(default=0)
+    medium_solved = models.PositiveIntegerField(default=0)
+    hard_solved = models.PositiveIntegerField(default=0)
+
+    # Consecutive local days with at least one practice AC, ending on last_solved_on
+    current_streak = models.PositiveIntegerField(default=0)
+    best_streak = models.PositiveIntegerField(default=0)
+    last_solved_on = models.DateField(null=True, blank=True)
+
+    contests_entered = models.PositiveIntegerField(default=0)
+    best_contest_points = models.IntegerField(default=0)  # best score of a single contest submission
+    last_submission_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def problems_solved(self):
+        return len(self.solved_problems)
+
+    def difficulty_stats(self):
+        return {'Easy': self.easy_solved, 'Medium': self.medium_solved, 'Hard': self.hard_solved}
+
+    def streak_on(self, day):
+        """The streak as seen on `day`: it only breaks once a whole day passes without an AC."""
+        if self.last_solved_on and (day - self.last_solved_on).days <= 1:
+            return self.current_streak
+        return 0
+
+    def __str__(self):
+        return f"{self.user} - {self.problems_solved} solved"
+
+
+class ProblemStats(models.Model):
+    """Per-problem practice counters, updated as submissions are judged."""
+    problem = models.OneToOneField(Problem, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    attempts = models.PositiveIntegerField(default=0)
+    accepted = models.PositiveIntegerField(default=0)
+    solvers = models.PositiveIntegerField(default=0)  # distinct users with an AC
+    by_language = models.JSONField(default=dict, blank=True)  # {"py": {"attempts": n, "accepted": n}, ...}
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def acceptance_rate(self):
+        return round(100 * self.accepted / self.attempts, 1) if self.attempts else 0
+
+    def __str__(self):
+        return f"{self.problem.title}: {self.accepted}/{self.attempts}"
+
+
+class ContestSnapshot(models.Model):
+    """
+    Final standings and per-problem stats of an ended contest, written once as compressed
+    JSON (see asloj.snapshots). Reads of a finished contest never touch its submissions again.
+    """
+    contest = models.OneToOneField(Contest, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+    data = models.BinaryField()  # zlib-compressed JSON
+    sha256 = models.CharField(max_length=64)  # of the uncompressed JSON
+    participants = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.contest} (final, {self.participants} participants)"
+
+
+class ContestResult(models.Model):
+    """A user's final row of an ended contest, copied from its snapshot for profile history and exports."""
+    contest = models.ForeignKey(Contest, on_delete=models.CASCADE, related_name='results')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='contest_results')
+    rank = models.PositiveIntegerField()
+    total_points = models.IntegerField(default=0)
+    solved = models.PositiveIntegerField(default=0)
+    penalty = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves a user's history lookups
+            models.UniqueConstraint(fields=['user', 'contest'], name='unique_contest_result'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.contest}: #{self.rank}"
+
+
+class ArchiveSegment(models.Model):
+    """One compressed file of old submission sources (see asloj.archive)."""
+    path = models.CharField(max_length=255, unique=True)  # relative to SUBMISSION_ARCHIVE_DIR
+    file_count = models.PositiveIntegerField(default=0)
+    size = models.BigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set once the media copies of its files are gone; until then every run retries the deletes
+    originals_deleted = models.BooleanField(default=False)
 
     def __str__(self):
-        return f"{self.problem.title} ({self.status})"
\ No newline at end of file
+        return f"{self.path} ({self.file_count} files)"
+
+
+class ArchivedFile(models.Model):
+    """Where an archived media file lives: a zlib-compressed byte range of a segment."""
+    name = models.CharField(max_length=255, unique=True)  # the FileField name, e.g. submissions/main.py
+    segment = models.ForeignKey(ArchiveSegment, on_delete=models.PROTECT, related_name='files')
+    offset = models.BigIntegerField()
+    length = models.PositiveIntegerField()  # compressed bytes
+    size = models.PositiveIntegerField()  # original bytes
+    sha256 = models.CharField(max_length=64)
+
+    def __str__(self):
+        return self.name
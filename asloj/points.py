@@ -0,0 +1,81 @@
+from django.db import transaction
+from django.db.models import F, Max
+from .models import ContestSubmission, PointsLedger, User
+from .ranking import invalidate_leaderboard
+
+
+def credit_points(submission):
+    """
+    Credit a judged contest submission to its user's points. Only an improvement of the
+    user's best AC score on that (contest, problem) changes anything, and then User.points
+    moves by exactly the difference. Returns the delta applied.
+    """
+    if submission.status != "AC":
+        return 0
+
+    with transaction.atomic():
+        entry, _ = PointsLedger.objects.select_for_update().get_or_create(
+            user_id=submission.user_id,
+            contest_id=submission.contest_id,
+            problem_id=submission.problem_id,
+        )
+        delta = submission.points - entry.points
+        if delta <= 0:
+            return 0
+
+        entry.points = submission.points
+        entry.save(update_fields=["points", "updated_at"])
+        User.objects.filter(pk=submission.user_id).update(points=F("points") + delta)
+    invalidate_leaderboard()
+    return delta
+
+
+def expected_ledger():
+    """Best AC points per (user, contest, problem), recomputed from ContestSubmission."""
+    rows = (
+        ContestSubmission.objects.filter(status="AC")
+        .values("user_id", "contest_id", "problem_id")
+        .annotate(points=Max("points"))
+    )
+    return {(r["user_id"], r["contest_id"], r["problem_id"]): r["points"] for r in rows}
+
+
+def reconcile_points(fix=False):
+    """
+    Compare the ledger and User.points with what ContestSubmission says they should be.
+    Returns (ledger_mismatches, user_mismatches); with fix=True both are corrected.
+    """
+    expected = expected_ledger()
+    actual = {
+        (e.user_id, e.contest_id, e.problem_id): e.points
+        for e in PointsLedger.objects.all()
+    }
+    ledger_mismatches = {
+        key: (actual.get(key, 0), expected.get(key, 0))
+        for key in set(expected) | set(actual)
+        if actual.get(key, 0) != expected.get(key, 0)
+    }
+
+    expected_totals = {}
+    for (user_id, _, _), points in expected.items():
+        expected_totals[user_id] = expected_totals.get(user_id, 0) + points
+    user_mismatches = {
+        user_id: (points, expected_totals.get(user_id, 0))
+        for user_id, points in User.objects.values_list("id", "points")
+        if points != expected_totals.get(user_id, 0)
+    }
+
+    if fix and (ledger_mismatches or user_mismatches):
+        with transaction.atomic():
+            PointsLedger.objects.all().delete()
+            PointsLedger.objects.bulk_create(
+                [PointsLedger(user_id=u, contest_id=c, problem_id=p, points=points)
+                 for (u, c, p), points in expected.items()],
+                batch_size=1000,
+            )
+            for user_id, (_, points) in user_mismatches.items():
+                User.objects.filter(pk=user_id).update(points=points)
+        invalidate_leaderboard()
+
+    return ledger_mismatches, user_mismatches
+
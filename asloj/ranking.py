@@ -0,0 +1,182 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from .models import User
+
+LEADERBOARD_VERSION_KEY = "leaderboard:version"
+
+
+def ranked_users():
+    """Everyone who appears on the leaderboard, best first; ties are broken by id."""
+    return User.objects.filter(is_active=True, is_staff=False).order_by('-points', 'id')
+
+
+def rank_for_points(points):
+    """Competition ranking: users with equal points share a rank (1, 2, 2, 4)."""
+    return ranked_users().filter(points__gt=points).count() + 1
+
+
+def get_user_rank(user):
+    """Global rank of a user with a single indexed COUNT, or None if they are not ranked."""
+    if not user.is_active or user.is_staff:
+        return None
+    return rank_for_points(user.points)
+
+
+def attach_ranks(users):
+    """
+    Set `.rank` on users taken in leaderboard order, consistent with get_user_rank().
+    One indexed COUNT places the first row; since the rows are consecutive, every later
+    rank follows from its position and ties.
+    """
+    users = list(users)
+    if not users:
+        return users
+    first = users[0]
+    counts = ranked_users().aggregate(
+        higher=Count("id", filter=Q(points__gt=first.points)),
+        before=Count("id", filter=_above(first.points, first.id)),
+    )
+    rank = counts["higher"] + 1
+    for position, user in enumerate(users):
+        if position and user.points != users[position - 1].points:
+            rank = counts["before"] + position + 1
+        user.rank = rank
+    return users
+
+
+# -------------------------
+# Leaderboard pages
+# -------------------------
+def leaderboard_version():
+    return cache.get_or_set(LEADERBOARD_VERSION_KEY, 1, timeout=None)
+
+
+def invalidate_leaderboard():
+    """Called whenever points change; cached pages under the old version are simply never read again."""
+    cache.set(LEADERBOARD_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def encode_cursor(user):
+    return f"{user.points}_{user.id}"
+
+
+def decode_cursor(cursor):
+    try:
+        points, user_id = cursor.split("_")
+        return int(points), int(user_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _below(points, user_id):
+    """Users after (points, id) in leaderboard order."""
+    return Q(points__lt=points) | Q(points=points, id__gt=user_id)
+
+
+def _above(points, user_id):
+    """Users before (points, id) in leaderboard order."""
+    return Q(points__gt=points) | Q(points=points, id__lt=user_id)
+
+
+def _page(users, has_prev, has_next):
+    users = attach_ranks(users)
+    return {
+        "users": users,
+        "has_prev": has_prev,
+        "has_next": has_next,
+        "prev_cursor": encode_cursor(users[0]) if users else None,
+        "next_cursor": encode_cursor(users[-1]) if users else None,
+    }
+
+
+def keyset_page(after=None, before=None, size=None):
+    """
+    One leaderboard page, keyed by the (points, id) of a neighbouring row instead of an
+    OFFSET, so every page costs the same no matter how deep it is.
+    """
+    size = size or settings.LEADERBOARD_PAGE_SIZE
+    users = ranked_users()
+
+    if before is not None:
+        rows = list(users.filter(_above(*before)).order_by("points", "-id")[:size + 1])
+        has_prev = len(rows) > size
+        return _page(list(reversed(rows[:size])), has_prev, True)
+
+    if after is not None:
+        users = users.filter(_below(*after))
+    rows = list(users[:size + 1])
+    return _page(rows[:size], after is not None, len(rows) > size)
+
+
+def page_around(user, size=None):
+    """The leaderboard page with `user` roughly in the middle."""
+    size = size or settings.LEADERBOARD_PAGE_SIZE
+    users = ranked_users()
+    above = list(users.filter(_above(user.points, user.id)).order_by("points", "-id")[:size // 2 + 1])
+    has_prev = len(above) > size // 2
+    above = list(reversed(above[:size // 2]))
+
+    rest = list(users.filter(Q(points__lt=user.points) | Q(points=user.points, id__gte=user.id))[:size - len(above) + 1])
+    has_next = len(rest) > size - len(above)
+    return _page(above + rest[:size - len(above)], has_prev, has_next)
+
+
+def _page_key(version, page_number):
+    return f"leaderboard:{version}:page:{page_number}"
+
+
+def _is_canonical(version, page_number, after, before):
+    """
+    Whether the cursors lead to the page_number reached by paging from the top: page 1
+    has none, and a later page was reached from a cached neighbour. Only these pages are
+    cached, so arbitrary cursors cannot fill the cache.
+    """
+    if after is None and before is None:
+        return page_number == 1
+    if after is not None and before is not None:
+        return False
+    neighbour = cache.get(_page_key(version, page_number - 1 if after else page_number + 1))
+    if neighbour is None:
+        return False
+    cursor = neighbour["next_cursor"] if after else neighbour["prev_cursor"]
+    return decode_cursor(cursor) == (after or before)
+
+
+def cached_keyset_page(page_number, after=None, before=None):
+    """
+    keyset_page() with the first LEADERBOARD_CACHED_PAGES pages cached until points change.
+    Rows are cached as plain dicts so cached and fresh pages look the same to templates.
+    """
+    def as_dicts(page):
+        page["users"] = [
+            {"id": u.id, "full_name": u.full_name, "university_id": u.university_id,
+             "points": u.points, "rank": u.rank}
+            for u in page["users"]
+        ]
+        return page
+
+    version = leaderboard_version()
+    if page_number > settings.LEADERBOARD_CACHED_PAGES or not _is_canonical(version, page_number, after, before):
+        return as_dicts(keyset_page(after=after, before=before))
+
+    key = _page_key(version, page_number)
+    page = cache.get(key)
+    if page is None:
+        page = as_dicts(keyset_page(after=after, before=before))
+        cache.set(key, page, timeout=settings.LEADERBOARD_CACHE_SECONDS)
+    return page
+
+
+def cursor_for_page(page_number, size=None):
+    """
+    The `after` cursor of a page in the old ?page=N numbering, found with one OFFSET query.
+    None for page 1 or when the page is past the end.
+    """
+    size = size or settings.LEADERBOARD_PAGE_SIZE
+    if page_number <= 1:
+        return None
+    offset = (page_number - 1) * size - 1
+    rows = list(ranked_users().only("id", "points")[offset:offset + 1])
+    return encode_cursor(rows[0]) if rows else None
@@ -0,0 +1,156 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .cache import invalidate_fragment
+from .models import (Contest, ContestRegistration, ContestSubmission, Example, Problem, ProblemStats, Submission,
+                     TestInput, TestOutput, User, UserStats)
+from .ranking import invalidate_leaderboard
+from .snapshots import discard_final_snapshot
+from .statements import render_statement, save_rendered_statement
+from .stats import rebuild_user_stats_on_commit, record_registration
+from .testdata import remove_bundles
+
+
+@receiver(post_save, sender=TestInput)
+@receiver(post_delete, sender=TestInput)
+@receiver(post_save, sender=TestOutput)
+@receiver(post_delete, sender=TestOutput)
+def bump_test_data_version(sender, instance, **kwargs):
+    """Any change to a problem's tests invalidates verdicts judged against the old ones."""
+    Problem.objects.filter(pk=instance.problem_id).update(test_data_version=F('test_data_version') + 1)
+
+
+@receiver(post_delete, sender=TestInput)
+@receiver(post_delete, sender=TestOutput)
+def delete_test_file(sender, instance, **kwargs):
+    # Replaced or deleted tests would otherwise stay on disk forever
+    if instance.file:
+        name, storage = instance.file.name, instance.file.storage
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_delete, sender=Problem)
+def delete_test_data_bundles(sender, instance, **kwargs):
+    remove_bundles(instance)
+
+
+@receiver(pre_save, sender=Problem)
+def render_problem_statement(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'statement', 'input_specification', 'output_specification'} & set(update_fields):
+        render_statement(instance)
+
+
+@receiver(post_save, sender=Example)
+@receiver(post_delete, sender=Example)
+def example_changed(sender, instance, **kwargs):
+    # Examples are part of the rendered statement
+    problem = Problem.objects.filter(pk=instance.problem_id).first()
+    if problem is None:
+        return  # deleted along with its problem
+    save_rendered_statement(problem)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login; anything else may have changed points or who is ranked
+    if update_fields is None or 'points' in update_fields or 'is_active' in update_fields:
+        invalidate_leaderboard()
+
+
+# -------------------------
+# Stats
+# -------------------------
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Problem)
+def create_stats_row(sender, instance, created=False, raw=False, **kwargs):
+    # A new user or problem has no history, so its row starts empty instead of being built on first use
+    if created and not raw:
+        if sender is User:
+            UserStats.objects.get_or_create(user=instance)
+        else:
+            ProblemStats.objects.get_or_create(problem=instance)
+
+
+@receiver(post_save, sender=ContestRegistration)
+def registration_saved(sender, instance, created=False, **kwargs):
+    if created and instance.user_id:
+        record_registration(instance)
+
+
+@receiver(post_delete, sender=ContestRegistration)
+def registration_deleted(sender, instance, **kwargs):
+    # An update, not a save, so a row deleted along with its user is never written back
+    UserStats.objects.filter(user_id=instance.user_id, contests_entered__gt=0).update(
+        contests_entered=F('contests_entered') - 1
+    )
+
+
+@receiver(pre_save, sender=Problem)
+def remember_difficulty(sender, instance, update_fields=None, **kwargs):
+    instance._saved_difficulty = None
+    if instance.pk and (update_fields is None or 'difficulty' in update_fields):
+        instance._saved_difficulty = Problem.objects.filter(pk=instance.pk).values_list('difficulty', flat=True).first()
+
+
+@receiver(post_save, sender=Problem)
+def difficulty_changed(sender, instance, created=False, **kwargs):
+    # Solve counts per difficulty are kept per user, so the problem's solvers are rebuilt
+    saved = getattr(instance, '_saved_difficulty', None)
+    if not created and saved and saved != instance.difficulty:
+        rebuild_user_stats_on_commit(
+            Submission.objects.filter(problem=instance, status='AC').values_list('user_id', flat=True).distinct()
+        )
+
+
+@receiver(pre_delete, sender=Problem)
+def problem_deleting(sender, instance, **kwargs):
+    # Its submissions go with it, so everyone who submitted loses those solves and counters
+    rebuild_user_stats_on_commit(
+        Submission.objects.filter(problem=instance).values_list('user_id', flat=True).distinct()
+    )
+
+
+@receiver(pre_delete, sender=Contest)
+def contest_deleting(sender, instance, **kwargs):
+    user_ids = set(ContestSubmission.objects.filter(contest=instance).values_list('user_id', flat=True))
+    user_ids.update(ContestRegistration.objects.filter(contest=instance, user__isnull=False)
+                    .values_list('user_id', flat=True))
+    rebuild_user_stats_on_commit(user_ids)
+
+
+# -------------------------
+# Final snapshots
+# -------------------------
+@receiver(pre_save, sender=ContestSubmission)
+def remember_contest_verdict(sender, instance, **kwargs):
+    # Only looked up after the end, so saves during the contest cost nothing extra
+    instance._saved_status = None
+    if instance.pk and timezone.now() >= instance.contest.end_time:
+        saved = ContestSubmission.objects.filter(pk=instance.pk).values_list('status', flat=True)
+        instance._saved_status = saved.first()
+
+
+@receiver(post_save, sender=ContestSubmission)
+def contest_submission_rejudged(sender, instance, created=False, **kwargs):
+    # A new verdict for a submission made during the contest changes results that were finalized
+    saved = getattr(instance, '_saved_status', None)
+    if created or saved is None or saved == instance.status or instance.created_at >= instance.contest.end_time:
+        return
+    contest_id = instance.contest_id
+    transaction.on_commit(lambda: discard_final_snapshot(contest_id))
+
+
+# -------------------------
+# Cached fragments
+# -------------------------
+@receiver(post_save, sender=Contest)
+@receiver(post_delete, sender=Contest)
+def contest_changed(sender, instance, **kwargs):
+    invalidate_fragment("upcoming_contests")
+
+
+@receiver(post_save, sender=Submission)
+def submission_saved(sender, instance, **kwargs):
+    invalidate_fragment("home_recent_submissions", instance.user_id)
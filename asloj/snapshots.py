@@ -0,0 +1,123 @@
+"""
+Final snapshots of ended contests.
+
+Once a contest is over its results are fixed, so they are computed one last time and stored
+as a compressed JSON ContestSnapshot, plus one ContestResult row per participant for profile
+history and exports. A contest is finalized by the finalize_contests command (run it from
+cron) or lazily by the first read after it ends. Contests that still have pending submissions
+wait for them, at most CONTEST_FINALIZE_GRACE_MINUTES past the end. A new verdict for a
+submission made during the contest (a rejudge) discards the snapshot, and the next read
+finalizes the contest again.
+"""
+import hashlib
+import json
+import zlib
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import ContestResult, ContestSnapshot, ContestSubmission
+from .standings import build_scoreboard
+
+
+def _cache_key(contest_id):
+    return f"contest_snapshot:{contest_id}"
+
+
+def _problem_stats(contest):
+    """{problem_id: {"attempts", "accepted", "solvers"}} over the contest's judged submissions."""
+    per_problem = (
+        ContestSubmission.objects.filter(contest=contest).exclude(status="P")
+        .values("problem_id")
+        .annotate(
+            attempts=Count("id"),
+            accepted=Count("id", filter=Q(status="AC")),
+            solvers=Count("user_id", filter=Q(status="AC"), distinct=True),
+        )
+        .order_by()
+    )
+    return {row.pop("problem_id"): row for row in per_problem}
+
+
+def ready_to_finalize(contest, now=None):
+    now = now or timezone.now()
+    if now < contest.end_time:
+        return False
+    if now >= contest.end_time + timedelta(minutes=settings.CONTEST_FINALIZE_GRACE_MINUTES):
+        return True
+    return not ContestSubmission.objects.filter(contest=contest, status="P").exists()
+
+
+def finalize_contest(contest, force=False):
+    """
+    Write the final snapshot of an ended contest and return it, or None when the contest
+    is not ready. An existing snapshot is kept unless `force` (e.g. after a rejudge).
+    """
+    if not force:
+        existing = ContestSnapshot.objects.filter(contest=contest).first()
+        if existing is not None:
+            return existing
+    if not ready_to_finalize(contest):
+        return None
+
+    scoreboard = build_scoreboard(contest)
+    stats = _problem_stats(contest)
+    for problem in scoreboard["problems"]:
+        problem.update(stats.get(problem["problem_id"], {"attempts": 0, "accepted": 0, "solvers": 0}))
+    scoreboard["final"] = True
+
+    raw = json.dumps(scoreboard, separators=(",", ":")).encode()
+    results = [
+        ContestResult(contest=contest, user_id=row["user_id"], rank=row["rank"], total_points=row["total_points"],
+                      solved=row["solved"], penalty=row["penalty"])
+        for row in scoreboard["rows"]
+    ]
+    try:
+        with transaction.atomic():
+            if force:
+                ContestSnapshot.objects.filter(contest=contest).delete()
+                ContestResult.objects.filter(contest=contest).delete()
+            snapshot = ContestSnapshot.objects.create(
+                contest=contest, data=zlib.compress(raw, 9), sha256=hashlib.sha256(raw).hexdigest(),
+                participants=len(results),
+            )
+            ContestResult.objects.bulk_create(results, batch_size=1000)
+    except IntegrityError:
+        # Another request finalized it first
+        return ContestSnapshot.objects.get(contest=contest)
+
+    cache.delete(_cache_key(contest.id))
+    return snapshot
+
+
+def discard_final_snapshot(contest_id):
+    """Drop the final snapshot and results of a contest whose verdicts changed after the end."""
+    with transaction.atomic():
+        ContestSnapshot.objects.filter(contest_id=contest_id).delete()
+        ContestResult.objects.filter(contest_id=contest_id).delete()
+    cache.delete(_cache_key(contest_id))
+
+
+def final_scoreboard(contest):
+    """
+    The final scoreboard of an ended contest, in the shape of get_scoreboard's snapshots,
+    finalizing the contest on first use. None while the contest is running or not ready.
+    """
+    if timezone.now() < contest.end_time:
+        return None
+    key = _cache_key(contest.id)
+    final = cache.get(key)
+    if final is None:
+        snapshot = finalize_contest(contest)
+        if snapshot is None:
+            return None
+        final = {
+            "version": "final",
+            "built_at": snapshot.created_at.timestamp(),
+            "etag": snapshot.sha256[:32],
+            "scoreboard": json.loads(zlib.decompress(snapshot.data)),
+        }
+        cache.set(key, final, timeout=settings.CONTEST_SNAPSHOT_CACHE_SECONDS)
+    return final
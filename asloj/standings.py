@@ -0,0 +1,315 @@
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, Max, Q, Sum, When, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from . import metrics
+from .models import ContestStanding, ContestSubmission, ContestRegistration, User
+
+# Verdicts that never add an ICPC penalty
+NO_PENALTY_STATUSES = ("AC", "CE", "P", "JE")
+
+
+def _elapsed_minutes(contest, when):
+    return max(0, int((when - contest.start_time).total_seconds() // 60))
+
+
+# The whole incremental update is one INSERT ... ON CONFLICT, supported by both SQLite and PostgreSQL.
+# `excluded` holds the values of the row we tried to insert, i.e. this submission alone.
+UPSERT_SQL = """
+    INSERT INTO {table} (contest_id, user_id, problem_id, best_points, attempts, wrong_attempts,
+                         penalty, first_ac_at, updated_at)
+    VALUES (%s, %s, %s, %s, 1, %s, %s, %s, %s)
+    ON CONFLICT (contest_id, user_id, problem_id) DO UPDATE SET
+        best_points = CASE WHEN excluded.best_points > {table}.best_points
+                           THEN excluded.best_points ELSE {table}.best_points END,
+        attempts = {table}.attempts + 1,
+        wrong_attempts = CASE WHEN {table}.first_ac_at IS NULL
+                              THEN {table}.wrong_attempts + excluded.wrong_attempts
+                              ELSE {table}.wrong_attempts END,
+        penalty = CASE WHEN {table}.first_ac_at IS NULL AND excluded.first_ac_at IS NOT NULL
+                       THEN excluded.penalty + %s * {table}.wrong_attempts
+                       ELSE {table}.penalty END,
+        first_ac_at = COALESCE({table}.first_ac_at, excluded.first_ac_at),
+        updated_at = excluded.updated_at
+"""
+
+
+def record_submission(submission):
+    """Fold one judged ContestSubmission into the contest standings with a single upsert."""
+    contest = submission.contest
+    accepted = submission.status == "AC"
+    wrong = 0 if submission.status in NO_PENALTY_STATUSES else 1
+    first_ac_at = submission.created_at if accepted else None
+    penalty = _elapsed_minutes(contest, submission.created_at) if accepted else 0
+
+    ops = connection.ops
+    with connection.cursor() as cursor:
+        cursor.execute(
+            UPSERT_SQL.format(table=ops.quote_name(ContestStanding._meta.db_table)),
+            [
+                contest.id, submission.user_id, submission.problem_id, submission.points, wrong, penalty,
+                ops.adapt_datetimefield_value(first_ac_at), ops.adapt_datetimefield_value(timezone.now()),
+                settings.ICPC_PENALTY_MINUTES,
+            ],
+        )
+
+
+def aggregate_standings(contest, until=None):
+    """
+    Recompute standing rows for a contest from its submissions in one ordered query.
+    Only submissions made before `until` are counted when it is given (used for freezes).
+    Returns unsaved ContestStanding objects.
+    """
+    submissions = ContestSubmission.objects.filter(contest=contest).exclude(status="P")
+    if until is not None:
+        submissions = submissions.filter(created_at__lt=until)
+    submissions = submissions.order_by("user_id", "problem_id", "created_at", "id").values_list(
+        "user_id", "problem_id", "status", "points", "created_at"
+    )
+
+    rows = {}
+    for user_id, problem_id, status, points, created_at in submissions.iterator(chunk_size=2000):
+        row = rows.get((user_id, problem_id))
+        if row is None:
+            row = rows[(user_id, problem_id)] = ContestStanding(contest=contest, user_id=user_id, problem_id=problem_id)
+        row.attempts += 1
+        row.best_points = max(row.best_points, points)
+        if row.first_ac_at is None:
+            if status == "AC":
+                row.first_ac_at = created_at
+                row.penalty = _elapsed_minutes(contest, created_at) + settings.ICPC_PENALTY_MINUTES * row.wrong_attempts
+            elif status not in NO_PENALTY_STATUSES:
+                row.wrong_attempts += 1
+    return list(rows.values())
+
+
+def rebuild_standings(contest):
+    """Replace the stored standings of a contest with a fresh recomputation."""
+    rows = aggregate_standings(contest)
+    with transaction.atomic():
+        ContestStanding.objects.filter(contest=contest).delete()
+        ContestStanding.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def precreate_standings(contest):
+    """
+    Insert an empty standing row for every registered user and contest problem, so the
+    first verdicts of a contest update rows instead of racing to insert them.
+    Returns how many rows were missing.
+    """
+    user_ids = set(
+        ContestRegistration.objects.filter(contest=contest, user__isnull=False).values_list("user_id", flat=True)
+    )
+    problem_ids = list(contest.problems.values_list("pk", flat=True))
+    existing = set(ContestStanding.objects.filter(contest=contest).values_list("user_id", "problem_id"))
+    rows = [
+        ContestStanding(contest=contest, user_id=user_id, problem_id=problem_id)
+        for user_id in user_ids
+        for problem_id in problem_ids
+        if (user_id, problem_id) not in existing
+    ]
+    ContestStanding.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+    return len(rows)
+
+
+def contest_totals(contest):
+    """Per-user totals for a contest, one query over the standings table."""
+    return (
+        ContestStanding.objects.filter(contest=contest)
+        .values("user_id")
+        .annotate(
+            total_points=Sum("best_points"),
+            penalty=Sum("penalty"),
+            solved=Count("id", filter=Q(first_ac_at__isnull=False)),
+        )
+    )
+
+
+# -------------------------
+# Scoreboard
+# -------------------------
+def build_scoreboard(contest, frozen=False):
+    """
+    Build the ranked scoreboard of a contest as a JSON-serialisable dict.
+    A frozen scoreboard only counts submissions made before the freeze time.
+    """
+    if frozen:
+        standings = aggregate_standings(contest, until=contest.freeze_time())
+    else:
+        standings = list(ContestStanding.objects.filter(contest=contest))
+
+    problems = list(contest.problems.order_by("problem_id").values("problem_id", "title"))
+    user_ids = {row.user_id for row in standings}
+    user_ids.update(
+        ContestRegistration.objects.filter(contest=contest, user__isnull=False).values_list("user_id", flat=True)
+    )
+    names = dict(User.objects.filter(id__in=user_ids).values_list("id", "full_name"))
+
+    rows = {
+        user_id: {"user_id": user_id, "name": names.get(user_id, ""), "total_points": 0, "penalty": 0,
+                  "solved": 0, "cells": {}}
+        for user_id in user_ids
+    }
+    for standing in standings:
+        if not standing.attempts:
+            continue  # pre-created by warm_contest, nothing submitted yet
+        row = rows[standing.user_id]
+        solved = standing.first_ac_at is not None
+        row["cells"][str(standing.problem_id)] = {
+            "points": standing.best_points,
+            "attempts": standing.attempts,
+            "wrong_attempts": standing.wrong_attempts,
+            "solved": solved,
+            "penalty": standing.penalty,
+        }
+        row["total_points"] += standing.best_points
+        if solved:
+            row["solved"] += 1
+            row["penalty"] += standing.penalty
+
+    if contest.scoring == "ICPC":
+        rank_key = lambda r: (-r["solved"], r["penalty"])
+    else:
+        rank_key = lambda r: (-r["total_points"],)
+
+    ranked = sorted(rows.values(), key=lambda r: (rank_key(r), r["name"]))
+    previous_key = None
+    for position, row in enumerate(ranked, start=1):
+        # Tied rows share a rank (1, 2, 2, 4)
+        if rank_key(row) != previous_key:
+            rank = position
+            previous_key = rank_key(row)
+        row["rank"] = rank
+
+    return {
+        "contest": contest.id,
+        "scoring": contest.scoring,
+        "frozen": frozen,
+        "generated_at": timezone.now().isoformat(),
+        "problems": problems,
+        "rows": ranked,
+    }
+
+
+def scoreboard_etag(scoreboard):
+    """A hash of what the scoreboard shows, so a rebuild that changed nothing keeps the same ETag."""
+    content = {k: v for k, v in scoreboard.items() if k != "generated_at"}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, separators=(",", ":")).encode()).hexdigest()[:32]
+
+
+def get_scoreboard(contest, frozen=False):
+    """
+    Return the cached scoreboard snapshot, rebuilding it at most once every
+    SCOREBOARD_CACHE_SECONDS. Only the request holding the lock rebuilds: while it does,
+    others keep serving the previous snapshot, or on a cold cache wait for its build,
+    so any number of polling clients cost one build per interval.
+    """
+    key = f"scoreboard:{contest.id}:{'frozen' if frozen else 'live'}"
+    lock_key = f"{key}:lock"
+    snapshot = cache.get(key)
+    fresh_for = settings.SCOREBOARD_CACHE_SECONDS
+
+    fresh = snapshot and time.time() - snapshot["built_at"] < fresh_for
+    metrics.cache_lookup("scoreboard", bool(fresh))
+    if fresh:
+        return snapshot
+
+    locked = cache.add(lock_key, 1, timeout=fresh_for)
+    if not locked:
+        if snapshot:
+            return snapshot
+        # Cold cache: wait for the build in progress, and only build here if its holder died
+        deadline = time.monotonic() + fresh_for
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            snapshot = cache.get(key)
+            if snapshot:
+                return snapshot
+
+    try:
+        version = (snapshot["version"] + 1) if snapshot else 1
+        scoreboard = build_scoreboard(contest, frozen)
+        snapshot = {"version": version, "built_at": time.time(), "etag": scoreboard_etag(scoreboard),
+                    "scoreboard": scoreboard}
+        # Kept well past its freshness so a stale copy is always there to serve during rebuilds
+        cache.set(key, snapshot, timeout=fresh_for * 60)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return snapshot
+
+
+# -------------------------
+# Per-user problem status
+# -------------------------
+def status_rows_query(contest, user):
+    """
+    The query behind _status_rows: with window functions, one row per attempted problem;
+    otherwise the user's submissions newest first, to be folded in Python.
+    """
+    submissions = ContestSubmission.objects.filter(contest=contest, user=user)
+    if connection.features.supports_over_clause:
+        per_problem = {"partition_by": F("problem_id")}
+        return (
+            submissions.annotate(
+                row=Window(RowNumber(), order_by=[F("created_at").desc(), F("id").desc()], **per_problem),
+                best_points=Window(Max("points"), **per_problem),
+                accepted=Window(Max(Case(When(status="AC", then=1), default=0)), **per_problem),
+                attempts=Window(Count("id"), **per_problem),
+            )
+            .filter(row=1)
+            .values_list("problem_id", "status", "best_points", "accepted", "attempts")
+        )
+    return submissions.order_by("problem_id", "-created_at", "-id").values_list("problem_id", "status", "points")
+
+
+def _status_rows(contest, user):
+    """(problem_id, latest status, best points, accepted, attempts) per attempted problem, in one query."""
+    query = status_rows_query(contest, user)
+    if connection.features.supports_over_clause:
+        return list(query)
+
+    # No window functions: walk the submissions newest first and fold them per problem
+    rows = {}
+    for problem_id, status, points in query:
+        row = rows.setdefault(problem_id, [problem_id, status, points, 0, 0])
+        row[2] = max(row[2], points)
+        row[3] = max(row[3], 1 if status == "AC" else 0)
+        row[4] += 1
+    return [tuple(row) for row in rows.values()]
+
+
+def _status_key(contest_id, user_id):
+    return f"contest_status:{contest_id}:{user_id}"
+
+
+def problem_statuses(contest, user):
+    """
+    {problem_id: {"latest", "best", "points", "attempts"}} for a user's problems in a contest.
+    "best" is AC once any submission was accepted, otherwise the latest verdict.
+    Cached until the user's next verdict in the contest.
+    """
+    key = _status_key(contest.id, user.id)
+    statuses = cache.get(key)
+    if statuses is None:
+        statuses = {
+            problem_id: {
+                "latest": status,
+                "best": "AC" if accepted else status,
+                "points": best_points,
+                "attempts": attempts,
+            }
+            for problem_id, status, best_points, accepted, attempts in _status_rows(contest, user)
+        }
+        cache.set(key, statuses, timeout=settings.CONTEST_STATUS_CACHE_SECONDS)
+    return statuses
+
+
+def invalidate_problem_statuses(contest_id, user_id):
+    cache.delete(_status_key(contest_id, user_id))
@@ -0,0 +1,135 @@
+import hashlib
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+# What CKEditor statements may keep; everything else is dropped (tags) or escaped (text)
+ALLOWED_TAGS = {
+    "a", "b", "blockquote", "br", "code", "div", "em", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "i",
+    "img", "li", "ol", "p", "pre", "s", "span", "strong", "sub", "sup", "table", "tbody", "td", "th",
+    "thead", "tr", "u", "ul",
+}
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "title"},
+    "img": {"src", "alt", "width", "height"},
+    "td": {"colspan", "rowspan"},
+    "th": {"colspan", "rowspan"},
+}
+VOID_TAGS = {"br", "hr", "img"}
+# Tags whose content goes too, not just the tag
+DROPPED_WITH_CONTENT = {"script", "style", "iframe", "object", "embed", "noscript", "template", "textarea"}
+URL_SCHEMES = {"", "http", "https", "mailto"}
+
+
+def _safe_url(tag, url):
+    url = url.strip()
+    scheme = urlparse(url).scheme.lower()
+    if scheme in URL_SCHEMES:
+        return True
+    # Pasted images come inline
+    return tag == "img" and url.lower().startswith("data:image/")
+
+
+class _Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_WITH_CONTENT:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        kept = []
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in ("href", "src") and not _safe_url(tag, value):
+                continue
+            kept.append(f' {name}="{escape(value, quote=True)}"')
+        if tag == "a":
+            kept.append(' rel="nofollow noopener"')
+
+        self.out.append(f"<{tag}{''.join(kept)}>")
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_WITH_CONTENT:
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        # Close anything left open inside this tag as well
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.out.append(f"</{open_tag}>")
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.out.append(escape(data, quote=False))
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self.out.append(f"</{self.open_tags.pop()}>")
+        return "".join(self.out)
+
+
+def sanitize_html(html):
+    """Reduce rich-text HTML to an allowlist of tags and attributes."""
+    sanitizer = _Sanitizer()
+    sanitizer.feed(html or "")
+    return sanitizer.close()
+
+
+def render_statement(problem):
+    """
+    Sanitize and render a problem's statement, specifications and examples into
+    problem.statement_html, with its hash and render time. Does not save.
+    """
+    examples = list(problem.examples.all()) if problem.pk else []
+    html = render_to_string("problems/statement.html", {
+        "statement": mark_safe(sanitize_html(problem.statement)),
+        "input_specification": mark_safe(sanitize_html(problem.input_specification)),
+        "output_specification": mark_safe(sanitize_html(problem.output_specification)),
+        "examples": examples,
+    })
+    digest = hashlib.sha256(html.encode()).hexdigest()
+    if digest != problem.statement_hash:
+        problem.statement_html = html
+        problem.statement_hash = digest
+        problem.statement_updated_at = timezone.now()
+
+
+def save_rendered_statement(problem):
+    """Render a problem's statement and store it without a full save."""
+    from .models import Problem
+
+    render_statement(problem)
+    Problem.objects.filter(pk=problem.pk).update(
+        statement_html=problem.statement_html,
+        statement_hash=problem.statement_hash,
+        statement_updated_at=problem.statement_updated_at,
+    )
+
+
+def ensure_rendered_statement(problem):
+    """Problems saved before statements were pre-rendered get theirs on first view."""
+    if not problem.statement_hash:
+        save_rendered_statement(problem)
@@ -0,0 +1,212 @@
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from .models import ContestRegistration, ContestSubmission, Problem, ProblemStats, Submission, User, UserStats
+
+DIFFICULTY_FIELDS = {'Easy': 'easy_solved', 'Medium': 'medium_solved', 'Hard': 'hard_solved'}
+
+
+def _advance_streak(stats, day):
+    """Extend (or restart) the AC streak with a solve on `day`. Days must arrive in order."""
+    if stats.last_solved_on is not None and day <= stats.last_solved_on:
+        return
+    if stats.last_solved_on == day - timedelta(days=1):
+        stats.current_streak += 1
+    else:
+        stats.current_streak = 1
+    stats.best_streak = max(stats.best_streak, stats.current_streak)
+    stats.last_solved_on = day
+
+
+def _add_solve(stats, problem_id, difficulty, solved_at):
+    """Returns True when this is the user's first solve of the problem."""
+    first_solve = problem_id not in stats.solved_problems
+    if first_solve:
+        stats.solved_problems.append(problem_id)
+        field = DIFFICULTY_FIELDS.get(difficulty)
+        if field:
+            setattr(stats, field, getattr(stats, field) + 1)
+    _advance_streak(stats, timezone.localdate(solved_at))
+    return first_solve
+
+
+def _latest(*values):
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+
+# -------------------------
+# Incremental updates
+# -------------------------
+def _update_row(model, key, apply, rebuild):
+    """
+    Apply a change to a stats row under a row lock. A missing row (users and problems from
+    before stats existed) is built from history first, outside any lock, and the change is
+    not applied since the rebuild already read the event being recorded.
+    Returns what `apply` returned, or None when the row was built instead.
+    """
+    if not model.objects.filter(pk=key).exists():
+        try:
+            rebuild([key])
+        except IntegrityError:
+            pass  # a concurrent first event already built the row
+        return None
+    with transaction.atomic():
+        row = model.objects.select_for_update().get(pk=key)
+        result = apply(row)
+        row.save()
+        return result
+
+
+def _update_stats(user_id, apply):
+    return _update_row(UserStats, user_id, apply, rebuild_user_stats)
+
+
+def record_practice_verdict(submission):
+    """Fold a judged practice submission into its user's stats and its problem's stats."""
+    accepted = submission.status == "AC"
+
+    def apply(stats):
+        stats.last_submission_at = _latest(stats.last_submission_at, submission.created_at)
+        if accepted:
+            return _add_solve(stats, submission.problem_id, submission.problem.difficulty, submission.created_at)
+        return False
+
+    first_solve = _update_stats(submission.user_id, apply)
+    if first_solve is None:
+        first_solve = accepted and not (
+            Submission.objects.filter(user_id=submission.user_id, problem_id=submission.problem_id, status="AC")
+            .exclude(pk=submission.pk).exists()
+        )
+    record_problem_verdict(submission, first_solve)
+
+
+def record_problem_verdict(submission, first_solve):
+    accepted = 1 if submission.status == "AC" else 0
+
+    def apply(stats):
+        stats.attempts += 1
+        stats.accepted += accepted
+        stats.solvers += 1 if first_solve else 0
+        language = stats.by_language.setdefault(submission.language, {"attempts": 0, "accepted": 0})
+        language["attempts"] += 1
+        language["accepted"] += accepted
+
+    _update_row(ProblemStats, submission.problem_id, apply, rebuild_problem_stats)
+
+
+def record_contest_verdict(submission):
+    """Fold a judged contest submission into its user's stats."""
+    def apply(stats):
+        stats.last_submission_at = _latest(stats.last_submission_at, submission.created_at)
+        stats.best_contest_points = max(stats.best_contest_points, submission.points)
+
+    _update_stats(submission.user_id, apply)
+
+
+def record_registration(registration):
+    def apply(stats):
+        stats.contests_entered += 1
+
+    _update_stats(registration.user_id, apply)
+
+
+def rebuild_user_stats_on_commit(user_ids):
+    """
+    Rebuild the given users' rows once the current transaction commits, for changes the
+    incremental updates cannot follow: a problem's difficulty, deleted problems or contests.
+    """
+    user_ids = list(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: rebuild_user_stats(user_ids))
+
+
+def get_user_stats(user):
+    """The user's stats row, built from their history if it does not exist yet."""
+    stats = UserStats.objects.filter(user=user).first()
+    if stats is None:
+        try:
+            rebuild_user_stats([user.pk])
+        except IntegrityError:
+            pass
+        stats = UserStats.objects.get(user=user)
+    return stats
+
+
+# -------------------------
+# Full rebuild
+# -------------------------
+def rebuild_user_stats(users=None):
+    """Recompute stats rows from submissions and registrations, for all users or the given ones."""
+    user_ids = User.objects.all()
+    practice = Submission.objects.all()
+    contest = ContestSubmission.objects.all()
+    registrations = ContestRegistration.objects.filter(user__isnull=False)
+    if users is not None:
+        user_ids = user_ids.filter(pk__in=users)
+        practice = practice.filter(user__in=users)
+        contest = contest.filter(user__in=users)
+        registrations = registrations.filter(user__in=users)
+
+    rows = {pk: UserStats(user_id=pk) for pk in user_ids.values_list("pk", flat=True)}
+
+    solves = (
+        practice.filter(status="AC")
+        .order_by("created_at", "id")
+        .values_list("user_id", "problem_id", "problem__difficulty", "created_at")
+    )
+    for user_id, problem_id, difficulty, created_at in solves.iterator(chunk_size=2000):
+        _add_solve(rows[user_id], problem_id, difficulty, created_at)
+
+    for user_id, latest in practice.values("user_id").annotate(m=Max("created_at")).order_by().values_list("user_id", "m"):
+        rows[user_id].last_submission_at = latest
+    for user_id, latest, best in (
+        contest.values("user_id").annotate(m=Max("created_at"), p=Max("points")).order_by().values_list("user_id", "m", "p")
+    ):
+        rows[user_id].last_submission_at = _latest(rows[user_id].last_submission_at, latest)
+        rows[user_id].best_contest_points = best or 0
+
+    for user_id, count in registrations.values("user_id").annotate(c=Count("id")).order_by().values_list("user_id", "c"):
+        rows[user_id].contests_entered = count
+
+    existing = UserStats.objects.all() if users is None else UserStats.objects.filter(user__in=users)
+    with transaction.atomic():
+        existing.delete()
+        UserStats.objects.bulk_create(rows.values(), batch_size=1000)
+    return len(rows)
+
+
+def rebuild_problem_stats(problems=None):
+    """Recompute per-problem counters from practice submissions, for all problems or the given ones."""
+    problem_ids = Problem.objects.all()
+    submissions = Submission.objects.exclude(status="P")
+    if problems is not None:
+        problem_ids = problem_ids.filter(pk__in=problems)
+        submissions = submissions.filter(problem__in=problems)
+
+    rows = {pk: ProblemStats(problem_id=pk) for pk in problem_ids.values_list("pk", flat=True)}
+
+    per_language = (
+        submissions.values("problem_id", "language")
+        .annotate(attempts=Count("id"), accepted=Count("id", filter=Q(status="AC")))
+        .order_by()
+    )
+    for entry in per_language:
+        row = rows[entry["problem_id"]]
+        row.attempts += entry["attempts"]
+        row.accepted += entry["accepted"]
+        row.by_language[entry["language"]] = {"attempts": entry["attempts"], "accepted": entry["accepted"]}
+
+    solvers = (
+        submissions.filter(status="AC").values("problem_id")
+        .annotate(n=Count("user_id", distinct=True)).order_by().values_list("problem_id", "n")
+    )
+    for problem_id, count in solvers:
+        rows[problem_id].solvers = count
+
+    existing = ProblemStats.objects.all() if problems is None else ProblemStats.objects.filter(problem__in=problems)
+    with transaction.atomic():
+        existing.delete()
+        ProblemStats.objects.bulk_create(rows.values(), batch_size=1000)
+    return len(rows)
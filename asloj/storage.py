@@ -0,0 +1,39 @@
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+
+class ArchiveAwareStorage(FileSystemStorage):
+    """
+    The media filesystem, plus read access to files moved into the submission archive
+    (asloj.archive). Files on disk always win; the archive index is only consulted for
+    names that are missing, so ordinary media costs nothing extra to read.
+    """
+
+    def _archived(self, name):
+        from .archive import archived_entry  # models are not ready when storages are built
+        return archived_entry(name)
+
+    def _open(self, name, mode="rb"):
+        if not super().exists(name):
+            entry = self._archived(name)
+            if entry is not None:
+                from .archive import read_entry
+                data = read_entry(entry)
+                return ContentFile(data if "b" in mode else data.decode("utf-8", errors="replace"), name=name)
+        return super()._open(name, mode)
+
+    def exists(self, name):
+        # Also keeps new uploads from taking the name of an archived file
+        return super().exists(name) or self._archived(name) is not None
+
+    def size(self, name):
+        if not super().exists(name):
+            entry = self._archived(name)
+            if entry is not None:
+                return entry.size
+        return super().size(name)
+
+    def delete(self, name):
+        super().delete(name)
+        from .models import ArchivedFile
+        ArchivedFile.objects.filter(name=name).delete()
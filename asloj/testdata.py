@@ -0,0 +1,509 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import threading
+import zipfile
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from . import metrics
+
+# A bundle is a zip archive holding every test pair of a problem plus a manifest:
+#   manifest.json  {"problem": id, "version": n, "tests": [{"index", "input": {...}, "output": {...}}]}
+#   <index>.in / <index>.out
+# Generated inputs are not packed; their manifest entry holds the generator arguments and the
+# expected hash, and each judge generates and caches them locally on first use.
+# One bundle exists per test data version, so judges never read a half-updated set of tests.
+MANIFEST_NAME = "manifest.json"
+BUNDLE_NAME_PATTERN = re.compile(r"v(\d+)\.zip")
+
+
+def bundle_dir(problem):
+    return os.path.join(settings.MEDIA_ROOT, "problems", str(problem.problem_id), "bundle")
+
+
+def bundle_path(problem, version=None):
+    version = problem.test_data_version if version is None else version
+    return os.path.join(bundle_dir(problem), f"v{version}.zip")
+
+
+def test_index_from_name(filename):
+    """Read the test number from names like test_input_3.txt, 3.in or output03.txt."""
+    numbers = re.findall(r"\d+", os.path.basename(filename))
+    return int(numbers[-1]) if numbers else None
+
+
+def next_test_index(problem, model):
+    last = model.objects.filter(problem=problem).order_by("-index").values_list("index", flat=True).first()
+    return (last or 0) + 1
+
+
+def testcase_pairs(problem):
+    """Pair test inputs and outputs by their explicit index, ignoring unpaired files."""
+    inputs = {t.index: t for t in problem.test_inputs.all()}
+    outputs = {t.index: t for t in problem.test_outputs.all()}
+    return [(index, inputs[index], outputs[index]) for index in sorted(inputs) if index in outputs]
+
+
+def generated_input_cache_path(problem, sha256):
+    return os.path.join(settings.JUDGE_CACHE_DIR, "generated", str(problem.problem_id), f"{sha256}.in")
+
+
+def generate_input(problem, generator_args, expected_sha256=None):
+    """
+    Return the bytes of a generated test input. Inputs are cached locally by hash; a fresh
+    generation is checked against `expected_sha256` so a non-deterministic generator is caught.
+    """
+    from .utils import get_generator_command
+
+    if expected_sha256:
+        cache_path = generated_input_cache_path(problem, expected_sha256)
+        hit = os.path.exists(cache_path)
+        metrics.cache_lookup("generated_input", hit)
+        if hit:
+            with open(cache_path, "rb") as f:
+                return f.read()
+
+    generator_cmd = get_generator_command(problem)
+    if generator_cmd is None:
+        raise ValueError(f"Problem {problem.problem_id} has generated tests but no generator")
+
+    proc = subprocess.run(
+        generator_cmd + shlex.split(generator_args),
+        capture_output=True,
+        timeout=settings.GENERATOR_TIME_LIMIT
+    )
+    if proc.returncode != 0:
+        raise ValueError(f"Generator failed for '{generator_args}': {proc.stderr.decode(errors='replace').strip()}")
+
+    data = proc.stdout
+    digest = hashlib.sha256(data).hexdigest()
+    if expected_sha256 and digest != expected_sha256:
+        raise ValueError(f"Generated input for '{generator_args}' does not match its stored hash")
+
+    cache_path = generated_input_cache_path(problem, digest)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, cache_path)
+    return data
+
+
+def _read_member(field_file):
+    with open(field_file.path, "rb") as f:
+        return f.read()
+
+
+def build_bundle(problem):
+    """
+    Pack all test pairs of the problem into a bundle for its current test data version,
+    record per-test hashes and sizes, and remove bundles of older versions.
+    """
+    from .models import TestInput, TestOutput
+
+    version = problem.test_data_version
+    path = bundle_path(problem, version)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    manifest = {"problem": problem.problem_id, "version": version, "tests": []}
+    changed_inputs, changed_outputs = [], []
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+
+    try:
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for index, test_input, test_output in testcase_pairs(problem):
+                entry = {"index": index}
+                for kind, obj, changed in (("in", test_input, changed_inputs), ("out", test_output, changed_outputs)):
+                    if kind == "in" and obj.generator_args:
+                        # The first generation fixes the hash that every judge must reproduce
+                        data = generate_input(problem, obj.generator_args, obj.sha256 or None)
+                        digest = hashlib.sha256(data).hexdigest()
+                        entry["input"] = {"sha256": digest, "size": len(data), "generator_args": obj.generator_args}
+                    else:
+                        data = _read_member(obj.file)
+                        digest = hashlib.sha256(data).hexdigest()
+                        zf.writestr(f"{index}.{kind}", data)
+                        entry["input" if kind == "in" else "output"] = {"sha256": digest, "size": len(data)}
+                    if obj.sha256 != digest or obj.size != len(data):
+                        obj.sha256, obj.size = digest, len(data)
+                        changed.append(obj)
+                manifest["tests"].append(entry)
+            zf.writestr(MANIFEST_NAME, json.dumps(manifest))
+
+        # Concurrent builders produce identical archives, so the last rename simply wins
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    TestInput.objects.bulk_update(changed_inputs, ["sha256", "size"])
+    TestOutput.objects.bulk_update(changed_outputs, ["sha256", "size"])
+
+    # Only older versions go; a newer bundle may have been built concurrently and be in use
+    for name in os.listdir(os.path.dirname(path)):
+        match = BUNDLE_NAME_PATTERN.fullmatch(name)
+        if match and int(match.group(1)) < version:
+            try:
+                os.remove(os.path.join(os.path.dirname(path), name))
+            except FileNotFoundError:
+                pass
+
+    return path
+
+
+def remove_bundles(problem):
+    shutil.rmtree(bundle_dir(problem), ignore_errors=True)
+
+
+class TestCase:
+    """One test pair. Programs get the raw bytes; the text forms are only for comparing and showing."""
+
+    def __init__(self, index, input_bytes, expected_bytes):
+        self.index = index
+        self.input_bytes = input_bytes
+        self.expected_bytes = expected_bytes
+
+    @property
+    def input(self):
+        return self.input_bytes.decode("utf-8", errors="replace")
+
+    @property
+    def expected(self):
+        return self.expected_bytes.decode("utf-8", errors="replace")
+
+    def write_files(self, work_dir):
+        """Write the input and expected output to work_dir, for programs that need file paths."""
+        input_path = os.path.join(work_dir, f"test_{self.index}.in")
+        expected_path = os.path.join(work_dir, f"test_{self.index}.out")
+        with open(input_path, "wb") as f:
+            f.write(self.input_bytes)
+        with open(expected_path, "wb") as f:
+            f.write(self.expected_bytes)
+        return input_path, expected_path
+
+
+class _MappedFile:
+    """File-like wrapper so zipfile can read from an mmap (mmap has no seekable() before Python 3.13)."""
+
+    def __init__(self, mapped):
+        self._mapped = mapped
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self._mapped.seek(offset, whence)
+        return self._mapped.tell()
+
+    def tell(self):
+        return self._mapped.tell()
+
+    def read(self, size=-1):
+        return self._mapped.read(size)
+
+
+class TestDataBundle:
+    """Read-only view of a bundle, memory-mapped so tests are decompressed straight from the page cache."""
+
+    def __init__(self, path, problem):
+        self.problem = problem
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._zip = zipfile.ZipFile(_MappedFile(self._mmap))
+        self.manifest = json.loads(self._zip.read(MANIFEST_NAME))
+
+    def __len__(self):
+        return len(self.manifest["tests"])
+
+    def _read_checked(self, name, meta):
+        if "generator_args" in meta:
+            data = generate_input(self.problem, meta["generator_args"], meta["sha256"])
+        else:
+            data = self._zip.read(name)
+        if len(data) != meta["size"] or hashlib.sha256(data).hexdigest() != meta["sha256"]:
+            raise ValueError(f"Corrupted test data bundle: {name} does not match its manifest")
+        return data
+
+    def __iter__(self):
+        for entry in self.manifest["tests"]:
+            index = entry["index"]
+            yield TestCase(
+                index,
+                self._read_checked(f"{index}.in", entry["input"]),
+                self._read_checked(f"{index}.out", entry["output"]),
+            )
+
+    def close(self):
+        self._zip.close()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# What opening or reading a missing, corrupt or ungeneratable bundle can raise
+BUNDLE_ERRORS = (ValueError, KeyError, OSError, zipfile.BadZipFile, subprocess.TimeoutExpired)
+
+
+def open_bundle(problem):
+    """Open the bundle for the problem's current test data version, building it on first use."""
+    path = bundle_path(problem)
+    if not os.path.exists(path):
+        path = build_bundle(problem)
+    return TestDataBundle(path, problem)
+
+
+def rebuild_test_data(problem_id):
+    """
+    Build the bundle of a problem whose status is BUILDING and mark it READY, or FAILED with
+    the error. A build that raced with a newer change of the tests leaves the status alone.
+    Returns the error, or "" when the bundle was built.
+    """
+    from .models import Problem
+
+    problem = Problem.objects.get(pk=problem_id)
+    version = problem.test_data_version
+    try:
+        build_bundle(problem)
+    except (ValueError, OSError, subprocess.TimeoutExpired) as e:
+        status, error = "FAILED", f"Could not build the test data: {e}"
+    else:
+        status, error = "READY", ""
+    Problem.objects.filter(pk=problem_id, test_data_version=version, test_data_status="BUILDING").update(
+        test_data_status=status, test_data_error=error
+    )
+    return error
+
+
+def start_test_data_build(problem):
+    """
+    Mark the problem's tests as building and build them on a background thread once the
+    current transaction commits. Builds lost to a restart are redone by process_test_data.
+    """
+    from .models import Problem
+
+    Problem.objects.filter(pk=problem.pk).update(test_data_status="BUILDING", test_data_error="")
+    transaction.on_commit(lambda: threading.Thread(
+        target=_run_in_background, args=(rebuild_test_data, problem.pk), daemon=True
+    ).start())
+
+
+# -------------------------
+# Bulk upload from an archive
+# -------------------------
+INPUT_NAME_PATTERN = re.compile(r"(input|\.in$)", re.IGNORECASE)
+OUTPUT_NAME_PATTERN = re.compile(r"(output|answer|\.out$|\.ans$)", re.IGNORECASE)
+PROGRESS_EVERY = 10  # files between progress updates
+
+
+def _archive_members(path):
+    """Yield (name, size, open_member) for every regular file in a zip or tar archive; size is what its header says."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    yield info.filename, info.file_size, lambda info=info: zf.open(info)
+    else:
+        with tarfile.open(path) as tf:
+            for member in tf:
+                if member.isfile():
+                    yield member.name, member.size, lambda member=member: tf.extractfile(member)
+
+
+def classify_test_file(name):
+    """Return ('in' | 'out', index) for names like test_input_3.txt or 3.out, or None to skip the file."""
+    base = os.path.basename(name)
+    if not base or base.startswith(".") or "__MACOSX" in name:
+        return None
+    index = test_index_from_name(base)
+    if index is None:
+        return None
+    if OUTPUT_NAME_PATTERN.search(base):
+        return "out", index
+    if INPUT_NAME_PATTERN.search(base):
+        return "in", index
+    return None
+
+
+def _copy_test_file(src, dst_path, max_size):
+    """
+    Stream src to dst_path and return (sha256, size). Text files have CRLF/CR line endings
+    converted to LF; a file with a NUL byte in its first chunk is binary and copied as is.
+    Raises ValueError once more than max_size bytes are written, whatever the archive header said.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    pending_cr = False
+    binary = None
+    with open(dst_path, "wb") as dst:
+        for chunk in iter(lambda: src.read(65536), b""):
+            if binary is None:
+                binary = b"\0" in chunk
+            if not binary:
+                if pending_cr:
+                    chunk = b"\r" + chunk
+                pending_cr = chunk.endswith(b"\r")
+                if pending_cr:
+                    chunk = chunk[:-1]
+                chunk = chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+            digest.update(chunk)
+            size += len(chunk)
+            if size > max_size:
+                raise ValueError("unpacks to more than the upload limits allow")
+            dst.write(chunk)
+        if pending_cr:
+            digest.update(b"\n")
+            size += 1
+            dst.write(b"\n")
+    return digest.hexdigest(), size
+
+
+def _staging_dirs(upload):
+    """The directories an upload is unpacked into; one per upload, so a failed run is removed whole."""
+    from .models import TestInput, TestOutput, test_input_upload_to, test_output_upload_to
+
+    return [
+        default_storage.path(upload_to(model(problem=upload.problem), f"upload{upload.pk}"))
+        for model, upload_to in ((TestInput, test_input_upload_to), (TestOutput, test_output_upload_to))
+    ]
+
+
+def process_test_upload(upload_id, claim_status="PENDING"):
+    """
+    Unpack a TestUpload archive into test files, pairing inputs and outputs by the number
+    in their names, then insert all rows at once and rebuild the problem's bundle.
+    The upload is claimed first, so the background thread and process_test_data (which
+    passes claim_status="PROCESSING" to resume uploads a restart interrupted) never both
+    run it. Files are only kept once their rows are committed.
+    """
+    from .models import TestUpload, TestInput, TestOutput, Problem, test_input_upload_to, test_output_upload_to
+
+    if not TestUpload.objects.filter(pk=upload_id, status=claim_status).update(status="PROCESSING"):
+        return
+    upload = TestUpload.objects.select_related("problem").get(pk=upload_id)
+    problem = upload.problem
+    staging_dirs = _staging_dirs(upload)
+    committed = False
+    try:
+        for path in staging_dirs:
+            shutil.rmtree(path, ignore_errors=True)  # left by an interrupted run
+
+        # First pass only reads names and sizes; the files themselves are streamed one at a time below
+        max_file_size = settings.TEST_UPLOAD_MAX_FILE_MB * 1024 * 1024
+        max_total_size = settings.TEST_UPLOAD_MAX_TOTAL_MB * 1024 * 1024
+        selected, seen = {}, {}
+        total_size = 0
+        for count, (name, size, _) in enumerate(_archive_members(upload.archive.path), start=1):
+            if count > settings.TEST_UPLOAD_MAX_FILES:
+                raise ValueError(f"The archive holds more than {settings.TEST_UPLOAD_MAX_FILES} files.")
+            kind = classify_test_file(name)
+            if not kind:
+                continue
+            if kind in seen:
+                label = "input" if kind[0] == "in" else "output"
+                raise ValueError(f"Test {kind[1]} has more than one {label}: {seen[kind]} and {name}")
+            if size > max_file_size:
+                raise ValueError(f"{name} unpacks to more than {settings.TEST_UPLOAD_MAX_FILE_MB} MB.")
+            total_size += size
+            if total_size > max_total_size:
+                raise ValueError(f"The tests unpack to more than {settings.TEST_UPLOAD_MAX_TOTAL_MB} MB.")
+            selected[name] = kind
+            seen[kind] = name
+        upload.total = len(selected)
+        upload.save(update_fields=["total"])
+
+        rows = {"in": {}, "out": {}}
+        unpacked = 0
+        members = (
+            (name, opener) for name, _, opener in _archive_members(upload.archive.path) if name in selected
+        )
+        for position, (name, opener) in enumerate(members, start=1):
+            kind, index = selected[name]
+            model, upload_to = (TestInput, test_input_upload_to) if kind == "in" else (TestOutput, test_output_upload_to)
+            obj = model(problem=problem, index=index)
+            file_name = upload_to(obj, f"upload{upload.pk}/{os.path.basename(name)}")
+            os.makedirs(os.path.dirname(default_storage.path(file_name)), exist_ok=True)
+            with opener() as src:
+                try:
+                    obj.sha256, obj.size = _copy_test_file(
+                        src, default_storage.path(file_name), min(max_file_size, max_total_size - unpacked)
+                    )
+                except ValueError as e:
+                    raise ValueError(f"{name} {e}.") from e
+            unpacked += obj.size
+            obj.file.name = file_name
+            rows[kind][index] = obj
+
+            if position % PROGRESS_EVERY == 0:
+                TestUpload.objects.filter(pk=upload.pk).update(processed=position)
+
+        # Replace tests with the same numbers and insert the new ones in one transaction, which
+        # also marks the upload done so it is never resumed. Submissions wait for the new bundle.
+        upload.status = "DONE"
+        upload.processed = upload.total
+        upload.message = f"{len(rows['in'])} inputs and {len(rows['out'])} outputs added."
+        with transaction.atomic():
+            TestInput.objects.filter(problem=problem, index__in=list(rows["in"])).delete()
+            TestOutput.objects.filter(problem=problem, index__in=list(rows["out"])).delete()
+            TestInput.objects.bulk_create(rows["in"].values())
+            TestOutput.objects.bulk_create(rows["out"].values())
+
+            # bulk_create sends no signals, so bump the version here
+            Problem.objects.filter(pk=problem.pk).update(
+                test_data_version=F("test_data_version") + 1, test_data_status="BUILDING", test_data_error=""
+            )
+            upload.save(update_fields=["status", "processed", "message"])
+        committed = True
+
+        input_indexes = set(TestInput.objects.filter(problem=problem).values_list("index", flat=True))
+        output_indexes = set(TestOutput.objects.filter(problem=problem).values_list("index", flat=True))
+        unpaired = input_indexes ^ output_indexes
+        if unpaired:
+            upload.message += f" Unpaired tests: {', '.join(map(str, sorted(unpaired)))}."
+
+        error = rebuild_test_data(problem.pk)
+        if error:
+            raise ValueError(error)
+    except Exception as e:
+        upload.status = "FAILED"
+        if committed:
+            upload.message += f" {e}"
+        else:
+            upload.message = str(e)
+            for path in staging_dirs:
+                shutil.rmtree(path, ignore_errors=True)
+    finally:
+        upload.save(update_fields=["status", "processed", "message"])
+        default_storage.delete(upload.archive.name)
+
+
+def _run_in_background(target, *args):
+    close_old_connections()
+    try:
+        target(*args)
+    finally:
+        connection.close()
+
+
+def start_test_upload(upload):
+    """
+    Process the upload on a background thread once the current transaction commits, so the
+    request returns immediately. Uploads lost to a restart are resumed by process_test_data.
+    """
+    transaction.on_commit(lambda: threading.Thread(
+        target=_run_in_background, args=(process_test_upload, upload.pk), daemon=True
+    ).start())
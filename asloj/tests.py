@@ -1,3 +1,841 @@
-from django.test import TestCase
+import csv
+import importlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from datetime import timedelta
+from unittest import mock
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from . import metrics, testdata
+from .activity import activity_summary
+from .checks import check_shared_cache
+from .exports import export_chunks
+from .middleware import assert_query_budget
+from .models import (ArchivedFile, ArchiveSegment, Comment, Contest, ContestRegistration, ContestResult,
+                     ContestSnapshot, ContestStanding, ContestSubmission, DailyActivity, Discussion, Group,
+                     PointsLedger, Problem, ProblemStats, Submission, TestInput, TestOutput, TestUpload, User,
+                     UserStats)
+from .testdata import MANIFEST_NAME, build_bundle, bundle_path, open_bundle, process_test_upload, rebuild_test_data
+from .points import credit_points
+from .ranking import attach_ranks, cached_keyset_page, get_user_rank, leaderboard_version, ranked_users
+from .snapshots import final_scoreboard, finalize_contest
+from .standings import build_scoreboard, get_scoreboard, precreate_standings
+from .stats import record_practice_verdict
+from .utils import check_submission, find_judged_duplicate, run_checker, source_hash
 
-# Create your tests here.
+
+def _write(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+    return path
+
+
+class MediaTestCase(TestCase):
+    """Runs with MEDIA_ROOT and JUDGE_CACHE_DIR in a throwaway directory."""
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=os.path.join(root, "media"), JUDGE_CACHE_DIR=os.path.join(root, "cache"))
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+def make_user(email="user@uap-bd.edu", **extra):
+    return User.objects.create(email=email, full_name=extra.pop("full_name", email.split("@")[0]), university_id=email,
+                               **extra)
+
+
+def make_problem(user, **extra):
+    return Problem.objects.create(created_by=user, title=extra.pop("title", "A + B"),
+                                  statement=extra.pop("statement", "Add"), input_specification="a b",
+                                  output_specification="a + b", **extra)
+
+
+def make_contest(user, start=None, hours=2, **extra):
+    start = start or timezone.now() - timedelta(hours=1)
+    return Contest.objects.create(name=extra.pop("name", "Round 1"), description="", start_time=start,
+                                  end_time=start + timedelta(hours=hours), creator=user, **extra)
+
+
+def problem_form_data(**extra):
+    data = {
+        "title": "A + B", "difficulty": "Easy", "time_limit": 1, "statement": "Add", "input_specification": "a b",
+        "output_specification": "a + b", "checker_language": "", "generator_language": "",
+        "examples-TOTAL_FORMS": 0, "examples-INITIAL_FORMS": 0, "examples-MIN_NUM_FORMS": 0,
+        "examples-MAX_NUM_FORMS": 1000,
+    }
+    data.update(extra)
+    return data
+
+
+# -------------------------
+# Judge
+# -------------------------
+class RunCheckerTests(TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir, ignore_errors=True)
+        self.input_path = _write(os.path.join(self.work_dir, "input.txt"), "1 2\n")
+        self.expected_path = _write(os.path.join(self.work_dir, "expected.txt"), "3\n")
+
+    def checker(self, body):
+        script = _write(os.path.join(self.work_dir, "checker.py"), "import sys, time\n" + body)
+        return [sys.executable, script]
+
+    def run_with(self, body, output=b"3\n"):
+        return run_checker(self.checker(body), self.input_path, self.expected_path, output, self.work_dir)
+
+    def test_exit_codes_map_to_verdicts(self):
+        self.assertEqual(self.run_with("sys.exit(0)")[0], "AC")
+        self.assertEqual(self.run_with("sys.exit(1)")[0], "WA")
+        self.assertEqual(self.run_with("sys.exit(2)")[0], "WA")
+
+    def test_checker_failure_is_a_judge_error(self):
+        verdict, message, _ = self.run_with("sys.stderr.write('bad answer file'); sys.exit(3)")
+        self.assertEqual(verdict, "JE")
+        self.assertIn("bad answer file", message)
+        self.assertEqual(self.run_with("import os; os.abort()")[0], "JE")
+
+    @override_settings(CHECKER_TIME_LIMIT=0.5)
+    def test_checker_timeout_is_a_judge_error(self):
+        verdict, message, _ = self.run_with("time.sleep(5)")
+        self.assertEqual(verdict, "JE")
+        self.assertEqual(message, "Checker timed out")
+
+    def test_checker_reads_the_contestant_output(self):
+        body = "sys.exit(0 if open(sys.argv[2]).read() == open(sys.argv[3]).read() else 1)"
+        self.assertEqual(self.run_with(body, b"3\n")[0], "AC")
+        self.assertEqual(self.run_with(body, b"4\n")[0], "WA")
+
+
+class ProblemCheckerTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(make_user(is_staff=True))
+
+    def test_checker_that_does_not_compile_rejects_the_form(self):
+        checker = SimpleUploadedFile("checker.cpp", b"int main( {")
+        response = self.client.post(reverse("problem_crud"), problem_form_data(checker=checker, checker_language="cpp"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("compilation failed", str(response.context["form"].errors["checker"]))
+        self.assertFalse(Problem.objects.exists())
+
+    def test_python_checker_is_saved(self):
+        checker = SimpleUploadedFile("checker.py", b"import sys\nsys.exit(0)\n")
+        response = self.client.post(reverse("problem_crud"), problem_form_data(checker=checker))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Problem.objects.get().checker_language, "py")
+
+
+class VerdictReuseTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.problem = make_problem(self.user)
+
+    def submission(self, status, digest="abc"):
+        return Submission.objects.create(user=self.user, problem=self.problem, language="py", status=status,
+                                         source_hash=digest)
+
+    def test_only_deterministic_verdicts_are_reused(self):
+        for status in ("TLE", "RE", "JE", "P"):
+            self.submission(status)
+        self.assertIsNone(find_judged_duplicate(self.submission("P")))
+
+        accepted = self.submission("AC")
+        self.assertEqual(find_judged_duplicate(self.submission("P")), accepted)
+
+    def test_source_hash_is_byte_exact(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir, ignore_errors=True)
+        plain = _write(os.path.join(work_dir, "a.py"), "print(1)\n")
+        padded = _write(os.path.join(work_dir, "b.py"), "print(1)  \n")
+        self.assertNotEqual(source_hash(plain), source_hash(padded))
+
+
+class BundleTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.problem = make_problem(make_user())
+
+    def add_test(self, index, input_data, output_data):
+        TestInput.objects.create(problem=self.problem, index=index, file=ContentFile(input_data, name=f"{index}.in"))
+        TestOutput.objects.create(problem=self.problem, index=index, file=ContentFile(output_data, name=f"{index}.out"))
+        self.problem.refresh_from_db()
+
+    def test_tests_keep_their_raw_bytes(self):
+        self.add_test(1, b"caf\xe9\r\n", b"\xff\n")
+        with open_bundle(self.problem) as bundle:
+            [testcase] = list(bundle)
+        self.assertEqual(testcase.input_bytes, b"caf\xe9\r\n")
+        self.assertEqual(testcase.expected_bytes, b"\xff\n")
+
+    def test_only_older_bundles_are_removed(self):
+        self.add_test(1, b"1\n", b"1\n")
+        version = self.problem.test_data_version
+        newer = bundle_path(self.problem, version + 1)
+        os.makedirs(os.path.dirname(newer), exist_ok=True)
+        _write(newer, "")
+        older = _write(bundle_path(self.problem, version - 1), "")
+
+        build_bundle(self.problem)
+        self.assertTrue(os.path.exists(bundle_path(self.problem, version)))
+        self.assertTrue(os.path.exists(newer))
+        self.assertFalse(os.path.exists(older))
+
+    def test_replaced_test_files_are_deleted(self):
+        self.add_test(1, b"1\n", b"1\n")
+        old_path = TestInput.objects.get().file.path
+        with self.captureOnCommitCallbacks(execute=True):
+            TestInput.objects.filter(problem=self.problem, index=1).delete()
+        self.assertFalse(os.path.exists(old_path))
+
+    def test_programs_read_the_raw_input(self):
+        self.add_test(1, b"\xe9\n", b"ok\n")
+        source = _write(os.path.join(settings.MEDIA_ROOT, "main.py"),
+                        "import sys\nprint('ok' if sys.stdin.buffer.read() == b'\\xe9\\n' else 'bad')\n")
+        [result] = check_submission(self.problem, source, "py", 2)
+        self.assertEqual(result["verdict"], "AC")
+
+    def test_corrupt_bundle_is_a_judge_error(self):
+        self.add_test(1, b"1\n", b"1\n")
+        _write(build_bundle(self.problem), "not a zip")
+        user = make_user("judged@example.com")
+        self.client.force_login(user)
+        self.client.post(reverse("submit_solution", args=[self.problem.pk]),
+                         {"language": "py", "code_file": SimpleUploadedFile("a.py", b"print(1)\n")})
+        submission = Submission.objects.get()
+        self.assertEqual(submission.status, "JE")
+        self.assertIn("Could not read the test data", submission.test_results[0]["stderr"])
+
+    def test_corrupt_test_in_a_contest_is_a_judge_error(self):
+        self.add_test(1, b"1\n", b"1\n")
+        path = build_bundle(self.problem)
+        with zipfile.ZipFile(path) as bundle:
+            manifest = bundle.read(MANIFEST_NAME)
+        with zipfile.ZipFile(path, "w") as bundle:
+            bundle.writestr(MANIFEST_NAME, manifest)
+            bundle.writestr("1.in", b"1\n")
+            bundle.writestr("1.out", b"2\n")
+        user = make_user("contestant@example.com")
+        contest = make_contest(user)
+        contest.problems.add(self.problem)
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("contest_problem_detail", args=[contest.id, self.problem.pk]),
+                             {"language": "py", "code_file": SimpleUploadedFile("a.py", b"print(1)\n")})
+        submission = ContestSubmission.objects.get()
+        self.assertEqual((submission.status, submission.points), ("JE", 0))
+
+
+class TestDataBuildTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user(is_staff=True)
+        self.client.force_login(self.user)
+
+    def test_saving_a_problem_builds_its_tests_in_the_background(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(reverse("problem_crud"), problem_form_data())
+        problem = Problem.objects.get()
+        self.assertEqual(problem.test_data_status, "BUILDING")
+        self.assertEqual(len(callbacks), 1)  # the build thread, started after commit
+
+        response = self.client.post(reverse("submit_solution", args=[problem.pk]),
+                                    {"language": "py", "code_file": SimpleUploadedFile("a.py", b"print(1)")})
+        self.assertRedirects(response, reverse("problem_detail", args=[problem.pk]), fetch_redirect_response=False)
+        self.assertFalse(Submission.objects.exists())
+
+        self.assertEqual(rebuild_test_data(problem.pk), "")
+        problem.refresh_from_db()
+        self.assertEqual(problem.test_data_status, "READY")
+
+    def test_failed_build_closes_submissions(self):
+        generator = SimpleUploadedFile("gen.py", b"import sys\nsys.exit(1)\n")
+        output = SimpleUploadedFile("test_output_1.txt", b"5\n")
+        self.client.post(reverse("problem_crud"), problem_form_data(generator=generator, generator_args="--n 5",
+                                                                    test_outputs=output))
+        problem = Problem.objects.get()
+
+        self.assertIn("Generator failed", rebuild_test_data(problem.pk))
+        problem.refresh_from_db()
+        self.assertEqual(problem.test_data_status, "FAILED")
+        self.assertFalse(problem.accepts_submissions)
+
+
+class TestUploadTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.problem = make_problem(self.user)
+
+    def upload(self, files):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            for name, data in files.items():
+                zf.writestr(name, data)
+        upload = TestUpload.objects.create(problem=self.problem, created_by=self.user,
+                                           archive=SimpleUploadedFile("tests.zip", archive.getvalue()))
+        process_test_upload(upload.pk)
+        upload.refresh_from_db()
+        return upload
+
+    def test_text_is_normalized_and_binary_kept(self):
+        upload = self.upload({"1.in": b"1 2\r\n", "1.out": b"3\r\n", "2.in": b"\0\r\n", "2.out": b"x\n"})
+        self.assertEqual(upload.status, "DONE", upload.message)
+        self.assertEqual(TestInput.objects.get(index=1).file.read(), b"1 2\n")
+        self.assertEqual(TestInput.objects.get(index=2).file.read(), b"\0\r\n")
+        self.problem.refresh_from_db()
+        self.assertEqual(self.problem.test_data_status, "READY")
+
+    def test_duplicate_index_fails_without_leaving_files(self):
+        upload = self.upload({"a/1.in": b"1\n", "b/test_input_1.txt": b"2\n", "1.out": b"1\n"})
+        self.assertEqual(upload.status, "FAILED")
+        self.assertIn("more than one input", upload.message)
+        self.assertFalse(TestInput.objects.exists())
+        problem_dir = os.path.join(settings.MEDIA_ROOT, "problems", str(self.problem.pk))
+        leftovers = [name for _, _, names in os.walk(problem_dir) for name in names]
+        self.assertEqual(leftovers, [])
+
+    @override_settings(TEST_UPLOAD_MAX_FILES=2)
+    def test_archives_with_too_many_files_fail(self):
+        upload = self.upload({"1.in": b"1\n", "1.out": b"1\n", "readme.txt": b""})
+        self.assertEqual(upload.status, "FAILED")
+        self.assertIn("more than 2 files", upload.message)
+        self.assertFalse(TestInput.objects.exists())
+
+    @override_settings(TEST_UPLOAD_MAX_FILE_MB=0.001)
+    def test_oversized_test_files_fail_before_unpacking(self):
+        upload = self.upload({"1.in": b"0" * 2000, "1.out": b"1\n"})
+        self.assertEqual(upload.status, "FAILED")
+        self.assertIn("1.in unpacks to more than", upload.message)
+        self.assertFalse(TestInput.objects.exists())
+
+    @override_settings(TEST_UPLOAD_MAX_FILE_MB=0.001)
+    def test_sizes_are_enforced_when_headers_lie(self):
+        def understated(path):
+            return ((name, 1, opener) for name, _, opener in archive_members(path))
+
+        archive_members = testdata._archive_members
+        with mock.patch("asloj.testdata._archive_members", understated):
+            upload = self.upload({"1.in": b"0" * 2000, "1.out": b"1\n"})
+        self.assertEqual(upload.status, "FAILED")
+        self.assertIn("1.in unpacks to more than the upload limits allow", upload.message)
+        self.assertFalse(TestInput.objects.exists())
+        problem_dir = os.path.join(settings.MEDIA_ROOT, "problems", str(self.problem.pk))
+        self.assertEqual([name for _, _, names in os.walk(problem_dir) for name in names], [])
+
+    def test_an_upload_is_processed_once(self):
+        upload = self.upload({"1.in": b"1\n", "1.out": b"1\n"})
+        process_test_upload(upload.pk)  # already claimed and done
+        self.assertEqual(TestInput.objects.count(), 1)
+
+
+# -------------------------
+# Statements
+# -------------------------
+class StatementTests(TestCase):
+    def test_statements_saved_before_pre_rendering_render_on_first_view(self):
+        user = make_user()
+        problem = make_problem(user, statement="<p>Add <script>x</script>two numbers</p>")
+        Problem.objects.filter(pk=problem.pk).update(statement_html="", statement_hash="")
+        self.client.force_login(user)
+
+        response = assert_query_budget(self.client, reverse("problem_detail", args=[problem.pk]))
+        self.assertContains(response, "<p>Add two numbers</p>")
+        problem.refresh_from_db()
+        self.assertTrue(problem.statement_hash)
+        self.assertNotIn("script", problem.statement_html)
+
+
+# -------------------------
+# Contests
+# -------------------------
+class ContestPointsTests(TestCase):
+    def test_user_points_match_the_scoreboard(self):
+        user = make_user()
+        contest = make_contest(user)
+        solved, partial = make_problem(user, title="A"), make_problem(user, title="B")
+        ContestStanding.objects.create(contest=contest, user=user, problem=solved, best_points=100, attempts=1,
+                                       first_ac_at=timezone.now())
+        ContestStanding.objects.create(contest=contest, user=user, problem=partial, best_points=60, attempts=2)
+        self.assertEqual(contest.user_points(user), 160)
+        [row] = build_scoreboard(contest)["rows"]
+        self.assertEqual(row["total_points"], contest.user_points(user))
+
+
+class ContestHistoryTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.problem = make_problem(self.user)
+        self.client.force_login(self.user)
+
+    def contest(self, name, hours_ago, attempts):
+        contest = make_contest(self.user, start=timezone.now() - timedelta(hours=hours_ago), name=name)
+        ContestStanding.objects.create(contest=contest, user=self.user, problem=self.problem, attempts=attempts,
+                                       best_points=100 if attempts else 0)
+        return contest
+
+    def history(self):
+        response = self.client.get(reverse("user_profile", args=[self.user.university_id]))
+        return [entry["contest__name"] for entry in response.context["contests"]]
+
+    def test_history_lists_ended_contests_the_user_took_part_in(self):
+        self.contest("Running", 1, attempts=1)
+        self.contest("Skipped", 5, attempts=0)
+        self.contest("Ended", 5, attempts=1)
+        self.assertEqual(self.history(), ["Ended"])
+
+    def test_rejudge_after_the_end_refinalizes_the_results(self):
+        contest = make_contest(self.user, start=timezone.now() - timedelta(hours=5))
+        contest.problems.add(self.problem)
+        submission = ContestSubmission.objects.create(contest=contest, user=self.user, problem=self.problem,
+                                                      language="py", status="WA")
+        ContestSubmission.objects.filter(pk=submission.pk).update(created_at=contest.start_time)
+        submission.refresh_from_db()
+        ContestStanding.objects.create(contest=contest, user=self.user, problem=self.problem, attempts=1)
+        finalize_contest(contest)
+        self.assertEqual(ContestResult.objects.get(contest=contest).total_points, 0)
+
+        # A rejudge accepts the submission and updates its standing
+        with self.captureOnCommitCallbacks(execute=True):
+            submission.status, submission.points = "AC", 100
+            submission.save()
+            ContestStanding.objects.filter(contest=contest).update(best_points=100, first_ac_at=contest.end_time)
+        self.assertFalse(ContestSnapshot.objects.filter(contest=contest).exists())
+
+        scoreboard = final_scoreboard(contest)["scoreboard"]
+        self.assertEqual(scoreboard["rows"][0]["total_points"], 100)
+        self.assertEqual(ContestResult.objects.get(contest=contest).total_points, 100)
+
+
+class ContestWindowTests(MediaTestCase):
+    def test_submissions_after_the_end_leave_the_results_alone(self):
+        user = make_user()
+        problem = make_problem(user)
+        contest = make_contest(user, start=timezone.now() - timedelta(hours=5))
+        contest.problems.add(problem)
+        ContestStanding.objects.create(contest=contest, user=user, problem=problem, attempts=1, best_points=40)
+        finalize_contest(contest)
+        before = list(ContestResult.objects.values_list("user_id", "rank", "total_points"))
+
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("contest_problem_detail", args=[contest.id, problem.pk]),
+                                        {"language": "py", "code_file": SimpleUploadedFile("a.py", b"print(3)\n")})
+        self.assertRedirects(response, reverse("contest_problem_detail", args=[contest.id, problem.pk]),
+                             fetch_redirect_response=False)
+        self.assertFalse(ContestSubmission.objects.exists())
+        self.assertEqual(list(ContestResult.objects.values_list("user_id", "rank", "total_points")), before)
+        self.assertTrue(ContestSnapshot.objects.filter(contest=contest).exists())
+
+
+class WarmContestTests(MediaTestCase):
+    def warm(self):
+        user = make_user(f"u{Contest.objects.count()}@uap-bd.edu")
+        contest = make_contest(user, start=timezone.now() + timedelta(minutes=30))
+        contest.problems.add(make_problem(user))
+        ContestRegistration.objects.create(contest=contest, user=user, name=user.full_name, email=user.email,
+                                           student_id=user.university_id)
+        out = io.StringIO()
+        call_command("warm_contest", contest.id, stdout=out)
+        return out.getvalue()
+
+    def test_statuses_are_primed_only_in_a_shared_cache(self):
+        self.assertIn("not primed, the cache is local to this process", self.warm())
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        shared = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location}}
+        with override_settings(CACHES=shared):
+            self.assertIn("statuses: primed for 1 contestants", self.warm())
+
+
+class ExportTests(TestCase):
+    def test_standings_list_contestants_who_submitted(self):
+        user = make_user(full_name="=HYPERLINK(\"http://evil\")")
+        idle = make_user("idle@uap-bd.edu")
+        contest = make_contest(user)
+        problem = make_problem(user)
+        contest.problems.add(problem)
+        for registrant in (user, idle):
+            ContestRegistration.objects.create(contest=contest, user=registrant, name=registrant.full_name,
+                                               email=registrant.email, student_id=registrant.university_id)
+        precreate_standings(contest)
+        ContestStanding.objects.filter(user=user).update(attempts=1, best_points=100, first_ac_at=timezone.now())
+
+        rows = list(csv.reader(io.StringIO(b"".join(export_chunks(contest, "standings")).decode())))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][2], "'=HYPERLINK(\"http://evil\")")
+
+
+class ScoreboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        self.contest = make_contest(self.user)
+        self.key = f"scoreboard:{self.contest.id}:live"
+
+    @override_settings(SCOREBOARD_CACHE_SECONDS=0.05)
+    def test_etag_follows_the_content(self):
+        first = get_scoreboard(self.contest)
+        time.sleep(0.06)
+        again = get_scoreboard(self.contest)
+        self.assertNotEqual(first["version"], again["version"])
+        self.assertEqual(first["etag"], again["etag"])
+
+        ContestStanding.objects.create(contest=self.contest, user=self.user, problem=make_problem(self.user),
+                                       best_points=100, attempts=1, first_ac_at=timezone.now())
+        time.sleep(0.06)
+        self.assertNotEqual(get_scoreboard(self.contest)["etag"], first["etag"])
+
+    def test_cold_cache_waits_for_the_lock_holder(self):
+        cache.add(f"{self.key}:lock", 1)
+        built = {"version": 1, "built_at": 1e12, "etag": "x", "scoreboard": {}}
+        threading.Timer(0.2, cache.set, (self.key, built)).start()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_scoreboard(self.contest), built)
+
+    @override_settings(SCOREBOARD_CACHE_SECONDS=0.2)
+    def test_only_the_lock_holder_releases_the_lock(self):
+        cache.add(f"{self.key}:lock", 1, timeout=60)
+        self.assertEqual(get_scoreboard(self.contest)["version"], 1)  # built after the holder timed out
+        self.assertIsNotNone(cache.get(f"{self.key}:lock"))
+
+
+class PointsLedgerBackfillTests(TestCase):
+    def test_points_credited_before_the_ledger_are_not_credited_again(self):
+        user = make_user()
+        contest, problem = make_contest(user), make_problem(user)
+        ContestSubmission.objects.create(user=user, contest=contest, problem=problem, language="py", status="AC",
+                                         points=100)
+        User.objects.filter(pk=user.pk).update(points=100)  # credited by the old code, no ledger entry
+        PointsLedger.objects.all().delete()
+
+        migration = importlib.import_module("asloj.migrations.0021_backfill_points_ledger")
+        migration.backfill_points_ledger(apps, None)
+
+        again = ContestSubmission.objects.create(user=user, contest=contest, problem=problem, language="py",
+                                                 status="AC", points=100)
+        self.assertEqual(credit_points(again), 0)
+        user.refresh_from_db()
+        self.assertEqual(user.points, 100)
+
+
+# -------------------------
+# Leaderboard
+# -------------------------
+@override_settings(LEADERBOARD_PAGE_SIZE=2, LEADERBOARD_CACHED_PAGES=5)
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for number, points in enumerate([50, 40, 40, 40, 10, 0]):
+            User.objects.create(email=f"u{number}@uap-bd.edu", full_name=f"U{number}", university_id=str(number),
+                                points=points)
+
+    def test_ranks_match_get_user_rank_with_one_query(self):
+        users = list(ranked_users()[2:6])
+        with self.assertNumQueries(1):
+            ranked = attach_ranks(users)
+        self.assertEqual([u.rank for u in ranked], [get_user_rank(u) for u in ranked])
+        self.assertEqual([u.rank for u in ranked], [2, 2, 5, 6])
+
+    def test_bare_page_number_redirects_to_its_cursor(self):
+        response = self.client.get(reverse("leaderboard"), {"page": 2})
+        third = ranked_users()[1]
+        self.assertRedirects(response, f"{reverse('leaderboard')}?page=2&after={third.points}_{third.id}",
+                             fetch_redirect_response=False)
+        self.assertRedirects(self.client.get(reverse("leaderboard"), {"page": 9}), reverse("leaderboard"),
+                             fetch_redirect_response=False)
+
+    def test_home_page_reads_the_top_users_only_when_its_fragment_expires(self):
+        self.client.force_login(User.objects.get(university_id="0"))
+        self.assertContains(self.client.get(reverse("home")), "U0")
+        with self.assertNumQueries(2):  # the session and the user
+            self.assertContains(self.client.get(reverse("home")), "U0")
+
+    def test_only_canonical_pages_are_cached(self):
+        key = f"leaderboard:{leaderboard_version()}:page:2"
+        first = cached_keyset_page(1)
+        cached_keyset_page(2, after=(5, 1))
+        self.assertIsNone(cache.get(key))
+
+        cached_keyset_page(2, after=(first["users"][-1]["points"], first["users"][-1]["id"]))
+        self.assertEqual([u["points"] for u in cache.get(key)["users"]], [40, 40])
+
+
+# -------------------------
+# Stats
+# -------------------------
+class ActivityTests(TestCase):
+    def test_last_active_is_not_limited_to_the_heatmap_year(self):
+        user = make_user()
+        long_ago = timezone.localdate() - timedelta(days=500)
+        DailyActivity.objects.create(user=user, date=long_ago, attempt_count=2, ac_count=1)
+        activity = activity_summary(user)
+        self.assertEqual(activity["last_active"], long_ago)
+        self.assertEqual(activity["heatmap_data"]["counts"], {})
+
+    def test_heatmap_holds_only_the_days_with_accepted_submissions(self):
+        user = make_user()
+        today = timezone.localdate()
+        DailyActivity.objects.create(user=user, date=today, attempt_count=3, ac_count=2)
+        DailyActivity.objects.create(user=user, date=today - timedelta(days=1), attempt_count=1, ac_count=0)
+        heatmap = activity_summary(user)["heatmap_data"]
+        self.assertEqual(heatmap["counts"], {today.isoformat(): 2})
+        self.assertEqual((heatmap["start"], heatmap["days"]), ((today - timedelta(days=365)).isoformat(), 366))
+
+
+class UserStatsTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.problem = make_problem(self.user, difficulty="Easy")
+
+    def solve(self):
+        submission = Submission.objects.create(user=self.user, problem=self.problem, language="py", status="AC")
+        record_practice_verdict(submission)
+
+    def stats(self):
+        return UserStats.objects.get(user=self.user)
+
+    def test_new_users_start_with_a_row(self):
+        self.solve()
+        self.assertEqual(self.stats().easy_solved, 1)
+        self.assertEqual(ProblemStats.objects.get(problem=self.problem).solvers, 1)
+
+    def test_difficulty_change_moves_the_solve(self):
+        self.solve()
+        self.problem.difficulty = "Hard"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.problem.save()
+        self.assertEqual((self.stats().easy_solved, self.stats().hard_solved), (0, 1))
+
+    def test_deleted_problem_is_no_longer_solved(self):
+        self.solve()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.problem.delete()
+        self.assertEqual(self.stats().problems_solved, 0)
+
+    def test_deleted_registration_is_no_longer_counted(self):
+        registration = ContestRegistration.objects.create(contest=make_contest(self.user), user=self.user,
+                                                          name="u", email="u@uap-bd.edu", student_id="1")
+        self.assertEqual(self.stats().contests_entered, 1)
+        registration.delete()
+        self.assertEqual(self.stats().contests_entered, 0)
+
+
+# -------------------------
+# Seeding
+# -------------------------
+class SeedScaleTests(MediaTestCase):
+    def test_seeded_submissions_open(self):
+        call_command("seed_scale", users=5, problems=3, submissions=20, contests=1, skip_derived=True,
+                     stdout=io.StringIO())
+        submission = Submission.objects.first()
+        self.client.force_login(submission.user)
+        response = self.client.get(reverse("submission_detail", args=[submission.pk]))
+        self.assertContains(response, "a + b")
+
+        contest_submission = ContestSubmission.objects.first()
+        self.client.force_login(contest_submission.user)
+        response = self.client.get(reverse("contest_submission_detail",
+                                           args=[contest_submission.contest_id, contest_submission.pk]))
+        self.assertContains(response, "a + b")
+
+
+# -------------------------
+# Submission archive
+# -------------------------
+class ArchiveTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        override = override_settings(SUBMISSION_ARCHIVE_DIR=os.path.join(settings.MEDIA_ROOT, "archives"))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.submission = Submission.objects.create(user=make_user(), problem=make_problem(make_user("a@uap-bd.edu")),
+                                                    language="py", status="AC",
+                                                    code_file=ContentFile(b"print(3)\n", name="main.py"))
+        self.original = self.submission.code_file.path
+
+    def archive(self):
+        call_command("archive_submissions", older_than=0, stdout=io.StringIO())
+
+    def test_originals_are_deleted_once_per_segment(self):
+        self.archive()
+        self.assertFalse(os.path.exists(self.original))
+        self.assertTrue(ArchiveSegment.objects.get().originals_deleted)
+        self.submission.refresh_from_db()
+        self.assertEqual(self.submission.code_file.read(), b"print(3)\n")
+
+        _write(self.original, "restored by hand")
+        self.archive()
+        self.assertTrue(os.path.exists(self.original))  # its segment is already clean
+
+        ArchiveSegment.objects.update(originals_deleted=False)  # as after a run that died mid-delete
+        self.archive()
+        self.assertFalse(os.path.exists(self.original))
+
+    def test_failed_index_leaves_no_segment_behind(self):
+        with mock.patch.object(ArchivedFile.objects, "bulk_create", side_effect=RuntimeError("database down")):
+            with self.assertRaises(RuntimeError):
+                self.archive()
+        self.assertEqual(os.listdir(settings.SUBMISSION_ARCHIVE_DIR), [])
+        self.assertFalse(ArchiveSegment.objects.exists())
+        self.assertTrue(os.path.exists(self.original))
+
+
+# -------------------------
+# Query budgets
+# -------------------------
+class QueryBudgetTests(MediaTestCase):
+    """Several rows of everything, so a query per row shows up as going over the budget."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.users = [make_user(f"u{number}@uap-bd.edu") for number in range(4)]
+        self.user = self.users[0]
+        self.problems = [make_problem(self.user, title=f"P{number}") for number in range(3)]
+        for problem in self.problems:
+            for index in (1, 2):
+                TestInput.objects.create(problem=problem, index=index, file=ContentFile(b"1 2\n", name=f"{index}.in"))
+                TestOutput.objects.create(problem=problem, index=index, file=ContentFile(b"3\n", name=f"{index}.out"))
+        self.contests = [make_contest(creator, name=f"Round {creator.pk}") for creator in self.users]
+        self.contest = self.contests[0]
+        self.contest.problems.set(self.problems)
+        self.group = Group.objects.create(name="Team", created_by=self.user)
+        self.group.members.add(*self.users)
+        self.discussion = Discussion.objects.create(author=self.user, title="Hints", content="")
+        for user in self.users:
+            ContestRegistration.objects.create(contest=self.contest, user=user, name=user.full_name, email=user.email,
+                                               student_id=user.university_id)
+            Comment.objects.create(discussion=self.discussion, author=user, content="+1")
+            Submission.objects.create(user=user, problem=self.problems[0], code_file="a.py", language="py", status="AC")
+        self.client.force_login(self.user)
+
+    def submit(self, problem, source=b"print(3)\n"):
+        return assert_query_budget(
+            self.client, reverse("contest_problem_detail", args=[self.contest.id, problem.pk]), method="post",
+            data={"language": "py", "code_file": SimpleUploadedFile("a.py", source)},
+        )
+
+    def test_pages_stay_within_budget(self):
+        contest, problem = self.contest.id, self.problems[0].pk
+        paths = [
+            reverse("home"), reverse("user_profile", args=[self.user.university_id]), reverse("problems"),
+            reverse("problem_detail", args=[problem]), reverse("submission_list"), reverse("leaderboard"),
+            reverse("contest_list"), reverse("contest_detail", args=[contest]), reverse("contest_problems", args=[contest]),
+            reverse("contest_problem_detail", args=[contest, problem]),
+            reverse("contest_submission_list", args=[contest]), reverse("contest_scoreboard", args=[contest]),
+            reverse("contest_scoreboard_json", args=[contest]), reverse("community"),
+            reverse("discussion_detail", args=[self.discussion.id]), reverse("group_list"),
+            reverse("group_detail", args=[self.group.id]), reverse("invite_member", args=[self.group.id]),
+        ]
+        for warm in (False, True):
+            for path in paths:
+                with self.subTest(path=path, warm=warm):
+                    self.assertEqual(assert_query_budget(self.client, path).status_code, 200)
+
+    def test_contest_submissions_stay_within_budget(self):
+        for user in self.users:
+            self.client.force_login(user)
+            self.assertEqual(self.submit(self.problems[0]).status_code, 302)  # the first one builds the bundle
+            self.assertEqual(self.submit(self.problems[1], b"print(4)\n").status_code, 302)
+        self.assertEqual(ContestSubmission.objects.count(), 8)
+
+    def test_cold_scoreboards_stay_within_budget(self):
+        for name in ("contest_scoreboard_json", "contest_scoreboard"):
+            cache.clear()
+            assert_query_budget(self.client, reverse(name, args=[self.contest.id]))
+
+        ended = make_contest(self.user, start=timezone.now() - timedelta(hours=5), name="Ended")
+        ended.problems.set(self.problems)
+        for user in self.users:
+            ContestStanding.objects.create(contest=ended, user=user, problem=self.problems[0], best_points=100,
+                                           attempts=1, first_ac_at=ended.start_time + timedelta(minutes=5))
+        assert_query_budget(self.client, reverse("contest_scoreboard_json", args=[ended.id]))  # finalizes
+        self.assertTrue(ContestSnapshot.objects.filter(contest=ended).exists())
+
+
+# -------------------------
+# Metrics
+# -------------------------
+class MetricsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        override = override_settings(METRICS_DIR=directory)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_threads_flush_without_clobbering_each_other(self):
+        errors = []
+
+        def flush_often():
+            try:
+                for _ in range(50):
+                    metrics.flush()
+            except OSError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=flush_often) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_gauges_of_dead_workers_are_left_out(self):
+        dead = subprocess.Popen([sys.executable, "-c", ""])
+        dead.wait()
+        snapshot = [["asloj_judge_in_progress", [], 3], ["asloj_judge_verdicts_total", [["verdict", "AC"]], 2]]
+        _write(os.path.join(settings.METRICS_DIR, f"{dead.pid}.json"), json.dumps(snapshot))
+
+        totals = metrics.collect()
+        self.assertEqual(totals[("asloj_judge_verdicts_total", (("verdict", "AC"),))], 2)
+        self.assertEqual(totals.get(("asloj_judge_in_progress", ()), 0), 0)  # only this process's own gauge
+
+
+# -------------------------
+# Checks
+# -------------------------
+class SharedCacheCheckTests(TestCase):
+    LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    FILE = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": "/tmp"}}
+
+    def test_production_needs_a_shared_cache(self):
+        with override_settings(DEBUG=False, CACHES=self.LOCMEM):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ["asloj.E001"])
+        with override_settings(DEBUG=False, CACHES=self.FILE):
+            self.assertEqual(check_shared_cache(None), [])
+        with override_settings(DEBUG=True, CACHES=self.LOCMEM):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+# -------------------------
+# Query plans
+# -------------------------
+class QueryPlanTests(TestCase):
+    @unittest.skipUnless(connection.vendor == "postgresql", "index choices are checked against the production database")
+    def test_hot_queries_use_their_indexes(self):
+        out = io.StringIO()
+        call_command("check_query_plans", submissions=20000, stdout=out)  # raises CommandError on a missing index
+        self.assertIn("All hot queries use their indexes", out.getvalue())
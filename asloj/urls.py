@@ -33,6 +33,7 @@ urlpatterns = [
     path('problems/crud/<int:pk>/', views.problem_crud, name='problem_crud'),  # edit existing
     path('problems/delete/<int:pk>/', views.problem_delete, name='problem_delete'),
     path('problems/<int:pk>/submit/', views.submit_solution, name='submit_solution'),
+    path('problems/uploads/<int:upload_id>/', views.test_upload_progress, name='test_upload_progress'),
 
     path('submissions/', views.submission_list, name='submission_list'),
     path('submissions/<int:pk>/', views.submission_detail, name='submission_detail'),
@@ -43,6 +44,9 @@ urlpatterns = [
     path('contests/<int:contest_id>/register/', views.contest_register, name='contest_register'),
 
     path('contests/<int:contest_id>/problems/', views.contest_problems, name='contest_problems'),
+    path('contests/<int:contest_id>/scoreboard/', views.contest_scoreboard, name='contest_scoreboard'),
+    path('contests/<int:contest_id>/scoreboard.json', views.contest_scoreboard_json, name='contest_scoreboard_json'),
+    path('contests/<int:contest_id>/export/<str:kind>.<str:fmt>', views.contest_export, name='contest_export'),
     path('contests/<int:contest_id>/problems/<int:problem_id>/', views.contest_problem_detail, name='contest_problem_detail'),
 
     path('contests/<int:contest_id>/', views.start_contest, name='start_contest'),
@@ -52,6 +56,7 @@ urlpatterns = [
     path('contests/<int:contest_id>/submissions/<int:submission_id>/', views.contest_submission_detail, name='contest_submission_detail'),
 
     path('about/', lambda request: render(request, 'about_developers.html'), name='about_developers'),
+    path('metrics', views.metrics_view, name='metrics'),
 
     path('password-reset/', auth_views.PasswordResetView.as_view(
         form_class=CustomPasswordResetForm,
@@ -3,6 +3,11 @@ import tempfile
 import os
 import shutil
 import signal
+import hashlib
+import time
+from django.conf import settings
+from . import metrics
+from .testdata import BUNDLE_ERRORS, open_bundle
 
 SUPPORTED_EXTENSIONS = {
     "py": ".py",
@@ -12,22 +17,272 @@ SUPPORTED_EXTENSIONS = {
     "js": ".js",
 }
 
+
+def normalize_output(s):
+    return "\n".join(line.strip() for line in s.strip().splitlines() if line.strip())
+
+
+def file_digest(path):
+    """Return the sha256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_hash(path):
+    """Hash a submitted source file byte for byte, so only identical resubmissions match."""
+    return file_digest(path)
+
+
+# Verdicts that depend only on the source and the tests. TLE and RE can depend on the judge's
+# load and JE on a checker since fixed, so those are always judged again.
+REUSABLE_STATUSES = ("AC", "WA", "CE", "Compilation Error")
+
+
+def find_judged_duplicate(submission):
+    """
+    Return an already judged submission with the same problem, language, source and
+    test data version as `submission` (a Submission or ContestSubmission), or None.
+    """
+    if not submission.source_hash:
+        return None
+    duplicate = (
+        type(submission).objects
+        .filter(
+            problem_id=submission.problem_id,
+            language=submission.language,
+            source_hash=submission.source_hash,
+            test_data_version=submission.test_data_version,
+            status__in=REUSABLE_STATUSES,
+        )
+        .exclude(pk=submission.pk)
+        .order_by("-id")
+        .first()
+    )
+    metrics.cache_lookup("verdict_reuse", duplicate is not None)
+    return duplicate
+
+
+def _run_measured(cmd, timeout, work_dir):
+    """
+    Run cmd to completion and return (returncode, stdout, stderr, cpu_seconds).
+    The CPU time is that of this child alone (os.wait4), so processes started by other
+    judge threads never count towards it. Raises subprocess.TimeoutExpired after killing it.
+    """
+    if not hasattr(os, "wait4"):  # Windows: wall time is the best we have
+        start = time.perf_counter()
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        return proc.returncode, proc.stdout, proc.stderr, time.perf_counter() - start
+
+    # Output goes to files so the child never blocks on a full pipe while we poll
+    out_path = os.path.join(work_dir, "checker_stdout.txt")
+    err_path = os.path.join(work_dir, "checker_stderr.txt")
+    with open(out_path, "wb") as out, open(err_path, "wb") as err:
+        proc = subprocess.Popen(cmd, stdout=out, stderr=err)
+
+    deadline = time.monotonic() + timeout
+    while True:
+        pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            break
+        if time.monotonic() >= deadline:
+            proc.kill()
+            os.wait4(proc.pid, 0)
+            proc.returncode = -signal.SIGKILL
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        time.sleep(0.005)
+    proc.returncode = os.waitstatus_to_exitcode(status)  # reaped here, so Popen must not wait again
+
+    with open(out_path, encoding="utf-8", errors="replace") as f:
+        stdout = f.read()
+    with open(err_path, encoding="utf-8", errors="replace") as f:
+        stderr = f.read()
+    return proc.returncode, stdout, stderr, usage.ru_utime + usage.ru_stime
+
+
+def _cached_program_command(problem, source_file, language, kind):
+    """
+    Return the command that runs a helper program (checker, generator) of a problem.
+    It is compiled once and cached under JUDGE_CACHE_DIR, keyed by the problem and the
+    hash of its source, so uploading a new program invalidates the cached build.
+    """
+    source_path = source_file.path
+    digest = file_digest(source_path)
+    cache_dir = os.path.join(settings.JUDGE_CACHE_DIR, f"{kind}s", str(problem.problem_id), digest[:16])
+    os.makedirs(cache_dir, exist_ok=True)
+
+    if language == "py":
+        script = os.path.join(cache_dir, f"{kind}.py")
+        if not os.path.exists(script):
+            shutil.copy(source_path, script)
+        return ["python", script]
+
+    exe_file = os.path.join(cache_dir, f"{kind}.exe")
+    metrics.cache_lookup(kind, os.path.exists(exe_file))
+    if not os.path.exists(exe_file):
+        # Compile to a temporary name first so concurrent judges never run a half-written binary
+        fd, tmp_exe = tempfile.mkstemp(dir=cache_dir, prefix=f"{kind}.", suffix=".tmp")
+        os.close(fd)
+        cmd = ["g++", "-O2", "-std=c++17", source_path, "-o", tmp_exe]
+        if settings.TESTLIB_INCLUDE_DIR:
+            cmd[1:1] = ["-I", str(settings.TESTLIB_INCLUDE_DIR)]
+
+        try:
+            compile_proc = subprocess.run(cmd, capture_output=True, text=True)
+            if compile_proc.returncode != 0:
+                raise ValueError(f"{kind.capitalize()} compilation failed: {compile_proc.stderr.strip()}")
+            os.chmod(tmp_exe, 0o755)
+            os.replace(tmp_exe, exe_file)
+        finally:
+            if os.path.exists(tmp_exe):
+                os.remove(tmp_exe)
+
+    return [exe_file]
+
+
+def get_checker_command(problem):
+    """Return the command that runs the problem's special checker, or None if it has none."""
+    if not problem.checker:
+        return None
+    return _cached_program_command(problem, problem.checker, problem.checker_language, "checker")
+
+
+def get_generator_command(problem):
+    """Return the command that runs the problem's test generator, or None if it has none."""
+    if not problem.generator:
+        return None
+    return _cached_program_command(problem, problem.generator, problem.generator_language, "generator")
+
+
+# testlib exit codes: 0 ok, 1 wrong answer, 2 presentation error, 3 checker failure
+CHECKER_VERDICTS = {0: "AC", 1: "WA", 2: "WA"}
+
+
+def run_checker(checker_cmd, input_path, expected_path, actual_output, work_dir):
+    """
+    Run a testlib-style checker as `checker <input> <output> <answer>` on the raw bytes
+    of the contestant's output. Returns (verdict, message, checker_cpu_time). The verdict is AC or WA from the
+    checker's exit code, or JE (judge error) when it fails, crashes or times out, since
+    then nothing is known about the answer. The checker's time is kept apart from the
+    contestant's and never counts towards the problem time limit.
+    """
+    actual_path = os.path.join(work_dir, "actual_output.txt")
+    with open(actual_path, "wb") as f:
+        f.write(actual_output)
+
+    try:
+        returncode, stdout, stderr, checker_time = _run_measured(
+            checker_cmd + [input_path, actual_path, expected_path], settings.CHECKER_TIME_LIMIT, work_dir
+        )
+    except subprocess.TimeoutExpired:
+        return "JE", "Checker timed out", float(settings.CHECKER_TIME_LIMIT)
+
+    message = (stderr.strip() or stdout.strip())
+    verdict = CHECKER_VERDICTS.get(returncode, "JE")
+    if verdict == "JE":
+        message = f"Checker failed (exit code {returncode}): {message}"
+    return verdict, message, round(checker_time, 3)
+
+def run_testcase(cmd_template, testcase, checker_cmd, language, time_limit, work_dir):
+    """
+    Run the compiled program on one testcase and check its output, with the special
+    checker when the problem has one. Returns the result dict shown to the user.
+    """
+    input_data = testcase.input
+    expected_output = testcase.expected
+
+    try:
+        # Use Popen for timeout-safe execution
+        proc = subprocess.Popen(
+            cmd_template,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+        try:
+            with metrics.timed("asloj_judge_run_seconds", {"language": language}):
+                raw_stdout, raw_stderr = proc.communicate(input=testcase.input_bytes, timeout=time_limit)
+        except subprocess.TimeoutExpired:
+            # Kill entire process tree
+            if os.name == "nt":
+                subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            else:
+                os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
+
+            stdout, stderr = "", "Time Limit Exceeded"
+            verdict = "TLE"
+        else:
+            # Normal completion
+            stdout = raw_stdout.decode("utf-8", errors="replace")
+            stderr = raw_stderr.decode("utf-8", errors="replace")
+            if proc.returncode != 0:
+                verdict = "RE"
+            elif checker_cmd:
+                input_path, expected_path = testcase.write_files(work_dir)
+                verdict, checker_message, checker_time = run_checker(
+                    checker_cmd, input_path, expected_path, raw_stdout, work_dir
+                )
+            elif normalize_output(stdout) == normalize_output(expected_output):
+                verdict = "AC"
+            else:
+                verdict = "WA"
+
+        result = {
+            "input": input_data.strip(),
+            "expected": expected_output.strip(),
+            "actual": stdout.strip(),
+            "stderr": stderr.strip(),
+            "passed": verdict == "AC",
+            "verdict": verdict
+        }
+        if checker_cmd and verdict in ("AC", "WA", "JE"):
+            result["checker_message"] = checker_message
+            result["checker_time"] = checker_time
+        return result
+
+    except Exception as e:
+        return {
+            "input": input_data.strip(),
+            "expected": expected_output.strip(),
+            "actual": "",
+            "stderr": str(e),
+            "passed": False,
+            "verdict": "RE"
+        }
+
+
+def _test_data_error(error):
+    """Result for tests that could not be read; the judge failed, so nothing is known about the code."""
+    return {
+        "input": "",
+        "expected": "",
+        "actual": "",
+        "stderr": f"Could not read the test data: {error}",
+        "passed": False,
+        "verdict": "JE"
+    }
+
+
+@metrics.in_progress("asloj_judge_in_progress")
 def check_submission(problem, code_path, language, time_limit):
     language = language.lower().strip()
-    results = []
-
     if language not in SUPPORTED_EXTENSIONS:
         raise ValueError(f"Unsupported language: {language}")
 
-    inputs = list(problem.test_inputs.all().order_by("id"))
-    outputs = list(problem.test_outputs.all().order_by("id"))
-    testcases = list(zip(inputs, outputs))
-
-
+    results = []
     work_dir = tempfile.mkdtemp()
     exe_file = None
+    testcases = None
 
     try:
+        try:
+            testcases = open_bundle(problem)
+        except BUNDLE_ERRORS as e:
+            return [_test_data_error(e)]
+
         # -------------------------
         # Compile / Prepare Code
         # -------------------------
@@ -46,11 +301,12 @@ def check_submission(problem, code_path, language, time_limit):
             exe_file = os.path.join(work_dir, "a.exe")
             compiler = "gcc" if language == "c" else "g++"
 
-            compile_proc = subprocess.run(
-                [compiler, code_path, "-o", exe_file],
-                capture_output=True,
-                text=True
-            )
+            with metrics.timed("asloj_judge_compile_seconds", {"language": language}):
+                compile_proc = subprocess.run(
+                    [compiler, code_path, "-o", exe_file],
+                    capture_output=True,
+                    text=True
+                )
 
             if compile_proc.returncode != 0:
                 return [{
@@ -69,11 +325,12 @@ def check_submission(problem, code_path, language, time_limit):
             temp_java_path = os.path.join(work_dir, f"{class_name}.java")
             shutil.copy(code_path, temp_java_path)
 
-            compile_proc = subprocess.run(
-                ["javac", temp_java_path],
-                capture_output=True,
-                text=True
-            )
+            with metrics.timed("asloj_judge_compile_seconds", {"language": language}):
+                compile_proc = subprocess.run(
+                    ["javac", temp_java_path],
+                    capture_output=True,
+                    text=True
+                )
 
             if compile_proc.returncode != 0:
                 return [{
@@ -91,70 +348,22 @@ def check_submission(problem, code_path, language, time_limit):
             cmd_template = ["node", code_path]
 
         # -------------------------
-        # Normalize Output
+        # Special checker (compiled once, cached per problem)
         # -------------------------
-        def normalize_output(s):
-            return "\n".join(line.strip() for line in s.strip().splitlines() if line.strip())
+        checker_cmd = get_checker_command(problem)
 
         # -------------------------
         # Run each testcase
         # -------------------------
-        for test_input, test_output in testcases:
-            with open(test_input.file.path, "r", encoding="utf-8", errors="replace") as f:
-                input_data = f.read()
-            with open(test_output.file.path, "r", encoding="utf-8", errors="replace") as f:
-                expected_output = f.read()
-
-            try:
-                # Use Popen for timeout-safe execution
-                proc = subprocess.Popen(
-                    cmd_template,
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-
-                try:
-                    stdout, stderr = proc.communicate(input=input_data, timeout=time_limit)
-                except subprocess.TimeoutExpired:
-                    # Kill entire process tree
-                    if os.name == "nt":
-                        subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                    else:
-                        os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
-
-                    stdout, stderr = "", "Time Limit Exceeded"
-                    verdict = "TLE"
-                else:
-                    # Normal completion
-                    if proc.returncode != 0:
-                        verdict = "RE"
-                    elif normalize_output(stdout) == normalize_output(expected_output):
-                        verdict = "AC"
-                    else:
-                        verdict = "WA"
-
-                results.append({
-                    "input": input_data.strip(),
-                    "expected": expected_output.strip(),
-                    "actual": stdout.strip(),
-                    "stderr": stderr.strip(),
-                    "passed": verdict == "AC",
-                    "verdict": verdict
-                })
-
-            except Exception as e:
-                results.append({
-                    "input": input_data.strip(),
-                    "expected": expected_output.strip(),
-                    "actual": "",
-                    "stderr": str(e),
-                    "passed": False,
-                    "verdict": "RE"
-                })
+        try:
+            for testcase in testcases:
+                results.append(run_testcase(cmd_template, testcase, checker_cmd, language, time_limit, work_dir))
+        except BUNDLE_ERRORS as e:
+            results.append(_test_data_error(e))
 
     finally:
+        if testcases is not None:
+            testcases.close()
         if exe_file and os.path.exists(exe_file):
             os.remove(exe_file)
         shutil.rmtree(work_dir, ignore_errors=True)
@@ -163,6 +372,7 @@ def check_submission(problem, code_path, language, time_limit):
 
 
 
+@metrics.in_progress("asloj_judge_in_progress")
 def judge_contest_submission(submission):
     """
     Judge a ContestSubmission by running it against the problem's test cases.
@@ -178,14 +388,16 @@ def judge_contest_submission(submission):
     if language not in SUPPORTED_EXTENSIONS:
         raise ValueError(f"Unsupported language: {language}")
 
-    test_inputs = list(problem.test_inputs.all().order_by("id"))
-    test_outputs = list(problem.test_outputs.all().order_by("id"))
-    testcases = list(zip(test_inputs, test_outputs))
-
     work_dir = tempfile.mkdtemp()
     exe_file = None
+    testcases = None
 
     try:
+        try:
+            testcases = open_bundle(problem)
+        except BUNDLE_ERRORS as e:
+            return "JE", 0, [_test_data_error(e)]
+
         # -------------------------
         # Compile / Prepare Code
         # -------------------------
@@ -204,11 +416,12 @@ def judge_contest_submission(submission):
             exe_file = os.path.join(work_dir, "a.exe")
             compiler = "gcc" if language == "c" else "g++"
 
-            compile_proc = subprocess.run(
-                [compiler, code_path, "-o", exe_file],
-                capture_output=True,
-                text=True
-            )
+            with metrics.timed("asloj_judge_compile_seconds", {"language": language}):
+                compile_proc = subprocess.run(
+                    [compiler, code_path, "-o", exe_file],
+                    capture_output=True,
+                    text=True
+                )
 
             if compile_proc.returncode != 0:
                 return "CE", 0, [{
@@ -227,11 +440,12 @@ def judge_contest_submission(submission):
             temp_java_path = os.path.join(work_dir, f"{class_name}.java")
             shutil.copy(code_path, temp_java_path)
 
-            compile_proc = subprocess.run(
-                ["javac", temp_java_path],
-                capture_output=True,
-                text=True
-            )
+            with metrics.timed("asloj_judge_compile_seconds", {"language": language}):
+                compile_proc = subprocess.run(
+                    ["javac", temp_java_path],
+                    capture_output=True,
+                    text=True
+                )
 
             if compile_proc.returncode != 0:
                 return "CE", 0, [{
@@ -249,67 +463,18 @@ def judge_contest_submission(submission):
             cmd_template = ["node", code_path]
 
         # -------------------------
-        # Normalize output function
+        # Special checker (compiled once, cached per problem)
         # -------------------------
-        def normalize_output(s):
-            return "\n".join(line.strip() for line in s.strip().splitlines() if line.strip())
+        checker_cmd = get_checker_command(problem)
 
         # -------------------------
         # Run each testcase
         # -------------------------
-        passed_count = 0
-
-        for test_input, test_output in testcases:
-            with open(test_input.file.path, "r", encoding="utf-8", errors="replace") as f:
-                input_data = f.read()
-            with open(test_output.file.path, "r", encoding="utf-8", errors="replace") as f:
-                expected_output = f.read()
-
-            try:
-                proc = subprocess.Popen(
-                    cmd_template,
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-
-                try:
-                    stdout, stderr = proc.communicate(input=input_data, timeout=time_limit)
-                except subprocess.TimeoutExpired:
-                    if os.name == "nt":
-                        subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                    else:
-                        os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
-                    stdout, stderr = "", "Time Limit Exceeded"
-                    verdict = "TLE"
-                else:
-                    if proc.returncode != 0:
-                        verdict = "RE"
-                    elif normalize_output(stdout) == normalize_output(expected_output):
-                        verdict = "AC"
-                        passed_count += 1
-                    else:
-                        verdict = "WA"
-
-                results.append({
-                    "input": input_data.strip(),
-                    "expected": expected_output.strip(),
-                    "actual": stdout.strip(),
-                    "stderr": stderr.strip(),
-                    "passed": verdict == "AC",
-                    "verdict": verdict
-                })
-
-            except Exception as e:
-                results.append({
-                    "input": input_data.strip(),
-                    "expected": expected_output.strip(),
-                    "actual": "",
-                    "stderr": str(e),
-                    "passed": False,
-                    "verdict": "RE"
-                })
+        try:
+            for testcase in testcases:
+                results.append(run_testcase(cmd_template, testcase, checker_cmd, language, time_limit, work_dir))
+        except BUNDLE_ERRORS as e:
+            results.append(_test_data_error(e))
 
         # -------------------------
         # Determine final verdict and points
@@ -320,11 +485,18 @@ def judge_contest_submission(submission):
         elif all(r["verdict"] == "AC" for r in results):
             final_verdict = "AC"
             points = 100
+        elif any(r["verdict"] == "JE" for r in results):
+            # The checker failed, so the score is unknown; staff fix the checker and rejudge
+            final_verdict = "JE"
+            points = 0
         else:
             final_verdict = "WA"
+            passed_count = sum(1 for r in results if r["passed"])
             points = int(100 * passed_count / len(results))
 
     finally:
+        if testcases is not None:
+            testcases.close()
         if exe_file and os.path.exists(exe_file):
             os.remove(exe_file)
         shutil.rmtree(work_dir, ignore_errors=True)
@@ -332,68 +504,31 @@ def judge_contest_submission(submission):
     return final_verdict, points, results
 
 
-from django.db.models import Sum
-from .models import ContestRegistration, ContestSubmission
+from .models import ContestRegistration
+from .points import credit_points
+from .standings import record_submission, invalidate_problem_statuses
+from .stats import record_contest_verdict
 
-def update_points(user, contest):
+def update_points(submission):
     """
-    Update both contest registration points and user's overall points.
+    Record a judged contest submission in the contest standings and the user's stats, and credit any
+    improvement to the user's points.
     """
-    # Update contest registration points
-    registration, _ = ContestRegistration.objects.get_or_create(
+    user = submission.user
+    contest = submission.contest
+
+    # Make sure the user shows up as registered
+    ContestRegistration.objects.get_or_create(
         user=user,
         contest=contest,
         defaults={
-            'points': 0,
             'name': user.full_name,
             'email': user.email,
             'student_id': user.university_id
         }
     )
-    registration.points = contest.user_points(user)
-    registration.save()
-
-    # Update user's overall points
-    total_points = ContestSubmission.objects.filter(
-        user=user,
-        status='AC'
-    ).aggregate(total=Sum('points'))['total'] or 0
-    user.points = total_points
-    user.save()
-
-
-# utils.py
-from datetime import timedelta
-from django.utils import timezone
-from collections import defaultdict
-from .models import Submission
-
-
-def generate_heatmap_data(user):
-    """Generate daily AC submission counts for the past year."""
-    today = timezone.now().date()
-    start_date = today - timedelta(days=365)
-
-    # Fetch accepted submissions in the past year
-    submissions = (
-        Submission.objects.filter(user=user, status='AC', created_at__date__gte=start_date)
-        .values_list('created_at', flat=True)
-    )
-
-    # Count number of submissions per day
-    daily_counts = defaultdict(int)
-    for sub_date in submissions:
-        day = sub_date.date()
-        daily_counts[day] += 1
-
-    # Prepare ordered list (for each day)
-    heatmap_data = []
-    for i in range(366):
-        day = start_date + timedelta(days=i)
-        count = daily_counts.get(day, 0)
-        heatmap_data.append({
-            'date': day.isoformat(),
-            'count': count,
-        })
-
-    return heatmap_data
+    record_submission(submission)
+    invalidate_problem_statuses(contest.id, user.id)
+    credit_points(submission)
+    record_contest_verdict(submission)
+    metrics.inc("asloj_judge_verdicts_total", {"language": submission.language, "verdict": submission.status})
@@ -1,15 +1,31 @@
+import hashlib
+import json
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.contrib.auth import login, logout, get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Count, Sum, Max
-from datetime import timedelta
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Case, ExpressionWrapper, F, FloatField, Sum, Value, When
+from django.db.models.functions import Coalesce
 from .forms import UserSignupForm, UserLoginForm, ProblemForm, SubmissionForm, ContestForm, ExampleFormSet, ContestSubmissionForm, EditProfileForm
-from .models import Problem, Submission, Contest, TestInput, TestOutput, Discussion, ContestSubmission, Comment, User, Group, GroupInvitation, ContestRegistration
-from .utils import check_submission, judge_contest_submission, update_points, generate_heatmap_data
+from .models import Problem, Submission, Contest, TestInput, TestOutput, Discussion, ContestSubmission, Comment, User, Group, GroupInvitation, ContestRegistration, TestUpload, ContestResult, ContestStanding
+from . import metrics
+from .activity import activity_summary, record_activity
+from .exports import EXPORTS, FORMATS as EXPORT_FORMATS, export_chunks, export_filename
+from .ranking import cached_keyset_page, cursor_for_page, decode_cursor, get_user_rank, page_around, leaderboard_version, ranked_users
+from .snapshots import final_scoreboard
+from .standings import get_scoreboard, problem_statuses, scoreboard_etag
+from .statements import ensure_rendered_statement
+from .stats import get_user_stats, record_practice_verdict
+from .testdata import next_test_index, test_index_from_name, start_test_data_build, start_test_upload
+from .utils import check_submission, judge_contest_submission, update_points, get_checker_command, source_hash, find_judged_duplicate
 
 
 def signup_view(request):
@@ -43,17 +59,21 @@ def logout_view(request):
 @login_required
 def home_view(request):
     # Top 5 users (by points)
-    top_users = User.objects.filter(is_staff=False).order_by('-points')[:8]
+    top_users = ranked_users()[:8]
 
     # Active contests (currently running)
     now = timezone.now()
     upcoming_contests = Contest.objects.filter(start_time__gt=now).order_by('start_time')[:3]
-    recent_submissions = Submission.objects.filter(user=request.user).order_by('-created_at')[:3]
+    recent_submissions = Submission.objects.filter(user=request.user).select_related('problem').order_by('-created_at')[:3]
 
+    # The querysets stay lazy, so they only run when their cached fragment has expired
     context = {
         'top_users': top_users,
         "upcoming_contests": upcoming_contests,
         'recent_submissions': recent_submissions,
+        'leaderboard_version': leaderboard_version(),
+        'cache_seconds': settings.FRAGMENT_CACHE_SECONDS,
+        'contests_cache_seconds': settings.UPCOMING_CONTESTS_CACHE_SECONDS,
     }
     return render(request, "home.html", context)
 
@@ -61,57 +81,37 @@ User = get_user_model()
 def profile_view(request, university_id):
     profile_user = get_object_or_404(User, university_id=university_id)
 
-    leaderboard = User.objects.filter(is_active=True).order_by('-points')
-    user_rank = None
-    for idx, u in enumerate(leaderboard, start=1):
-        if u.id == profile_user.id:
-            user_rank = idx
-            break
+    user_rank = get_user_rank(profile_user)
 
-    recent_submissions = profile_user.submissions.order_by('-created_at')[:10]
-
-    difficulty_stats = {
-        'Easy': profile_user.submissions.filter(status='AC', problem__difficulty='Easy').count(),
-        'Medium': profile_user.submissions.filter(status='AC', problem__difficulty='Medium').count(),
-        'Hard': profile_user.submissions.filter(status='AC', problem__difficulty='Hard').count()
-    }
+    recent_submissions = profile_user.submissions.select_related('problem').order_by('-created_at')[:10]
 
-    problems_solved = profile_user.submissions.filter(status='AC').values('problem').distinct().count()
+    # Solve counts, streak and contest counters come from the user's stats row
+    stats = get_user_stats(profile_user)
 
     contest_history = ContestRegistration.objects.filter(user=profile_user).select_related('contest').order_by('-registered_at')
-    contests_count = contest_history.count()
 
     member_since = profile_user.date_joined.date() if hasattr(profile_user, 'date_joined') else None
 
-    last_submission = profile_user.submissions.order_by('-created_at').first()
-
-    today = timezone.now().date()
-    dates = profile_user.submissions.filter(status='AC').dates('created_at', 'day', order='DESC')
-    streak_days = 0
-    for d in dates:
-        if d == today - timedelta(days=streak_days):
-            streak_days += 1
-        else:
-            break
+    # Heatmap and last active day come from the daily activity rollup
+    activity = activity_summary(profile_user)
 
     # Total points
     total_points = profile_user.points
 
-    heatmap_data = generate_heatmap_data(profile_user)
-
     context = {
-        'heatmap_data' : heatmap_data,
+        'heatmap_data' : json.dumps(activity['heatmap_data']),
         'profile_user': profile_user,
         'recent_submissions': recent_submissions,
-        'difficulty_stats': difficulty_stats,
-        'problems_solved': problems_solved,
-        'contests_count': contests_count,
+        'difficulty_stats': stats.difficulty_stats(),
+        'problems_solved': stats.problems_solved,
+        'contests_count': stats.contests_entered,
         'contest_history': contest_history,
         'user_rank': user_rank,
         'max_rating': total_points,
         'member_since': member_since,
-        'last_submission': last_submission,
-        'streak_days': streak_days,
+        'last_active': activity['last_active'],
+        'streak_days': stats.streak_on(timezone.localdate()),
+        'best_streak': stats.best_streak,
     }
 
     return render(request, 'profile.html', context)
@@ -120,61 +120,40 @@ def user_profile_view(request, university_id):
     user = get_object_or_404(User, university_id=university_id)
 
     # --- Global Rank ---
-    all_users = User.objects.filter(is_active=True).order_by('-points')
-    user_list = list(all_users.values_list('id', flat=True))
-    user_rank = user_list.index(user.id) + 1 if user.id in user_list else None
+    user_rank = get_user_rank(user)
 
     # --- Recent Submissions ---
-    recent_submissions = Submission.objects.filter(user=user).order_by('-created_at')[:5]
-
-    # --- Problem Difficulty Stats ---
-    ac_problem_ids = Submission.objects.filter(user=user, status='AC').values_list('problem', flat=True).distinct()
-    problem_counts = Problem.objects.filter(problem_id__in=ac_problem_ids)\
-        .values('difficulty')\
-        .annotate(count=Count('problem_id'))
-    difficulty_stats = {'Easy': 0, 'Medium': 0, 'Hard': 0}
-    for entry in problem_counts:
-        difficulty_stats[entry['difficulty']] = entry['count']
-    problems_solved = sum(difficulty_stats.values())
-
-    # --- Contest History ---
-    contest_subs = ContestSubmission.objects.filter(user=user)
-    contests = contest_subs.values('contest__id', 'contest__name', 'contest__start_time')\
-        .annotate(total_points=Sum('points'))\
-        .order_by('-contest__start_time')
-
-    # --- Quick Stats ---
-    contests_count = ContestRegistration.objects.filter(user=user).count()
-    max_points = contest_subs.aggregate(max_points=Max('points'))['max_points'] or 0
-    total_points = contest_subs.aggregate(total_points=Sum('points'))['total_points'] or 0
-    last_activity = Submission.objects.filter(user=user).order_by('-created_at').first()
-
-    # --- Current Streak ---
-    today = timezone.now().date()
-    ac_dates = Submission.objects.filter(user=user, status='AC').dates('created_at', 'day', order='DESC')
-    streak_days = 0
-    for d in ac_dates:
-        if d == today - timedelta(days=streak_days):
-            streak_days += 1
-        else:
-            break
+    recent_submissions = Submission.objects.filter(user=user).select_related('problem').order_by('-created_at')[:5]
+
+    # --- Solve Counts, Streak, Contest Counters (user stats row) ---
+    stats = get_user_stats(user)
+
+    # --- Contest History: final results of ended contests, standings totals until they are finalized ---
+    history_fields = ('contest__id', 'contest__name', 'contest__start_time')
+    contests = list(ContestResult.objects.filter(user=user).values(*history_fields, 'total_points', 'rank'))
+    contests += ContestStanding.objects.filter(
+        user=user, attempts__gt=0, contest__end_time__lte=timezone.now(), contest__snapshot__isnull=True,
+    ).values(*history_fields).annotate(total_points=Sum('best_points'))
+    contests.sort(key=lambda c: c['contest__start_time'], reverse=True)
+
+    # --- Heatmap, Last Active (daily activity rollup) ---
+    activity = activity_summary(user)
 
     # --- Member Since ---
     member_since = getattr(user, 'date_joined', None)
 
-    heatmap_data = generate_heatmap_data(user)
-
     context = {
-        'heatmap_data': heatmap_data,
+        'heatmap_data': json.dumps(activity['heatmap_data']),
         'profile_user': user,
         'recent_submissions': recent_submissions,
-        'difficulty_stats': difficulty_stats,
-        'problems_solved': problems_solved,
-        'contests_count': contests_count,
-        'max_rating': max_points,
-        'total_points': total_points,
-        'last_activity': last_activity,
-        'streak_days': streak_days,
+        'difficulty_stats': stats.difficulty_stats(),
+        'problems_solved': stats.problems_solved,
+        'contests_count': stats.contests_entered,
+        'max_rating': stats.best_contest_points,
+        'total_points': user.points,
+        'last_active': activity['last_active'],
+        'streak_days': stats.streak_on(timezone.localdate()),
+        'best_streak': stats.best_streak,
         'contests': contests,
         'user_rank': user_rank,
         'member_since': member_since,
@@ -235,8 +214,25 @@ def edit_profile(request):
 
     return render(request, 'edit_profile.html', {'form': form})
 
+# Sort keys accepted by the problem list, mapped to the annotations below
+PROBLEM_SORTS = {
+    'id': 'problem_id',
+    'title': 'title',
+    'difficulty': 'difficulty_rank',
+    'solvers': 'solver_count',
+    'acceptance': 'acceptance',
+}
+
 def problems_view(request):
-    problems = Problem.objects.all().order_by('difficulty')
+    problems = Problem.objects.select_related('created_by', 'stats').annotate(
+        difficulty_rank=Case(When(difficulty='Easy', then=0), When(difficulty='Medium', then=1), default=2),
+        solver_count=Coalesce('stats__solvers', 0),
+        acceptance=Case(
+            When(stats__attempts__gt=0,
+                 then=ExpressionWrapper(F('stats__accepted') * 1.0 / F('stats__attempts'), output_field=FloatField())),
+            default=Value(0.0),
+        ),
+    )
 
     difficulty = request.GET.get('difficulty')
     created_by = request.GET.get('created_by')
@@ -247,7 +243,32 @@ def problems_view(request):
     if created_by:
         problems = problems.filter(created_by__email__icontains=created_by)
 
-    return render(request, 'problems/problems.html', {'problems': problems})
+    sort = request.GET.get('sort', 'id')
+    if sort.lstrip('-') not in PROBLEM_SORTS:
+        sort = 'id'
+    field = PROBLEM_SORTS[sort.lstrip('-')]
+    descending = sort.startswith('-')
+    problems = problems.order_by(f"-{field}" if descending else field, 'problem_id')
+
+    page_obj = Paginator(problems, settings.PROBLEMS_PAGE_SIZE).get_page(request.GET.get('page'))
+
+    # One row holds everything the user has solved, so the flags cost a single query
+    solved_ids = set()
+    if request.user.is_authenticated:
+        solved_ids = set(get_user_stats(request.user).solved_problems)
+
+    # Filters carried over by the sort and page links
+    params = request.GET.copy()
+    params.pop('page', None)
+    params.pop('sort', None)
+
+    return render(request, 'problems/problems.html', {
+        'problems': page_obj,
+        'page_obj': page_obj,
+        'solved_ids': solved_ids,
+        'sort': sort,
+        'filter_query': params.urlencode(),
+    })
 
 @login_required
 def problem_crud(request, pk=None):
@@ -257,27 +278,88 @@ def problem_crud(request, pk=None):
         problem = Problem(created_by=request.user)
 
     if request.method == 'POST':
-        form = ProblemForm(request.POST, instance=problem)
+        form = ProblemForm(request.POST, request.FILES, instance=problem)
         formset = ExampleFormSet(request.POST, request.FILES, instance=problem)
 
         if form.is_valid() and formset.is_valid():
             problem = form.save(commit=False)
             problem.created_by = request.user
-            problem.save()
-            formset.save()
-
-            for f in request.FILES.getlist('test_inputs'):
-                TestInput.objects.create(problem=problem, file=f)
-
-            for f in request.FILES.getlist('test_outputs'):
-                TestOutput.objects.create(problem=problem, file=f)
-
+            if pk and any(f in form.changed_data for f in ('time_limit', 'checker', 'checker_language',
+                                                           'generator', 'generator_language')):
+                problem.test_data_version += 1
+            # Compile the checker before anything is kept, so a broken one is never judged with
+            checker_error = None
+            with transaction.atomic():
+                problem.save()
+                formset.save()
+                try:
+                    get_checker_command(problem)
+                except ValueError as e:
+                    checker_error = str(e)
+                    transaction.set_rollback(True)
+
+            if checker_error:
+                if 'checker' in form.changed_data:
+                    problem.checker.storage.delete(problem.checker.name)
+                if not pk:
+                    problem.pk = None
+                form.add_error('checker', checker_error)
+                return render(request, 'problems/problem_crud.html', {'form': form, 'formset': formset, 'upload': None})
+
+            if pk and any(f in form.changed_data for f in ('generator', 'generator_language')):
+                # A new generator produces new inputs, so their hashes are fixed again on the next build
+                TestInput.objects.filter(problem=problem).exclude(generator_args='').update(sha256='', size=0)
+
+            # Pair inputs and outputs by the number in their file names (test_input_3 <-> test_output_3)
+            for model, files in ((TestInput, request.FILES.getlist('test_inputs')),
+                                 (TestOutput, request.FILES.getlist('test_outputs'))):
+                next_index = next_test_index(problem, model)
+                for f in files:
+                    index = test_index_from_name(f.name)
+                    if index is None:
+                        index = next_index
+                    next_index = max(next_index, index) + 1
+                    model.objects.filter(problem=problem, index=index).delete()
+                    model.objects.create(problem=problem, file=f, index=index)
+
+            # Generated tests: one line of generator arguments per test, e.g. "--n 200000 --seed 7"
+            next_index = next_test_index(problem, TestInput)
+            for line in request.POST.get('generator_args', '').splitlines():
+                if line.strip():
+                    TestInput.objects.create(problem=problem, index=next_index, generator_args=line.strip())
+                    next_index += 1
+
+            # A zip/tar of tests is unpacked in the background; the edit page shows its progress
+            archive = request.FILES.get('test_archive')
+            if archive:
+                upload = TestUpload.objects.create(problem=problem, created_by=request.user, archive=archive)
+                start_test_upload(upload)
+                return redirect(f"{reverse('problem_crud', kwargs={'pk': problem.pk})}?upload={upload.pk}")
+
+            # The bundle (which may run the generator) is built in the background; submissions
+            # are refused until it is ready, and the edit page shows a failed build
+            start_test_data_build(problem)
+            messages.info(request, f"Building the tests of {problem.title}. Submissions open once they are ready.")
             return redirect('problems')
     else:
         form = ProblemForm(instance=problem)
         formset = ExampleFormSet(instance=problem)
 
-    return render(request, 'problems/problem_crud.html', {'form': form, 'formset': formset})
+    upload = None
+    if pk and request.GET.get('upload'):
+        upload = TestUpload.objects.filter(pk=request.GET['upload'], problem=problem).first()
+
+    return render(request, 'problems/problem_crud.html', {'form': form, 'formset': formset, 'upload': upload})
+
+@login_required
+def test_upload_progress(request, upload_id):
+    upload = get_object_or_404(TestUpload, pk=upload_id, created_by=request.user)
+    return JsonResponse({
+        'status': upload.status,
+        'processed': upload.processed,
+        'total': upload.total,
+        'message': upload.message,
+    })
 
 @login_required
 def problem_delete(request, pk):
@@ -286,41 +368,103 @@ def problem_delete(request, pk):
         problem.delete()
     return redirect('problems')
 
+def _problem_page_validators(request, problem, *extra):
+    """
+    ETag and Last-Modified for a problem page. Besides the pre-rendered statement the page
+    shows the problem info, its counters, who is logged in and a CSRF token, so all of
+    those (the CSRF secret only as a hash) go into the ETag.
+    """
+    stats = getattr(problem, 'stats', None)
+    csrf_secret = request.META.get('CSRF_COOKIE', '')
+    parts = [
+        problem.statement_hash, problem.title, problem.difficulty, problem.time_limit, problem.created_by_id,
+        stats.updated_at.isoformat() if stats else '', request.user.pk,
+        hashlib.sha256(csrf_secret.encode()).hexdigest(), *extra,
+    ]
+    etag = '"%s"' % hashlib.sha256('|'.join(map(str, parts)).encode()).hexdigest()[:32]
+    modified = [dt for dt in (problem.statement_updated_at, stats.updated_at if stats else None) if dt]
+    last_modified = int(max(modified).timestamp()) if modified else None
+    return etag, last_modified
+
+
+def _conditional_problem_page(request, problem, render_page, *extra):
+    """Answer a repeat GET of a problem page with 304 when nothing on it changed, else render it."""
+    etag, last_modified = _problem_page_validators(request, problem, *extra)
+    # Pending flash messages would be lost in a 304
+    if len(messages.get_messages(request)) == 0:
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+    response = render_page()
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 @login_required
 def problem_detail(request, pk):
-    problem = get_object_or_404(Problem, pk=pk)
-    submission_form = SubmissionForm(initial={'problem': problem})
-    return render(request, 'problems/problem_detail.html', {
-        'problem': problem,
-        'submission_form': submission_form,
-    })
+    problem = get_object_or_404(Problem.objects.select_related('created_by', 'stats'), pk=pk)
+    ensure_rendered_statement(problem)
+
+    def render_page():
+        submission_form = SubmissionForm(initial={'problem': problem})
+        return render(request, 'problems/problem_detail.html', {
+            'problem': problem,
+            'submission_form': submission_form,
+        })
+
+    return _conditional_problem_page(request, problem, render_page)
 
 
 @login_required
 def submit_solution(request, pk):
     problem = get_object_or_404(Problem, pk=pk)
 
+    if request.method == 'POST' and not problem.accepts_submissions:
+        messages.error(request, "The tests of this problem are being updated. Please submit again shortly.")
+        return redirect('problem_detail', pk=problem.pk)
+
     if request.method == 'POST':
         form = SubmissionForm(request.POST, request.FILES)
         if form.is_valid():
             submission = form.save(commit=False)
             submission.user = request.user
             submission.problem = problem
+            submission.test_data_version = problem.test_data_version
             submission.save()
 
-            results = check_submission(problem, submission.code_file.path, submission.language, problem.time_limit)
+            submission.source_hash = source_hash(submission.code_file.path)
+            duplicate = find_judged_duplicate(submission)
 
-            if any(r["verdict"] == "TLE" for r in results):
-                submission.status = "TLE"
-            elif any(r["verdict"] == "RE" for r in results):
-                submission.status = "RE"
-            elif any(r["verdict"] == "CE" for r in results):
-                submission.status = "Compilation Error"
-            elif any(r["verdict"] == "WA" for r in results):
-                submission.status = "WA"
+            if duplicate:
+                # Identical source already judged against the same tests
+                results = duplicate.test_results
+                submission.status = duplicate.status
+                submission.reused = True
             else:
-                submission.status = "AC"
+                results = check_submission(problem, submission.code_file.path, submission.language, problem.time_limit)
+
+                if any(r["verdict"] == "JE" for r in results):
+                    submission.status = "JE"
+                elif any(r["verdict"] == "TLE" for r in results):
+                    submission.status = "TLE"
+                elif any(r["verdict"] == "RE" for r in results):
+                    submission.status = "RE"
+                elif any(r["verdict"] == "CE" for r in results):
+                    submission.status = "Compilation Error"
+                elif any(r["verdict"] == "WA" for r in results):
+                    submission.status = "WA"
+                else:
+                    submission.status = "AC"
+
+            submission.test_results = results
             submission.save()
+            record_activity(submission)
+            record_practice_verdict(submission)
+            metrics.inc("asloj_judge_verdicts_total", {"language": submission.language, "verdict": submission.status})
 
             code_content = ""
             if submission.code_file:
@@ -348,7 +492,7 @@ def submit_solution(request, pk):
     return redirect('problem_detail', pk=problem.pk)
 
 def submission_list(request):
-    submissions = Submission.objects.filter(user=request.user).order_by('-created_at')
+    submissions = Submission.objects.filter(user=request.user).select_related('problem').order_by('-created_at')
     return render(request, 'submissions/submission_list.html', {'submissions': submissions})
 
 def submission_detail(request, pk):
@@ -370,7 +514,7 @@ def submission_detail(request, pk):
 def contest_list(request):
     status = request.GET.get('status', '')
     now = timezone.now()
-    contests = Contest.objects.all()
+    contests = Contest.objects.select_related('creator')
 
     if status == 'upcoming':
         contests = contests.filter(start_time__gt=now)
@@ -499,21 +643,13 @@ def contest_problems(request, contest_id):
 
     problems = contest.problems.all()
 
-    # Get latest submission status for each problem for the current user
-    problem_status = {}
-    for problem in problems:
-        latest_submission = ContestSubmission.objects.filter(
-            user=request.user,
-            problem=problem
-        ).order_by('-created_at').first()
-        problem_status[problem.problem_id] = latest_submission.status if latest_submission else "Not Attempted"
-
-
+    # Best verdict per problem for the current user in this contest, one (cached) query
+    statuses = problem_statuses(contest, request.user)
 
     # Build a list of (problem, status) tuples for template
     problem_list = []
     for problem in problems:
-        status = problem_status.get(problem.problem_id, "Not Attempted")
+        status = statuses.get(problem.problem_id, {}).get("best", "Not Attempted")
         problem_list.append((problem, status))
 
     context = {
@@ -527,9 +663,19 @@ def contest_problems(request, contest_id):
 @login_required
 def contest_problem_detail(request, contest_id, problem_id):
     contest = get_object_or_404(Contest, id=contest_id)
-    problem = get_object_or_404(Problem, problem_id=problem_id)
+    problem = get_object_or_404(Problem.objects.select_related('stats'), problem_id=problem_id)
+    ensure_rendered_statement(problem)
     submission_form = ContestSubmissionForm()
 
+    if request.method == 'POST' and not contest.is_active():
+        # Final results are fixed once the contest ends
+        messages.error(request, "This contest is not running, so it does not accept submissions.")
+        return redirect('contest_problem_detail', contest_id=contest.id, problem_id=problem.pk)
+
+    if request.method == 'POST' and not problem.accepts_submissions:
+        messages.error(request, "The tests of this problem are being updated. Please submit again shortly.")
+        return redirect('contest_problem_detail', contest_id=contest.id, problem_id=problem.pk)
+
     if request.method == 'POST':
         submission_form = ContestSubmissionForm(request.POST, request.FILES)
         if submission_form.is_valid():
@@ -538,18 +684,26 @@ def contest_problem_detail(request, contest_id, problem_id):
             submission.contest = contest
             submission.problem = problem
             submission.status = "P"  # Pending
+            submission.test_data_version = problem.test_data_version
             submission.save()
 
-            # After submission is judged
-            verdict, points, results = judge_contest_submission(submission)
+            submission.source_hash = source_hash(submission.code_file.path)
+            duplicate = find_judged_duplicate(submission)
+
+            if duplicate:
+                # Identical source already judged against the same tests
+                verdict, points, results = duplicate.status, duplicate.points, duplicate.test_results
+                submission.reused = True
+            else:
+                verdict, points, results = judge_contest_submission(submission)
 
             submission.status = verdict
             submission.points = points
             submission.test_results = results
             submission.save()
 
-            # Update points
-            update_points(request.user, contest)
+            # Update standings and points
+            update_points(submission)
             messages.success(request, f"Submission judged! Verdict: {verdict}, Points: {points}")
             return redirect('contest_submission_detail', contest_id=contest.id, submission_id=submission.id)
 
@@ -561,7 +715,12 @@ def contest_problem_detail(request, contest_id, problem_id):
         'problem': problem,
         'submission_form': submission_form,
     }
-    return render(request, 'contests/contest_problem_detail.html', context)
+    if request.method == 'POST':
+        return render(request, 'contests/contest_problem_detail.html', context)
+    return _conditional_problem_page(
+        request, problem, lambda: render(request, 'contests/contest_problem_detail.html', context),
+        contest.pk, contest.name,
+    )
 
 @login_required
 def contest_submission_detail(request, contest_id, submission_id):
@@ -575,16 +734,8 @@ def contest_submission_detail(request, contest_id, submission_id):
         code_content = submission.code_file.read().decode('utf-8')
         submission.code_file.close()
 
-    # After submission is judged
-    verdict, points, results = judge_contest_submission(submission)
-
-    submission.status = verdict
-    submission.points = points
-    submission.test_results = results
-    submission.save()
-
-    # Update points
-    update_points(request.user, contest)
+    # Submissions are judged by the POST that creates them; this page only shows the results
+    results = submission.test_results
 
     context = {
         'contest': contest,
@@ -594,13 +745,65 @@ def contest_submission_detail(request, contest_id, submission_id):
     }
     return render(request, 'contests/contest_submission_detail.html', context)
 
+def _scoreboard_snapshot(request, contest):
+    # Staff always see the live standings, everyone else sees the frozen ones during a freeze
+    frozen = contest.is_frozen() and not request.user.is_staff
+    # Ended contests are read from their final snapshot
+    return final_scoreboard(contest) or get_scoreboard(contest, frozen=frozen)
+
+@login_required
+def contest_scoreboard(request, contest_id):
+    contest = get_object_or_404(Contest, id=contest_id)
+    scoreboard = _scoreboard_snapshot(request, contest)["scoreboard"]
+
+    # Attach the cells in problem order for the template
+    for row in scoreboard["rows"]:
+        row["cell_list"] = [row["cells"].get(str(p["problem_id"])) for p in scoreboard["problems"]]
+
+    context = {
+        "contest": contest,
+        "scoreboard": scoreboard,
+    }
+    return render(request, "contests/contest_scoreboard.html", context)
+
+@login_required
+def contest_scoreboard_json(request, contest_id):
+    contest = get_object_or_404(Contest, id=contest_id)
+    snapshot = _scoreboard_snapshot(request, contest)
+
+    etag = f'"{snapshot.get("etag") or scoreboard_etag(snapshot["scoreboard"])}"'
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(snapshot["scoreboard"])
+    response["ETag"] = etag
+    return response
+
+@login_required
+def contest_export(request, contest_id, kind, fmt):
+    """Staff download of standings, registrations or submissions, streamed (?gzip=1 to compress)."""
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+    contest = get_object_or_404(Contest, id=contest_id)
+    if kind not in EXPORTS or fmt not in EXPORT_FORMATS:
+        raise Http404("Unknown export")
+
+    compress = request.GET.get("gzip") == "1"
+    content_type = "text/csv; charset=utf-8" if fmt == "csv" else "application/json"
+    response = StreamingHttpResponse(
+        export_chunks(contest, kind, fmt, compress),
+        content_type="application/gzip" if compress else content_type,
+    )
+    response["Content-Disposition"] = f'attachment; filename="{export_filename(contest, kind, fmt, compress)}"'
+    return response
+
 @login_required
 def contest_submission_list(request, contest_id):
     contest = get_object_or_404(Contest, id=contest_id)
     submissions = ContestSubmission.objects.filter(
         contest=contest,
         user=request.user
-    ).order_by("-created_at")
+    ).select_related("problem").order_by("-created_at")
 
     context = {
         "contest": contest,
@@ -612,23 +815,34 @@ def contest_submission_list(request, contest_id):
 
 User = get_user_model()
 def leaderboard_view(request):
-    # Get all users ordered by points descending
-    users = User.objects.filter(is_staff=False).order_by('-points')
-
-    # Pagination: 10 per page
-    paginator = Paginator(users, 5)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination over (points, id): ?after=<cursor> / ?before=<cursor>, ?around=me
+    try:
+        page_number = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page_number = 1
+
+    after, before = decode_cursor(request.GET.get('after')), decode_cursor(request.GET.get('before'))
+    if page_number > 1 and after is None and before is None and request.GET.get('around') != 'me':
+        # An old ?page=N link from before cursors: send it to the same page in cursor form
+        cursor = cursor_for_page(page_number)
+        if cursor is None:
+            return redirect('leaderboard')
+        return redirect(f"{reverse('leaderboard')}?page={page_number}&after={cursor}")
+
+    if request.GET.get('around') == 'me' and request.user.is_authenticated and get_user_rank(request.user):
+        page = page_around(request.user)
+        page_number = None
+    else:
+        page = cached_keyset_page(page_number, after=after, before=before)
 
     # Find logged-in user rank
     user_rank = None
     if request.user.is_authenticated:
-        user_list = list(users.values_list('id', flat=True))
-        if request.user.id in user_list:
-            user_rank = user_list.index(request.user.id) + 1  # +1 because rank starts from 1
+        user_rank = get_user_rank(request.user)
 
     context = {
-        'page_obj': page_obj,
+        'page': page,
+        'page_number': page_number,
         'user_rank': user_rank
     }
     return render(request, 'leaderboard.html', context)
@@ -636,7 +850,7 @@ def leaderboard_view(request):
 
 @login_required
 def community_view(request):
-    discussions = Discussion.objects.all().order_by('-created_at')
+    discussions = Discussion.objects.select_related('author').order_by('-created_at')
 
     if request.method == "POST":
         title = request.POST.get("title")
@@ -650,7 +864,7 @@ def community_view(request):
 @login_required
 def discussion_detail(request, discussion_id):
     discussion = get_object_or_404(Discussion, id=discussion_id)
-    comments = discussion.comments.all().order_by('created_at')
+    comments = discussion.comments.select_related('author').order_by('created_at')
 
     if request.method == "POST":
         content = request.POST.get("content")
@@ -676,7 +890,7 @@ def create_group(request):
 def group_detail(request, group_id):
     group = get_object_or_404(Group, id=group_id)
     members = group.members.all()
-    is_creator = group.created_by == request.user
+    is_creator = group.created_by_id == request.user.id
     return render(request, 'groups/group_detail.html', {
         'group': group,
         'members': members,
@@ -686,7 +900,7 @@ def group_detail(request, group_id):
 @login_required
 def group_list(request):
     user_groups = request.user.user_groups.all()
-    invitations = GroupInvitation.objects.filter(invited_user=request.user, status='PENDING')
+    invitations = GroupInvitation.objects.filter(invited_user=request.user, status='PENDING').select_related('group', 'invited_by')
     return render(request, 'groups/group_list.html', {
         'user_groups': user_groups,
         'invitations': invitations,
@@ -699,7 +913,7 @@ def invite_member(request, group_id):
     group = get_object_or_404(Group, id=group_id)
 
     # Check if the user is a member
-    if request.user not in group.members.all():
+    if not group.members.filter(pk=request.user.pk).exists():
         messages.error(request, "You must be a member to invite others.")
         return redirect('group_list')
 
@@ -708,7 +922,7 @@ def invite_member(request, group_id):
         invited_user = User.objects.filter(email=email).first()
 
         if invited_user:
-            if invited_user in group.members.all():
+            if group.members.filter(pk=invited_user.pk).exists():
                 messages.warning(request, f"{invited_user.full_name} is already a member.")
             else:
                 invitation, created = GroupInvitation.objects.get_or_create(
@@ -764,4 +978,23 @@ def remove_member(request, group_id, user_id):
     user_to_remove = get_object_or_404(User, id=user_id)
     group.members.remove(user_to_remove)
     messages.info(request, f"{user_to_remove.full_name} removed from {group.name}")
-    return redirect('group_detail', group_id=group.id)
\ No newline at end of file
+    return redirect('group_detail', group_id=group.id)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; staff only, or a scraper sending `Authorization: Bearer <METRICS_TOKEN>`."""
+    token = settings.METRICS_TOKEN
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if not authorized and token:
+        authorized = request.headers.get("Authorization") == f"Bearer {token}"
+    if not authorized:
+        return HttpResponseForbidden()
+
+    body = metrics.render(extra_gauges={
+        "asloj_judge_pending": (
+            "Submissions waiting for a verdict.",
+            Submission.objects.filter(status="P").count() + ContestSubmission.objects.filter(status="P").count(),
+        ),
+    })
+    return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
+
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from django.urls import reverse_lazy
 LOGIN_URL = reverse_lazy('login')
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'asloj.middleware.MetricsMiddleware',
+    'asloj.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,6 +92,45 @@ DATABASES = {
 }
 
 
+# Cache
+# Local memory by default, for tests and development only: every process then has its own
+# entries, and signal-driven invalidations only reach the process that saw the write. With
+# DEBUG off, `manage.py check --deploy` fails (asloj.E001) unless the cache is shared.
+# In production set REDIS_URL to a Redis-compatible server shared by all workers and hosts (needs the `redis`
+# package): its add() is atomic, which the scoreboard rebuild lock relies on. CACHE_BACKEND=file
+# shares entries between the workers of one host, but its add() is not atomic, so concurrent
+# rebuilds can slip through, and its culls scan the whole directory once MAX_ENTRIES is reached.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'asloj',
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'asloj',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, 'django_cache'),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+FRAGMENT_CACHE_SECONDS = 600  # cached page fragments, also dropped by signals when their rows change
+UPCOMING_CONTESTS_CACHE_SECONDS = 60  # contests leave the list when they start, so keep this short
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -132,12 +174,79 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
-import os
 
 CKEDITOR_UPLOAD_PATH = "uploads/"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Media reads fall back to the submission archive for files moved there by archive_submissions
+STORAGES = {
+    "default": {"BACKEND": "asloj.storage.ArchiveAwareStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+SUBMISSION_ARCHIVE_DIR = os.path.join(MEDIA_ROOT, 'archives')
+SUBMISSION_ARCHIVE_AFTER_DAYS = 180  # sources of judged submissions older than this get archived
+SUBMISSION_ARCHIVE_SEGMENT_MB = 256  # a new segment is started past this size
+
+# Judge
+# Compiled checkers and other per-problem artifacts are cached here on each judge host
+JUDGE_CACHE_DIR = os.path.join(BASE_DIR, 'judge_cache')
+CHECKER_TIME_LIMIT = 10  # in seconds, not counted against the contestant
+GENERATOR_TIME_LIMIT = 30  # in seconds
+TESTLIB_INCLUDE_DIR = os.environ.get('TESTLIB_INCLUDE_DIR', '')  # folder containing testlib.h
+
+# Contests
+ICPC_PENALTY_MINUTES = 20  # per wrong attempt before the first AC
+SCOREBOARD_CACHE_SECONDS = 5  # the scoreboard is rebuilt at most this often
+CONTEST_STATUS_CACHE_SECONDS = 3600  # per-user problem verdicts, dropped on the user's next verdict
+CONTEST_FINALIZE_GRACE_MINUTES = 15  # ended contests with pending submissions wait this long before finalizing
+CONTEST_SNAPSHOT_CACHE_SECONDS = 86400  # decoded final snapshots; they never change
+
+# Leaderboard
+LEADERBOARD_PAGE_SIZE = 20
+LEADERBOARD_CACHED_PAGES = 5  # the first pages are cached until someone's points change
+LEADERBOARD_CACHE_SECONDS = 600
+
+# Problems
+PROBLEMS_PAGE_SIZE = 50
+# Limits on uploaded test archives, checked against the archive headers and again while unpacking
+TEST_UPLOAD_MAX_FILES = 2000  # files in one archive
+TEST_UPLOAD_MAX_FILE_MB = 256  # unpacked size of one test file
+TEST_UPLOAD_MAX_TOTAL_MB = 2048  # unpacked size of all the test files of one upload
+
+# Query budgets, checked per request by QueryBudgetMiddleware (keyed by URL name).
+# Going over is logged; with QUERY_BUDGET_STRICT=1 (tests, CI) it raises instead.
+# Each budget is the measured worst case of its view (asloj.tests.QueryBudgetTests).
+QUERY_BUDGET_DEFAULT = 30
+QUERY_BUDGETS = {
+    'home': 5,
+    'user_profile': 10,
+    'problems': 5,
+    'problem_detail': 5,  # the first view of a problem from before pre-rendering renders its statement
+    'submission_list': 3,
+    'leaderboard': 5,
+    'contest_list': 3,
+    'contest_detail': 7,
+    'contest_problems': 5,
+    'contest_problem_detail': 27,  # POSTs judge in the request, building the test bundle on first use
+    'contest_submission_list': 4,
+    'contest_scoreboard': 13,  # the first view after the end finalizes the contest
+    'contest_scoreboard_json': 13,
+    'community': 3,
+    'discussion_detail': 5,
+    'group_list': 7,
+    'group_detail': 4,
+    'invite_member': 5,
+}
+QUERY_TIME_BUDGET_MS = 500
+QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT') == '1'
+
+# Metrics (served on /metrics to staff, or to requests bearing METRICS_TOKEN)
+# Set METRICS_DIR to a directory shared by all workers so /metrics covers every process
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = 2
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field